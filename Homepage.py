@@ -3,17 +3,56 @@ st.set_page_config(layout="wide")  # Steamlit needs this to be the first thing t
 from authentication import check_password
 import dashboard.database.processor_db as processor_db
 import dashboard.database.alerts_db as alerts
+import dashboard.projects as projects
+from dashboard.database.base import cache_budget
+from dashboard.database.instrumentation import query_stats
 from dashboard import graph_functions as helper
+from dashboard import profiler, warmer
 
 import dashboard
 
+# Keep query caches warm for everyone (only starts once per server process)
+warmer.start_background_warmer()
+warmer.start_change_listeners()
+
 # Authentication check
 if not check_password():
     st.stop()
 
+page_profile = profiler.start()
+
+approximate = helper.approximate_counts_toggle()
+
 # Page Title
 st.title(f"Feminicides Story Dashboard {dashboard.VERSION}")
 st.markdown("Investigate stories moving through the feminicides detection pipeline")
+helper.snapshot_notice()
+st.divider()
+
+# Section: Since Last Visit
+st.subheader("Since Your Last Visit")
+st.write(
+    "What each project has had since you last opened the dashboard. Bookmark this page (its address remembers you) to "
+    "pick up where you left off next time."
+)
+try:
+    helper.since_last_visit_panel(projects.load_project_list(download_if_missing=True))
+except (ValueError, KeyError):
+    st.write("_Error. Perhaps no stories to show here?_")
+
+st.divider()
+
+# Section: Ingestion Drops
+st.subheader("Platforms That Stopped Delivering")
+st.write(
+    "Projects getting far fewer stories than usual from a platform for the last few days (compared with the two "
+    "weeks before), based on the day the stories were run against the classifiers."
+)
+try:
+    helper.ingestion_drops_table(projects.load_project_list(download_if_missing=True))
+except (ValueError, KeyError):
+    st.write("_Error. Perhaps no stories to show here?_")
+
 st.divider()
 
 # Section: Stories Sent to Main Server
@@ -60,11 +99,54 @@ except ValueError:
 
 st.divider()
 
+# Section: Latency
+st.subheader("Pipeline Latency by Platform")
+st.write(
+    "How late stories from each platform are, based on the day they were run against the classifiers: hours from the "
+    "guessed date of publication to being processed, and from being processed to being sent to the main server."
+)
+try:
+    helper.latency_charts()
+except (ValueError, KeyError):
+    st.write("_Error creating chart. Perhaps no stories to show here?_")
+
+st.divider()
+
 # Event Count by Creation Date
 st.write(
     "Unique article events from above threshold stories sent to the Email-Alerts server based on their creation date."
 )
 try:
-    helper.event_counts_draw_graph(alerts.event_counts_by_creation_date)
+    if approximate:
+        helper.approximate_event_count_metrics(alerts.approximate_event_count)
+        helper.event_counts_draw_graph(alerts.approximate_event_counts_by_creation_date)
+    else:
+        helper.event_counts_draw_graph(alerts.event_counts_by_creation_date)
 except (ValueError, KeyError):
     st.write("_Error. Perhaps no stories to show here?_")
+
+st.divider()
+
+# Relevancy Trend
+st.subheader("Relevancy of Stories in Email-Alerts Over Time")
+st.write(
+    "How many above threshold stories across all projects were judged relevant each week or day, to see how "
+    "threshold changes played out."
+)
+try:
+    helper.relevance_trend_chart()
+except (ValueError, KeyError):
+    st.write("_Error. Perhaps no stories to show here?_")
+
+st.divider()
+
+# Diagnostics
+with st.expander("Query Diagnostics"):
+    st.write("Which database server the dashboard's queries have run on since it started, and how long they took.")
+    st.dataframe(query_stats.totals(), hide_index=True, use_container_width=True)
+    st.write(f"Cached query results are using {cache_budget.used_bytes() / 1024 / 1024:.1f} MB of the "
+             f"{cache_budget.max_bytes / 1024 / 1024:.0f} MB budget:")
+    st.dataframe(sorted(cache_budget.usage(), key=lambda u: u["bytes"], reverse=True), hide_index=True,
+                 use_container_width=True)
+
+profiler.finish(page_profile, "Homepage", approximate=approximate)
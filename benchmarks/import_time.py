@@ -0,0 +1,67 @@
+"""
+Measure how long it takes to import each of the dashboard modules in a fresh interpreter, and compare that against
+our startup budget. Run it from the root of the repo:
+
+    python -m benchmarks.import_time
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict
+
+# the modules a server process imports before it can render the first page
+MODULES = [
+    "dashboard",
+    "dashboard.projects",
+    "dashboard.database.processor_db",
+    "dashboard.database.alerts_db",
+    "dashboard.warmer",
+]
+
+# seconds, for the slowest module (including everything it imports) - override for slow CI machines
+IMPORT_TIME_BUDGET_SECS = float(os.environ.get("IMPORT_TIME_BUDGET_SECS", 1.0))
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TIMER_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def import_time(module: str, repeat: int = 3) -> float:
+    """
+    Best-of-`repeat` wall time to import `module`, each time in a brand new interpreter so nothing is pre-loaded.
+    Any database settings are pointed at hosts that don't exist, so this also fails if importing opens a connection.
+    """
+    env = dict(os.environ)
+    env["PROCESSOR_DB_URI"] = "postgresql://no-such-host.invalid/story_processor_db"
+    env["ALERTS_DB_URI"] = "postgresql://no-such-host.invalid/email_alerts_db"
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _TIMER_SCRIPT.format(module=module)],
+            cwd=base_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(output.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def import_times(repeat: int = 3) -> Dict[str, float]:
+    return {module: import_time(module, repeat) for module in MODULES}
+
+
+if __name__ == "__main__":
+    results = import_times()
+    for module, secs in results.items():
+        status = "ok" if secs <= IMPORT_TIME_BUDGET_SECS else "OVER BUDGET"
+        print("{:<36} {:>6.3f} secs  {}".format(module, secs, status))
+    print("budget: {:.3f} secs".format(IMPORT_TIME_BUDGET_SECS))
+    sys.exit(0 if max(results.values()) <= IMPORT_TIME_BUDGET_SECS else 1)
@@ -0,0 +1,249 @@
+"""
+Load test the dashboard pages: a number of simulated users at once, each rendering a page over and over (the Homepage,
+or the report for a random project) headlessly with Streamlit's `AppTest`. Run it from the root of the repo against
+local databases filled by `benchmarks.seed_data`:
+
+    PROCESSOR_DB_URI=... ALERTS_DB_URI=... python -m benchmarks.load --users 10 --renders 5 --projects 20
+
+It reports percentiles of full page render time, and of how long queries waited for their turn on the shared database
+connections. Everything runs in one process, like one server process would, so users share the query caches
+(`--no-cache` empties them before every render, to see what the databases alone can handle). The project list comes
+from `--projects` instead of the main server, and cache warming is off so it doesn't compete with the users.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from unittest.mock import MagicMock
+
+import numpy as np
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import (
+    MemoryCacheStorageManager,
+)
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+
+HOMEPAGE = "Homepage.py"
+PROJECT_PAGE = os.path.join("pages", "Project Reports.py")
+
+PERCENTILES = [50, 95, 99]
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _allow_concurrent_app_tests() -> None:
+    # AppTest is built to run one app at a time: around every run it swaps a mock streamlit Runtime and a config option
+    # in and then out again, so simultaneous runs would tear each other's down. Pin them for the whole load test instead
+    # (which also means every user shares one st.cache_resource/st.cache_data store, like on a real server).
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.set_option("global.appTest", True)
+
+
+def _use_synthetic_projects(count: int) -> None:
+    import dashboard.apiclient as apiclient
+    import dashboard.projects as projects
+
+    project_list = [
+        dict(
+            id=i,
+            title="Synthetic Project {}".format(i),
+            language="en",
+            language_model_id=1,
+            language_model="synthetic",
+            min_confidence=0.5,
+            country="us",
+            newscatcher_country="us",
+            media_collections=[],
+            search_terms="synthetic",
+            rss_url="",
+        )
+        for i in range(1, count + 1)
+    ]
+    apiclient.get_projects_list = lambda: project_list
+    projects.CONFIG_DIR = tempfile.mkdtemp(prefix="dashboard-load-test-")
+
+
+def render(page: str, project_id: Optional[int] = None, timeout: float = 120) -> float:
+    """
+    Render a page like a logged-in user would, picking the project first if it is the project page.
+    :return: seconds it took to render the page (or the project's report)
+    :raises RuntimeError: if the page showed an exception
+    """
+    at = AppTest.from_file(os.path.join(base_dir, page), default_timeout=timeout)
+    at.session_state["password_correct"] = True
+    start = time.perf_counter()
+    at.run()
+    if project_id is not None:
+        start = (
+            time.perf_counter()
+        )  # just time the report, not the empty page before it
+        at.sidebar.selectbox[0].select(
+            "{} - Synthetic Project {}".format(project_id, project_id)
+        ).run()
+    secs = time.perf_counter() - start
+    if len(at.exception) > 0:
+        raise RuntimeError(at.exception[0].message)
+    return secs
+
+
+def _user(
+    pages: List[str], renders: int, project_count: int, no_cache: bool, timeout: float
+) -> List[Dict]:
+    import dashboard.database.alerts_db as alerts_db
+    import dashboard.database.processor_db as processor_db
+
+    results = []
+    for _ in range(renders):
+        page = random.choice(pages)
+        project_id = random.randint(1, project_count) if page == PROJECT_PAGE else None
+        if no_cache:
+            processor_db._cache.clear()
+            alerts_db._cache.clear()
+        try:
+            secs = render(page, project_id, timeout)
+            results.append(dict(page=page, secs=secs, error=None))
+        except Exception as e:
+            results.append(dict(page=page, secs=None, error=str(e)))
+    return results
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if len(values) == 0:
+        return {"p{}".format(p): float("nan") for p in PERCENTILES}
+    return {
+        "p{}".format(p): float(v)
+        for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+    }
+
+
+def run_load_test(
+    users: int = 5,
+    renders: int = 5,
+    project_count: int = 20,
+    pages: List[str] = None,
+    no_cache: bool = False,
+    timeout: float = 120,
+) -> Dict:
+    """
+    Only run this from the command line (see `__main__` below), which sets up the environment and Streamlit for it.
+    :param users: how many simulated users render pages at the same time
+    :param renders: how many pages each user renders, one after the other
+    :return: render time and connection wait percentiles, overall and per page
+    """
+    from dashboard.database.instrumentation import query_stats
+
+    pages = pages or [HOMEPAGE, PROJECT_PAGE]
+    _use_synthetic_projects(project_count)
+    query_stats.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        futures = [
+            executor.submit(_user, pages, renders, project_count, no_cache, timeout)
+            for _ in range(users)
+        ]
+        results = [r for f in futures for r in f.result()]
+    elapsed = time.perf_counter() - start
+    by_page = {}
+    for page in pages + [None]:
+        page_results = [r for r in results if page in [None, r["page"]]]
+        times = [r["secs"] for r in page_results if r["error"] is None]
+        by_page[page or "all"] = dict(
+            renders=len(page_results),
+            errors=len(page_results) - len(times),
+            max=max(times) if times else float("nan"),
+            **_percentiles(times),
+        )
+    waits = query_stats.waits()
+    return dict(
+        users=users,
+        elapsed_secs=elapsed,
+        pages=by_page,
+        connection_waits=dict(
+            waits=len(waits),
+            max=max(waits) if waits else float("nan"),
+            **_percentiles(waits),
+        ),
+        queries=query_stats.totals(),
+        errors=sorted({r["error"] for r in results if r["error"] is not None}),
+    )
+
+
+def _print_report(report: Dict) -> None:
+    print(
+        "{} users, {:.1f} secs".format(report["users"], report["elapsed_secs"]),
+    )
+    print(
+        "{:<28} {:>7} {:>6} {:>8} {:>8} {:>8} {:>8}".format(
+            "render secs", "renders", "errors", "p50", "p95", "p99", "max"
+        )
+    )
+    rows = list(report["pages"].items()) + [
+        ("connection wait secs", report["connection_waits"])
+    ]
+    for name, stats in rows:
+        print(
+            "{:<28} {:>7} {:>6} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f}".format(
+                name,
+                stats.get("renders", stats.get("waits")),
+                stats.get("errors", ""),
+                stats["p50"],
+                stats["p95"],
+                stats["p99"],
+                stats["max"],
+            )
+        )
+    for totals in report["queries"]:
+        print(
+            "{database} on {route}: {queries} queries, {secs:.1f} secs (including {wait_secs:.1f} secs waiting "
+            "for the connection)".format(**totals)
+        )
+    for error in report["errors"]:
+        print("error: {}".format(error))
+
+
+if __name__ == "__main__":
+    # before anything imports the dashboard settings (so the dashboard modules are only imported inside the functions
+    # above, and importing this file doesn't change the settings of whatever imported it)
+    os.environ.setdefault("WARM_INTERVAL_SECS", "0")
+    os.environ.setdefault("FEMINICIDE_API_URL", "http://main-server.invalid/")
+    os.environ.setdefault("FEMINICIDE_API_KEY", "load-test")
+    parser = argparse.ArgumentParser(
+        description="Load test the dashboard pages with simulated users."
+    )
+    parser.add_argument("--users", type=int, default=5, help="simultaneous users")
+    parser.add_argument("--renders", type=int, default=5, help="pages per user")
+    parser.add_argument(
+        "--projects", type=int, default=20, help="projects in the seeded databases"
+    )
+    parser.add_argument(
+        "--page", choices=["home", "project"], help="only render this page"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="empty the query caches before renders"
+    )
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+    _allow_concurrent_app_tests()
+    page_choices = dict(home=[HOMEPAGE], project=[PROJECT_PAGE])
+    load_report = run_load_test(
+        args.users,
+        args.renders,
+        args.projects,
+        page_choices.get(args.page),
+        args.no_cache,
+        args.timeout,
+    )
+    _print_report(load_report)
+    sys.exit(0 if len(load_report["errors"]) == 0 else 1)
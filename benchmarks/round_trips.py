@@ -0,0 +1,210 @@
+"""
+Measure how much sending queries together in pipeline mode (see `base.batched`) saves when the dashboard is far from
+its database. This puts a proxy that delays all traffic in front of the story processor database, and then runs the
+story processor queries behind a project report three ways:
+
+- each query in its own transaction, waiting for each statement (how the dashboard used to run them)
+- each query on its own, pipelined (one round trip per query)
+- all the queries batched together (one round trip)
+
+Run it from the root of the repo against a local database filled by `benchmarks.seed_data`:
+
+    python -m benchmarks.round_trips postgresql:///load_processor --latency-ms 20
+"""
+
+import argparse
+import os
+import queue
+import socket
+import statistics
+import threading
+import time
+from functools import partial
+from typing import Callable, Dict, List
+
+import psycopg
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+# before anything imports the dashboard settings
+os.environ.setdefault("WARM_INTERVAL_SECS", "0")
+os.environ.setdefault("ALERTS_DB_URI", "postgresql://alerts-db.invalid/unused")
+
+import dashboard  # noqa: E402
+import dashboard.database.processor_db as processor_db  # noqa: E402
+from dashboard import PLATFORMS  # noqa: E402
+from dashboard.database import base  # noqa: E402
+
+
+class LatencyProxy:
+    """
+    Forwards connections on a local port to a database server, holding back everything sent each way for half the
+    round trip time - like a server in another datacenter.
+    """
+
+    def __init__(self, server_address, family: int, round_trip_secs: float):
+        """
+        :param server_address: what to connect the proxied connections to (a path for a unix socket)
+        :param family: socket.AF_INET or socket.AF_UNIX
+        """
+        self._server_address = server_address
+        self._family = family
+        self._delay_secs = round_trip_secs / 2
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+
+    def start(self) -> None:
+        threading.Thread(target=self._accept_forever, daemon=True).start()
+
+    def _accept_forever(self) -> None:
+        while True:
+            client, _ = self._listener.accept()
+            server = socket.socket(self._family, socket.SOCK_STREAM)
+            server.connect(self._server_address)
+            for s in [client, server]:
+                if s.family != socket.AF_UNIX:
+                    # send each message as soon as its delay is up, like the database and psycopg do
+                    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            for source, destination in [(client, server), (server, client)]:
+                chunks = queue.Queue()
+                threading.Thread(
+                    target=self._read, args=(source, chunks), daemon=True
+                ).start()
+                threading.Thread(
+                    target=self._write, args=(destination, chunks), daemon=True
+                ).start()
+
+    def _read(self, source: socket.socket, chunks: queue.Queue) -> None:
+        while True:
+            try:
+                data = source.recv(65536)
+            except OSError:
+                data = b""
+            chunks.put((time.perf_counter() + self._delay_secs, data))
+            if not data:
+                return
+
+    def _write(self, destination: socket.socket, chunks: queue.Queue) -> None:
+        while True:
+            due, data = chunks.get()
+            time.sleep(max(0.0, due - time.perf_counter()))
+            if not data:
+                destination.close()
+                return
+            try:
+                destination.sendall(data)
+            except OSError:
+                return
+
+
+def _proxy_in_front_of(uri: str, round_trip_secs: float) -> (LatencyProxy, str):
+    params = conninfo_to_dict(uri)
+    host, port = params.get("host") or "/tmp", int(params.get("port") or 5432)
+    if host.startswith("/"):
+        proxy = LatencyProxy(
+            os.path.join(host, ".s.PGSQL.{}".format(port)),
+            socket.AF_UNIX,
+            round_trip_secs,
+        )
+    else:
+        proxy = LatencyProxy((host, port), socket.AF_INET, round_trip_secs)
+    proxy.start()
+    return proxy, make_conninfo(uri, host="127.0.0.1", port=proxy.port)
+
+
+def project_report_calls(project_id: int) -> List[Callable]:
+    """
+    The story processor queries behind a project report (see warmer.warm_project).
+    """
+    calls = [
+        partial(processor_db.unposted_above_story_count, project_id),
+        partial(processor_db.posted_above_story_count, project_id),
+        partial(processor_db.below_story_count, project_id),
+        partial(processor_db.project_binned_model_scores, project_id),
+    ]
+    for func in [
+        processor_db.stories_by_posted_day,
+        processor_db.stories_by_published_day,
+        processor_db.stories_by_processed_day,
+    ]:
+        calls += [partial(func, project_id=project_id, platform=p) for p in PLATFORMS]
+    for above_threshold in [True, False]:
+        calls.append(
+            partial(
+                processor_db.stories_by_processed_day,
+                project_id=project_id,
+                above_threshold=above_threshold,
+            )
+        )
+    return calls
+
+
+def _unpipelined(conn: psycopg.Connection, queries: List[str]) -> None:
+    # what base.execute_query did before pipeline mode: BEGIN, SET, the query and COMMIT each wait for a reply
+    for query in queries:
+        with conn.transaction():
+            conn.execute("SET LOCAL statement_timeout = 30000")
+            conn.execute(query).fetchall()
+
+
+def _timed(func: Callable[[], None], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        processor_db._cache.clear()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def compare(
+    processor_db_uri: str, latency_ms: float, project_id: int = 1, repeat: int = 5
+) -> Dict:
+    """
+    :param latency_ms: round trip time to add to every message to and from the database
+    :return: median seconds for each way of running the queries, and how many queries there were
+    """
+    proxy, proxied_uri = _proxy_in_front_of(processor_db_uri, latency_ms / 1000)
+    dashboard.PROCESSOR_DB_URI = proxied_uri
+    calls = project_report_calls(project_id)
+    base.batched(calls)  # connect, and collect the SQL
+    queries = list(processor_db._cache._entries.keys())
+    with psycopg.connect(proxied_uri, autocommit=True) as conn:
+        unpipelined = _timed(partial(_unpipelined, conn, queries), repeat)
+    one_at_a_time = _timed(lambda: [call() for call in calls], repeat)
+    together = _timed(partial(base.batched, calls), repeat)
+    return dict(
+        queries=len(queries),
+        latency_ms=latency_ms,
+        unpipelined=unpipelined,
+        one_at_a_time=one_at_a_time,
+        batched=together,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare running dashboard queries one at a time and batched, under network latency."
+    )
+    parser.add_argument("processor_db_uri")
+    parser.add_argument(
+        "--latency-ms", type=float, default=20, help="round trip time to simulate"
+    )
+    parser.add_argument("--project", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    results = compare(args.processor_db_uri, args.latency_ms, args.project, args.repeat)
+    print(
+        "{queries} story processor queries for a project report, {latency_ms:.0f} ms round trips".format(
+            **results
+        )
+    )
+    for name, label in [
+        ("unpipelined", "separate transactions"),
+        ("one_at_a_time", "one round trip each"),
+        ("batched", "batched"),
+    ]:
+        print(
+            "{:<24} {:>7.3f} secs {:>6.1f}x".format(
+                label, results[name], results["unpipelined"] / results[name]
+            )
+        )
@@ -0,0 +1,161 @@
+"""
+Fill a pair of local, throwaway databases with synthetic stories and email alerts articles, shaped like the real ones
+closely enough to load test the dashboard against (see `benchmarks.load`). The tables only have the columns the
+dashboard reads. Run it from the root of the repo:
+
+    python -m benchmarks.seed_data postgresql:///story_processor_db postgresql:///email_alerts_db --projects 50
+
+The database URIs have to be given explicitly - this never reads them from the environment, so it can't write to a
+real server by accident.
+"""
+
+import argparse
+import logging
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ["media-cloud", "newscatcher", "wayback-machine", "newsdata.io"]
+
+_PROCESSOR_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stories (
+        id serial PRIMARY KEY, stories_id bigint, project_id int, model_score float, published_date timestamp,
+        queued_date timestamp, processed_date timestamp, posted_date timestamp, above_threshold bool, url text,
+        source text
+    )
+"""
+
+_ALERTS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS article_events (
+        id serial PRIMARY KEY, project_id int, is_relevant bool, created_at timestamp, updated_at timestamp
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS articles (
+        id serial PRIMARY KEY, project_id int, title text, source text, url text, publish_date timestamp,
+        created_at timestamp, media_name text, article_event_id int
+    )
+    """,
+]
+
+# every story goes to one of the projects, and a third of them are above threshold and posted to email alerts
+_STORIES = """
+    INSERT INTO stories (stories_id, project_id, model_score, published_date, queued_date, processed_date, posted_date,
+                         above_threshold, url, source)
+    SELECT g, 1 + (g % {projects}), random(),
+           now() - random() * interval '{days} days',
+           now() - random() * interval '{days} days',
+           now() - random() * interval '{days} days',
+           CASE WHEN g % 3 = 0 THEN now() - random() * interval '{days} days' END,
+           g % 3 = 0,
+           'https://www.example' || (g % 500) || '.com/news/story-' || g || '/',
+           (ARRAY{sources})[1 + g % {source_count}]
+    FROM generate_series({first}, {last}) g
+"""
+
+_EVENTS = """
+    INSERT INTO article_events (project_id, is_relevant, created_at, updated_at)
+    SELECT 1 + g % {projects}, CASE g % 3 WHEN 0 THEN true WHEN 1 THEN false END,
+           now() - random() * interval '{days} days',
+           now() - random() * interval '{days} days'
+    FROM generate_series({first}, {last}) g
+"""
+
+# articles are the posted stories (same urls), grouped into events a few at a time
+_ARTICLES = """
+    INSERT INTO articles (project_id, title, source, url, publish_date, created_at, media_name, article_event_id)
+    SELECT project_id, 'Story ' || stories_id, source, url, published_date, posted_date,
+           'example' || (stories_id % 500) || '.com', 1 + (stories_id / 9)
+    FROM stories
+    WHERE posted_date IS NOT NULL AND stories_id BETWEEN {first} AND {last}
+"""
+
+
+def seed(
+    processor_db_uri: str,
+    alerts_db_uri: str,
+    projects: int = 20,
+    stories: int = 100000,
+    days: int = 90,
+    reset: bool = False,
+) -> None:
+    """
+    :param stories: how many stories to add to the story processor database (about a third also go to email alerts)
+    :param reset: drop the tables first, instead of adding to whatever is already there
+    """
+    with psycopg.connect(processor_db_uri, autocommit=True) as processor_conn:
+        with psycopg.connect(alerts_db_uri, autocommit=True) as alerts_conn:
+            if reset:
+                processor_conn.execute("DROP TABLE IF EXISTS stories")
+                alerts_conn.execute("DROP TABLE IF EXISTS articles")
+                alerts_conn.execute("DROP TABLE IF EXISTS article_events")
+            processor_conn.execute(_PROCESSOR_SCHEMA)
+            for statement in _ALERTS_SCHEMA:
+                alerts_conn.execute(statement)
+            first = processor_conn.execute(
+                "SELECT COALESCE(MAX(stories_id), 0) + 1 FROM stories"
+            ).fetchone()[0]
+            last = first + stories - 1
+            params = dict(
+                projects=projects,
+                days=days,
+                sources=SOURCES,
+                source_count=len(SOURCES),
+                first=first,
+                last=last,
+            )
+            processor_conn.execute(_STORIES.format(**params))
+            alerts_conn.execute(
+                _EVENTS.format(**dict(params, first=1 + first // 9, last=1 + last // 9))
+            )
+            # the two databases can be on different servers, so copy the posted stories across in python
+            posted = processor_conn.execute(
+                "SELECT stories_id, project_id, source, url, published_date, posted_date FROM stories "
+                "WHERE posted_date IS NOT NULL AND stories_id BETWEEN %s AND %s",
+                (first, last),
+            ).fetchall()
+            with alerts_conn.cursor() as cursor:
+                cursor.execute(
+                    "CREATE TEMPORARY TABLE stories (stories_id bigint, project_id int, source text, url text, "
+                    "published_date timestamp, posted_date timestamp)"
+                )
+                with cursor.copy(
+                    "COPY stories (stories_id, project_id, source, url, published_date, posted_date) FROM STDIN"
+                ) as copy:
+                    for row in posted:
+                        copy.write_row(row)
+                cursor.execute(_ARTICLES.format(first=first, last=last))
+                cursor.execute("DROP TABLE stories")
+            for conn in [processor_conn, alerts_conn]:
+                conn.execute("ANALYZE")
+    logger.info(
+        "Added {} stories ({} posted) across {} projects".format(
+            stories, len(posted), projects
+        )
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Fill local databases with synthetic dashboard data."
+    )
+    parser.add_argument("processor_db_uri")
+    parser.add_argument("alerts_db_uri")
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--stories", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument(
+        "--reset", action="store_true", help="drop the tables first (DELETES DATA)"
+    )
+    args = parser.parse_args()
+    seed(
+        args.processor_db_uri,
+        args.alerts_db_uri,
+        args.projects,
+        args.stories,
+        args.days,
+        args.reset,
+    )
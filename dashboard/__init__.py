@@ -1,10 +1,7 @@
 import logging
 import os
-import sys
 
-import sentry_sdk
 from dotenv import load_dotenv
-from sentry_sdk.integrations.tornado import TornadoIntegration
 
 VERSION = "1.2.3"
 # SOURCE_GOOGLE_ALERTS = "google-alerts"
@@ -29,6 +26,10 @@ logger.info("Starting up Feminicide Dashboard v{}".format(VERSION))
 
 SENTRY_DSN = os.environ.get("SENTRY_DSN", None)  # optional
 if SENTRY_DSN:
+    # only pay the import cost if we're actually going to use it
+    import sentry_sdk
+    from sentry_sdk.integrations.tornado import TornadoIntegration
+
     sentry_sdk.init(
         dsn=SENTRY_DSN,
         integrations=[TornadoIntegration()],
@@ -41,29 +42,88 @@ if SENTRY_DSN:
 else:
     logger.info("  Not logging errors to Sentry")
 
-FEMINICIDE_API_URL = os.environ.get("FEMINICIDE_API_URL", None)
-if FEMINICIDE_API_URL is None:
-    logger.error(
-        "  ❌ No FEMINICIDE_API_URL is specified. Bailing because we can't list projects to run!"
-    )
-    sys.exit(1)
+# Required settings are validated lazily, the first time something asks for them (see `__getattr__` below). That
+# way importing the package doesn't bail on a partial config, and tests can import modules without live databases.
+_REQUIRED_SETTINGS = {
+    "FEMINICIDE_API_URL": "Bailing because we can't list projects to run!",
+    "FEMINICIDE_API_KEY": "Bailing because we can't send things to the main server without one",
+    "PROCESSOR_DB_URI": "Bailing because we can't query the story processor database",
+    "ALERTS_DB_URI": "Bailing because we can't query the email alerts database",
+}
+
+
+class MissingSettingError(RuntimeError):
+    pass
+
+
+def __getattr__(name: str) -> str:
+    """
+    Load a required setting from the environment the first time it is used (PEP 562 module-level getattr).
+    :raises MissingSettingError: if it isn't set - an exception rather than exiting, because this can happen in any
+                                 thread (ie. the cache warmer), where exiting would just end that thread quietly
+    """
+    if name not in _REQUIRED_SETTINGS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = os.environ.get(name, None)
+    if value is None:
+        message = "No {} is specified. {}".format(name, _REQUIRED_SETTINGS[name])
+        logger.error("  ❌ {}".format(message))
+        raise MissingSettingError(message)
+    globals()[name] = value  # so later lookups are plain attribute access
+    return value
+
+
+# optional - read replicas to send dashboard queries to, so they don't slow down the pipeline writing to the primaries
+PROCESSOR_DB_REPLICA_URI = os.environ.get("PROCESSOR_DB_REPLICA_URI") or None
+ALERTS_DB_REPLICA_URI = os.environ.get("ALERTS_DB_REPLICA_URI") or None
+# optional - read from the primary while a replica is more than this many secs behind it
+REPLICA_MAX_LAG_SECS = float(os.environ.get("REPLICA_MAX_LAG_SECS", 5 * 60))
+if PROCESSOR_DB_REPLICA_URI or ALERTS_DB_REPLICA_URI:
+    logger.info("  Reading from replicas while they are less than {} secs behind".format(REPLICA_MAX_LAG_SECS))
 else:
-    logger.info("  Config server at at {}".format(FEMINICIDE_API_URL))
+    logger.info("  No read replicas specified")
 
-FEMINICIDE_API_KEY = os.environ.get("FEMINICIDE_API_KEY", None)
-if FEMINICIDE_API_KEY is None:
-    logger.error(
-        "  ❌ No FEMINICIDE_API_KEY is specified. Bailing because we can't send things to the main server without one"
-    )
-    sys.exit(1)
+# optional - default time budget for each dashboard query, after which the database cancels it
+QUERY_TIMEOUT_SECS = float(os.environ.get("QUERY_TIMEOUT_SECS", 30))
+logger.info("  Cancelling queries after {} secs".format(QUERY_TIMEOUT_SECS))
+
+# optional - how often to precompute the Homepage and project queries in the background (0 disables warming)
+WARM_INTERVAL_SECS = int(os.environ.get("WARM_INTERVAL_SECS", 15 * 60))
+logger.info("  Warming caches every {} secs".format(WARM_INTERVAL_SECS))
+
+# optional - how much memory cached query results can use in total, and the biggest single result worth caching
+CACHE_MAX_MB = float(os.environ.get("CACHE_MAX_MB", 256))
+CACHE_MAX_ENTRY_MB = float(os.environ.get("CACHE_MAX_ENTRY_MB", 16))
+logger.info("  Caching up to {} MB of query results ({} MB each)".format(CACHE_MAX_MB, CACHE_MAX_ENTRY_MB))
+# optional - compress cached query results ("lz4" or "zstd"), trading some CPU on every read for even less memory
+CACHE_COMPRESSION = os.environ.get("CACHE_COMPRESSION") or None
+logger.info("  Cache compression: {}".format(CACHE_COMPRESSION))
+
+# optional - "snapshot" to answer every query from a local snapshot instead of the databases (see dashboard/snapshot.py)
+DASHBOARD_MODE = os.environ.get("DASHBOARD_MODE", "live").lower()
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR") or os.path.join(base_dir, "snapshot")
+logger.info("  Mode: {}{}".format(DASHBOARD_MODE, " (from {})".format(SNAPSHOT_DIR) if DASHBOARD_MODE == "snapshot" else ""))
+
+# optional - admins can profile a page by adding ?profile=<PROFILER_TOKEN> to its URL (see dashboard/profiler.py)
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN") or None
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(base_dir, "profiles")
+logger.info("  Page profiling: {}".format("enabled" if PROFILER_TOKEN else "disabled"))
 
-PROCESSOR_DB_URI = os.environ.get("PROCESSOR_DB_URI", None)
-if PROCESSOR_DB_URI is None:
-    logger.warning("  ❌ ️No PROCESSOR_DB_URI is specified")
-    sys.exit(1)
+# optional - where to remember when each visitor last looked, for the Homepage's "since your last visit" section (see
+# dashboard/last_visit.py)
+LAST_VISITS_FILE = os.environ.get("LAST_VISITS_FILE") or os.path.join(CONFIG_DIR, "last_visits.json")
+logger.info("  Remembering visits in {}".format(LAST_VISITS_FILE))
 
+# optional - refresh cached results as soon as their data changes, notified by the triggers in migrations/ (see
+# dashboard/database/invalidation.py), instead of every few minutes
+LISTEN_FOR_CHANGES = os.environ.get("LISTEN_FOR_CHANGES", "false").lower() in ["true", "1", "yes"]
+logger.info("  Listening for database changes: {}".format(LISTEN_FOR_CHANGES))
+# optional - refresh each cached result at most this often when its data changes, so a pipeline run writing new rows
+# every few seconds doesn't keep re-running the same queries
+MIN_REFRESH_SECS = float(os.environ.get("MIN_REFRESH_SECS", 60))
+if LISTEN_FOR_CHANGES:
+    logger.info("  Refreshing changed results at most every {} secs".format(MIN_REFRESH_SECS))
 
-ALERTS_DB_URI = os.environ.get("ALERTS_DB_URI", None)
-if ALERTS_DB_URI is None:
-    logger.warning("  ❌ ️No ALERTS_DB_URI is specified")
-    sys.exit(1)
+# optional - show estimated totals and distinct counts by default, which are much cheaper than exact ones on big tables
+APPROXIMATE_COUNTS = os.environ.get("APPROXIMATE_COUNTS", "false").lower() in ["true", "1", "yes"]
+logger.info("  Approximate counts by default: {}".format(APPROXIMATE_COUNTS))
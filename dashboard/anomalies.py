@@ -0,0 +1,153 @@
+"""
+Spot a platform that has quietly stopped (or nearly stopped) delivering stories for a project, without anyone having
+to notice a missing bar in a chart.
+
+Every project's daily story counts from every platform come back from one grouped query, and go into a
+(project, platform) x day matrix. Each day is scored against a rolling baseline - the median and spread of the days
+before it - for all the series at once with array operations, so this is cheap enough to run on every Homepage load for
+hundreds of projects. Once a series drops, the rest of the drop is scored against the baseline from before it started,
+so an outage can't become its own baseline however long it goes on. A series is flagged when its most recent complete
+days are all far below their baselines.
+"""
+
+import datetime as dt
+import logging
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import dashboard.database.processor_db as processor_db
+from dashboard.database.columnar import ColumnarResults, to_dataframe
+
+logger = logging.getLogger(__name__)
+
+BASELINE_DAYS = 14  # how many days before each day to compare it with
+MIN_BASELINE = 5  # stories per day - series quieter than this are too noisy to judge
+MAX_SCORE = -3.0  # how many standard deviations below its baseline a day has to be to count as a drop
+MIN_DAYS = 2  # how many days in a row, up to yesterday, a series has to be down to be flagged
+
+
+def count_matrix(df: pd.DataFrame, first_day: dt.date, last_day: dt.date) -> Tuple[pd.MultiIndex, np.ndarray]:
+    """
+    Turn `project_id, platform, day, stories` rows into a matrix of story counts, with a row for each (project_id,
+    platform) and a column for each day from `first_day` to `last_day`. Days without a row count as zero.
+    :return: the (project_id, platform) of each row of the matrix, and the matrix
+    """
+    days = pd.date_range(first_day, last_day, freq="D")
+    if len(df) == 0:
+        return pd.MultiIndex.from_tuples([], names=["project_id", "platform"]), np.zeros((0, len(days)))
+    matrix = df.pivot_table(
+        index=["project_id", "platform"], columns="day", values="stories", aggfunc="sum", fill_value=0, observed=True
+    ).reindex(columns=days, fill_value=0)
+    return matrix.index, matrix.to_numpy(dtype=float)
+
+
+def rolling_baseline(counts: np.ndarray, window: int = BASELINE_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The median of the `window` days before each day, and their spread (the median absolute deviation, scaled to be
+    comparable to a standard deviation), for every series at once.
+    :return: two (series x days) arrays, NaN for the first `window` days, which don't have a full baseline
+    """
+    median = np.full(counts.shape, np.nan)
+    spread = np.full(counts.shape, np.nan)
+    if counts.shape[1] > window:
+        # series x day x the days before it (a view, nothing is copied)
+        before = np.lib.stride_tricks.sliding_window_view(counts[:, :-1], window, axis=1)
+        median[:, window:] = np.median(before, axis=2)
+        spread[:, window:] = 1.4826 * np.median(np.abs(before - median[:, window:, np.newaxis]), axis=2)
+    return median, spread
+
+
+def drop_scores(counts: np.ndarray, median: np.ndarray, spread: np.ndarray) -> np.ndarray:
+    """
+    How many standard deviations each day is above (or below) its baseline. Counts are at least as noisy as a Poisson
+    process, so the spread used is never less than the square root of the median (or 1).
+    """
+    return (counts - median) / np.sqrt(np.fmax(np.fmax(spread**2, median), 1))
+
+
+def hold_baseline_during_drops(
+    counts: np.ndarray,
+    median: np.ndarray,
+    spread: np.ndarray,
+    min_baseline: float = MIN_BASELINE,
+    max_score: float = MAX_SCORE,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score each day against its rolling baseline, except during a run of dropped days, which are all scored against the
+    baseline of the day the run started (the rolling one would soon be made of the drop itself). A day is a drop when it
+    is `max_score` or further below its baseline, or when nothing came in at all (which a quiet series can't get that
+    far below), as long as the baseline is at least `min_baseline`. Goes through the days one at a time, but for all
+    the series at once.
+    :return: three (series x days) arrays - the baseline median each day was scored against, its score, and whether it
+             was a drop
+    """
+    held_median, held_spread = median.copy(), spread.copy()
+    scores = np.full(counts.shape, np.nan)
+    dropped = np.zeros(counts.shape, dtype=bool)
+    for day in range(counts.shape[1]):
+        if day > 0:
+            # carry the baseline forward for the series that were down the day before
+            running = dropped[:, day - 1]
+            held_median[running, day] = held_median[running, day - 1]
+            held_spread[running, day] = held_spread[running, day - 1]
+        scores[:, day] = drop_scores(counts[:, day], held_median[:, day], held_spread[:, day])
+        dropped[:, day] = ((scores[:, day] <= max_score) | (counts[:, day] == 0)) & (
+            held_median[:, day] >= min_baseline
+        )
+    return held_median, scores, dropped
+
+
+def find_drops(
+    rows: Union[List[Dict], ColumnarResults],
+    today: dt.date = None,
+    window: int = BASELINE_DAYS,
+    min_baseline: float = MIN_BASELINE,
+    max_score: float = MAX_SCORE,
+    min_days: int = MIN_DAYS,
+) -> List[Dict]:
+    """
+    Find the (project, platform) series whose story counts have dropped well below their rolling baselines for the
+    last `min_days` complete days (today is left out, it isn't over yet).
+    :param rows: see `processor_db.story_counts_by_project_platform_day`
+    :return: one dict per flagged series, biggest drops first - when the drop started, the daily stories before it
+             (the baseline the day it started) and since, and the latest score
+    """
+    today = today or dt.date.today()
+    last_day = pd.Timestamp(today - dt.timedelta(days=1))
+    df = to_dataframe(rows)
+    if len(df) == 0:
+        return []
+    df["day"] = pd.to_datetime(df["day"])
+    days = (df["day"].min(), last_day)
+    series, counts = count_matrix(df[df["day"] <= last_day], *days)
+    median, spread = rolling_baseline(counts, window)
+    median, scores, dropped = hold_baseline_during_drops(counts, median, spread, min_baseline, max_score)
+    # how many days in a row each series has been down, counting back from the last day
+    run_lengths = np.cumprod(dropped[:, ::-1], axis=1).sum(axis=1)
+    flagged = np.flatnonzero(run_lengths >= min_days)
+    dates = pd.date_range(*days, freq="D").date
+    drops = []
+    for i in flagged:
+        start = counts.shape[1] - run_lengths[i]
+        project_id, platform = series[i]
+        drops.append(
+            dict(
+                project_id=int(project_id),
+                platform=platform,
+                since=dates[start],
+                days=int(run_lengths[i]),
+                baseline_per_day=round(float(median[i, start]), 1),
+                recent_per_day=round(float(counts[i, start:].mean()), 1),
+                score=round(float(scores[i, -1]), 1),
+            )
+        )
+    return sorted(drops, key=lambda d: d["score"])
+
+
+def ingestion_drops(days: int = 30) -> List[Dict]:
+    """
+    UI: find platforms that have stopped delivering stories for a project, from the last `days` of story counts.
+    """
+    return find_drops(processor_db.story_counts_by_project_platform_day(limit=days))
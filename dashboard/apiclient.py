@@ -2,7 +2,7 @@ from typing import Dict
 
 import requests
 
-from dashboard import FEMINICIDE_API_KEY, FEMINICIDE_API_URL
+import dashboard
 
 
 def get_projects_list() -> Dict:
@@ -10,7 +10,7 @@ def get_projects_list() -> Dict:
     The main server holds configuraiton and models - get the list.
     :return:
     """
-    path = FEMINICIDE_API_URL + "/api/story_processor/projects.json"
+    path = dashboard.FEMINICIDE_API_URL + "/api/story_processor/projects.json"
     return _get_json(path)
 
 
@@ -19,12 +19,12 @@ def get_language_models_list() -> Dict:
     Each project can refer to one or two models - get them all.
     :return:
     """
-    path = FEMINICIDE_API_URL + "/api/story_processor/language_models.json"
+    path = dashboard.FEMINICIDE_API_URL + "/api/story_processor/language_models.json"
     return _get_json(path)
 
 
 def _get_json(path: str) -> Dict:
-    params = dict(apikey=FEMINICIDE_API_KEY)
+    params = dict(apikey=dashboard.FEMINICIDE_API_KEY)
     r = requests.get(
         path, params, timeout=(3.05 * 20) * 10
     )  # docs say set it to slightly larger than a multiple of 3, so 10ish minutes
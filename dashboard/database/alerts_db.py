@@ -1,31 +1,125 @@
 import datetime as dt
 import logging
-from typing import Dict, List
-import pandas as pd
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import psycopg
 from psycopg.rows import dict_row
-import streamlit as st
 
-from dashboard import ALERTS_DB_URI
+import dashboard
+from dashboard import (
+    ALERTS_DB_REPLICA_URI,
+    CACHE_COMPRESSION,
+    LISTEN_FOR_CHANGES,
+    MIN_REFRESH_SECS,
+    QUERY_TIMEOUT_SECS,
+    REPLICA_MAX_LAG_SECS,
+    snapshot,
+)
+from dashboard.database import base, columnar, invalidation, routing, search
+from dashboard.database.cache import QueryCache
+from dashboard.database.routing import ReadRouter
+from dashboard.hyperloglog import HyperLogLog, sql_registers
 
 logger = logging.getLogger(__name__)
 
+# serve cached results for a while, refreshing them in the background after the soft TTL (when we're listening for
+# changes, results are refreshed as soon as their data changes, so the TTLs are just a backstop)
+_cache = QueryCache(
+    soft_ttl=12 * 60 * 60 if LISTEN_FOR_CHANGES else 15 * 60,
+    hard_ttl=24 * 60 * 60 if LISTEN_FOR_CHANGES else 1 * 60 * 60,
+    name="alerts",
+    budget=base.cache_budget,
+    min_refresh_secs=MIN_REFRESH_SECS,
+)
 
-@st.cache_resource  # so it only run once
-def init_connection():
-    return psycopg.connect(ALERTS_DB_URI, row_factory=dict_row)
 
+# reads go to the replica if there is one (connecting the first time a query needs it)
+_router = ReadRouter(
+    "alerts",
+    lambda: dashboard.ALERTS_DB_URI,
+    ALERTS_DB_REPLICA_URI,
+    REPLICA_MAX_LAG_SECS,
+)
 
-db_conn = init_connection()
 
+def _loader(query: str, timeout_secs: float) -> Callable[..., List[Dict]]:
+    def load(after_lsn: Optional[str] = None):
+        # when refreshing after a change, only read from the replica once it has the change
+        route = None if after_lsn is None else _router.route_after(after_lsn)
+        return columnar.compact(_router.execute(query, timeout_secs, route), CACHE_COMPRESSION)
 
-@st.cache_data(ttl=1 * 60 * 60)  # so we cache data for a while
-def _run_query(query: str) -> List[Dict]:
-    dict_cursor = db_conn.cursor()
-    dict_cursor.execute(query)
-    results = dict_cursor.fetchall()
-    return results
+    return load
+
+
+def _run_query(query: str, timeout_secs: float = QUERY_TIMEOUT_SECS) -> List[Dict]:
+    """
+    Run a query (cached), and have the database cancel it if it runs longer than `timeout_secs`. If it does time out
+    we return the last results we got for it instead (as `base.StaleResults`), so the page still renders. Bigger results
+    are cached (and returned) as `columnar.ColumnarResults`.
+    """
+    label = base.caller_name()
+    if base.collecting() and not _cache.is_cached(query):
+        base.defer_to_batch(_prefetch, query, (label, timeout_secs))
+    try:
+        return _cache.get(query, _loader(query, timeout_secs), label)
+    except psycopg.errors.QueryCanceled:
+        return base.fall_back_to_stale(_cache, query, timeout_secs)
+
+
+def _prefetch(queries: Dict[str, Tuple[str, float]]) -> None:
+    """
+    Load the queries `base.batched` collected into the cache, with one round trip for each time budget (there's
+    usually just one).
+    :param queries: query -> (label, timeout_secs)
+    """
+    by_timeout: Dict[float, Dict[str, str]] = {}
+    for query, (label, timeout_secs) in queries.items():
+        if not _cache.is_cached(query):
+            by_timeout.setdefault(timeout_secs, {})[query] = label
+    for timeout_secs, labels in by_timeout.items():
+        try:
+            results = _router.execute_batch(list(labels.keys()), timeout_secs)
+        except psycopg.Error as e:
+            # one failing (ie. timing out) fails them all, so they'll run one at a time instead, each with its own
+            # error handling
+            logger.warning("Couldn't run {} queries together: {}".format(len(labels), e))
+            continue
+        for (query, label), rows in zip(labels.items(), results):
+            _cache.put(query, columnar.compact(rows, CACHE_COMPRESSION), _loader(query, timeout_secs), label)
+
+
+def invalidate(changes: List[Dict], lsn: Optional[str] = None) -> int:
+    """
+    Refresh the cached results that the changes (see `invalidation.parse_change`) could have affected.
+    :param lsn: the primary's write-ahead log position after the changes, so the refreshes can wait for the replica to
+                have them (instead of reading stale results from it)
+    :return: how many are being refreshed
+    """
+    return _cache.invalidate(
+        lambda query: invalidation.affected(query, changes),
+        None if lsn is None else dict(after_lsn=lsn),
+    )
+
+
+def change_listener() -> invalidation.ChangeListener:
+    """
+    A listener (not started yet) that refreshes cached results as the data behind them changes.
+    """
+    return invalidation.ChangeListener(
+        "alerts", lambda: _router.uri(routing.PRIMARY), invalidate
+    )
+
+
+def _stream_query(query: str, chunk_size: int = 10000) -> Iterator[Dict]:
+    """
+    Run a query through a server-side cursor, yielding rows as they arrive in chunks. For results too big to hold in
+    memory at once, so these are never cached. Uses its own connection so it doesn't hold up the shared one.
+    """
+    with psycopg.connect(_router.uri(_router.route()), row_factory=dict_row) as conn:
+        with conn.cursor(name="dashboard_stream") as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(query)
+            yield from cursor
 
 
 
@@ -35,6 +129,7 @@ def _run_count_query(query: str) -> int:
 
 
 # In alerts_db.py
+@snapshot.snapshottable
 def total_story_count(project_id: int = None) -> int:
     if project_id is not None:
         query = f"SELECT COUNT(1) FROM articles WHERE project_id = {project_id}"
@@ -44,6 +139,22 @@ def total_story_count(project_id: int = None) -> int:
     return result[0]["count"] if result else 0
 
 
+@snapshot.snapshottable
+def estimated_story_count(project_id: int = None) -> Optional[int]:
+    """
+    Estimate `total_story_count` from the table statistics instead of scanning the table: the catalog's row count for
+    the whole table, or the query planner's row estimate for one project. None if the table has never been analyzed.
+    """
+    if project_id is None:
+        query = "SELECT reltuples::bigint AS count FROM pg_class WHERE oid = 'articles'::regclass"
+        count = _run_query(query)[0]["count"]
+    else:
+        query = f"EXPLAIN (FORMAT JSON) SELECT 1 FROM articles WHERE project_id = {project_id}"
+        count = _run_query(query)[0]["QUERY PLAN"][0]["Plan"]["Plan Rows"]
+    return None if count < 0 else int(count)
+
+
+@snapshot.snapshottable
 def top_media_sources_by_story_volume_22(
     project_id: int = None, limit: int = 10
 ) -> List:
@@ -81,6 +192,7 @@ def _alerts_by_date_col(
     return _run_query(query)
 
 
+@snapshot.snapshottable
 def stories_by_publish_date(
     project_id: str = None,
     limit: int = 45,
@@ -88,12 +200,14 @@ def stories_by_publish_date(
     return _alerts_by_date_col("publish_date", project_id, limit)
 
 
+@snapshot.snapshottable
 def stories_by_creation_date(
     project_id: str = None,
     limit: int = 45,
 ) -> List:
     return _alerts_by_date_col("created_at", project_id, limit)
 
+@snapshot.snapshottable
 def recent_articles(project_id: int, limit: int = 100) -> List:
     """
     UI: show a list of the most recent articles in email alerts for a specific project
@@ -117,6 +231,115 @@ def recent_articles(project_id: int, limit: int = 100) -> List:
     return _run_query(query)
 
 
+@snapshot.snapshottable
+def articles_page(
+    project_id: int,
+    source: str = None,
+    after: Dict = None,
+    page_size: int = 50,
+) -> List:
+    """
+    UI: browse all of a project's articles in email alerts, newest first, one page at a time. This uses keyset
+    pagination on (publish_date, id) so deep pages are as fast as the first one (with an index on those columns).
+    :param after: the last article on the previous page (None for the first page)
+    """
+    clauses = [f"project_id = {project_id}", "publish_date IS NOT NULL"]
+    if source is not None:
+        clauses.append(f"source = '{source}'")
+    if after is not None:
+        clauses.append(
+            f"(publish_date, id) < ('{after['publish_date']}', {int(after['id'])})"
+        )
+    query = (
+        f"SELECT id, title, source, url, publish_date "
+        f"FROM articles "
+        f"WHERE {' AND '.join(clauses)} "
+        f"ORDER BY publish_date DESC, id DESC "
+        f"LIMIT {page_size};"
+    )
+    return _run_query(query)
+
+
+def search_articles(
+    project_id: int,
+    text: str,
+    language: str = None,
+    after: Dict = None,
+    page_size: int = 50,
+) -> List:
+    """
+    UI: find a project's articles in email alerts by URL or by words in their title (see `search`), newest first, one
+    page at a time. This uses keyset pagination on id.
+    :param language: the project's language, to pick the text search config for titles
+    :param after: the last article on the previous page (None for the first page)
+    """
+    text = text.strip()
+    if search.is_url(text):
+        match = f"url = {search.literal(text)}"
+    else:
+        config = search.text_search_config(language)
+        # the same expression as the index on titles for this config (see migrations/)
+        matches = [
+            f"to_tsvector('{config}', coalesce(title, '')) @@ websearch_to_tsquery('{config}', {search.literal(text)})"
+        ]
+        if len(text) >= search.MIN_FRAGMENT_LENGTH:
+            matches.append(f"url ILIKE {search.contains_pattern(text)}")
+        match = f"({' OR '.join(matches)})"
+    clauses = [f"project_id = {project_id}", match]
+    if after is not None:
+        clauses.append(f"id < {int(after['id'])}")
+    query = (
+        f"SELECT id, title, source, url, publish_date "
+        f"FROM articles "
+        f"WHERE {' AND '.join(clauses)} "
+        f"ORDER BY id DESC "
+        f"LIMIT {page_size};"
+    )
+    return _run_query(query)
+
+
+def new_article_counts(since: dt.datetime) -> List[Dict]:
+    """
+    UI: how many articles each project has had added to email alerts since a time. Only the articles created after it
+    are read (with an index on created_at).
+    """
+    query = (
+        f"SELECT project_id, COUNT(*) AS new_articles "
+        f"FROM articles "
+        f"WHERE created_at > '{since}'::TIMESTAMP "
+        f"GROUP BY project_id "
+        f"ORDER BY project_id;"
+    )
+    return _run_query(query)
+
+
+def articles_since(
+    project_id: int,
+    since: dt.datetime,
+    after: Dict = None,
+    page_size: int = 50,
+) -> List:
+    """
+    UI: a project's articles added to email alerts since a time, oldest first, one page at a time. This uses keyset
+    pagination on (created_at, id), starting from `since`, so only the articles after it are read.
+    :param after: the last article on the previous page (None for the first page)
+    """
+    clauses = [f"project_id = {project_id}", f"created_at > '{since}'::TIMESTAMP"]
+    if after is not None:
+        clauses.append(
+            f"(created_at, id) > ('{after['created_at']}', {int(after['id'])})"
+        )
+    query = (
+        f"SELECT id, title, source, url, publish_date, created_at "
+        f"FROM articles "
+        f"WHERE {' AND '.join(clauses)} "
+        f"ORDER BY created_at ASC, id ASC "
+        f"LIMIT {page_size};"
+    )
+    return _run_query(query)
+
+
+@snapshot.snapshottable
 def event_counts_by_creation_date(
         project_id: int = None,
         limit: int = 45
@@ -142,6 +365,76 @@ def event_counts_by_creation_date(
     )
     return _run_query(query)
 
+
+def event_sketches_by_creation_date(
+        project_id: int = None,
+        limit: int = 45,
+        precision: int = 10,
+) -> Dict[dt.date, HyperLogLog]:
+    """
+    HyperLogLog sketches of the distinct article_event_id values created each day. Only the sketch registers come back
+    from the database, and sketches can be merged to count distinct events over any range of days.
+    """
+    earliest_date = dt.date.today() - dt.timedelta(days=limit)
+
+    clauses = []
+    if project_id is not None:
+        clauses.append(f"project_id = {project_id}")
+
+    query = (
+        f"SELECT day, array_agg(bucket) AS buckets, array_agg(rank) AS ranks "
+        f"FROM ("
+        f"    SELECT day, bucket, MAX(rank) AS rank "
+        f"    FROM ("
+        f"        SELECT created_at::date AS day, {sql_registers('article_event_id', precision)} "
+        f"        FROM articles "
+        f"        WHERE created_at IS NOT NULL "
+        f"          AND article_event_id IS NOT NULL "
+        f"          AND created_at >= '{earliest_date}'::DATE "
+        f"        {' AND ' + ' AND '.join(clauses) if clauses else ''} "
+        f"    ) AS hashed "
+        f"    GROUP BY day, bucket"
+        f") AS registers "
+        f"GROUP BY day "
+        f"ORDER BY day DESC;"
+    )
+    return {
+        row["day"]: HyperLogLog.from_registers(precision, row["buckets"], row["ranks"])
+        for row in _run_query(query)
+    }
+
+
+@snapshot.snapshottable
+def approximate_event_counts_by_creation_date(
+        project_id: int = None,
+        limit: int = 45
+) -> List[Dict]:
+    """
+    Like `event_counts_by_creation_date`, but estimated from HyperLogLog sketches (see `event_sketches_by_creation_date`).
+    """
+    sketches = event_sketches_by_creation_date(project_id, limit)
+    return [dict(day=day, unique_event_count=sketch.count(), relative_error=sketch.relative_error)
+            for day, sketch in sketches.items()]
+
+
+@snapshot.snapshottable
+def approximate_event_count(
+        project_id: int = None,
+        days: int = 7
+) -> Dict:
+    """
+    Estimate the distinct events created over the last `days`, by merging the daily sketches.
+    """
+    # by calendar day - days without any events don't come back at all
+    earliest_date = dt.date.today() - dt.timedelta(days=days)
+    merged = HyperLogLog()
+    # the default window (which the graph of them uses too, so it's usually cached already) unless that's too short
+    for day, sketch in event_sketches_by_creation_date(project_id, limit=max(days, 45)).items():
+        if day >= earliest_date:
+            merged = merged.merge(sketch)
+    return dict(count=merged.count(), relative_error=merged.relative_error)
+
+@snapshot.snapshottable
 def relevance_counts_by_project(
         project_id: int = None,
         limit: int = 45
@@ -166,4 +459,82 @@ def relevance_counts_by_project(
         f"  AND updated_at >= '{earliest_date}'::DATE "
         f"{' AND ' + ' AND '.join(clauses) if clauses else ''};"
     )
-    return _run_query(query)
\ No newline at end of file
+    return _run_query(query)
+
+
+@snapshot.snapshottable
+def relevance_counts_by_period(
+        period: str = "week",
+        limit: int = 182
+) -> List[Dict]:
+    """
+    Relevancy counts per project per day or week (by updated_at, like `relevance_counts_by_project`), for every
+    project in one pass over article_events. `events` counts them all - every article event is from an above
+    threshold story - and the yes/no/null counts split them by how they were judged.
+    """
+    if period not in ("day", "week"):
+        raise ValueError(f"Unsupported period: {period}")
+    earliest_date = dt.date.today() - dt.timedelta(days=limit)
+    if period == "week":
+        # start on a Monday, so the first week isn't a partial one
+        earliest_date -= dt.timedelta(days=earliest_date.weekday())
+
+    query = (
+        f"SELECT date_trunc('{period}', updated_at)::date AS period, "
+        f"    project_id, "
+        f"    COUNT(*) AS events, "
+        f"    COUNT(*) FILTER (WHERE is_relevant = TRUE) AS yes_count, "
+        f"    COUNT(*) FILTER (WHERE is_relevant = FALSE) AS no_count, "
+        f"    COUNT(*) FILTER (WHERE is_relevant IS NULL) AS null_count "
+        f"FROM article_events "
+        f"WHERE updated_at IS NOT NULL "
+        f"  AND updated_at >= '{earliest_date}'::DATE "
+        f"GROUP BY 1, 2 "
+        f"ORDER BY 1 DESC, 2;"
+    )
+    return _run_query(query, base.ALL_PROJECTS_TIMEOUT_SECS)
+
+
+@snapshot.snapshottable
+def funnel_counts_by_project_platform(
+        limit: int = 30
+) -> List[Dict]:
+    """
+    How many articles each project got in email alerts from each platform (by creation day) over the last `limit`
+    days, how many distinct events they were grouped into, and how many of those events were marked relevant - for
+    every project at once. The email alerts half of the pipeline funnel (see `funnel`). An event can have articles
+    from several platforms, so each project also gets a row for all its platforms together (`all_platforms`), with
+    each event counted once.
+    """
+    earliest_date = dt.date.today() - dt.timedelta(days=limit)
+
+    query = (
+        f"SELECT a.project_id, "
+        f"    a.source AS platform, "
+        f"    GROUPING(a.source) = 1 AS all_platforms, "
+        f"    COUNT(*) AS in_alerts, "
+        f"    COUNT(DISTINCT a.article_event_id) AS events, "
+        f"    COUNT(DISTINCT a.article_event_id) FILTER (WHERE e.is_relevant = TRUE) AS relevant_events "
+        f"FROM articles a "
+        f"LEFT JOIN article_events e ON e.id = a.article_event_id "
+        f"WHERE a.created_at >= '{earliest_date}'::DATE "
+        f"GROUP BY GROUPING SETS ((a.project_id, a.source), (a.project_id)) "
+        f"ORDER BY 1, 2;"
+    )
+    return _run_query(query, base.ALL_PROJECTS_TIMEOUT_SECS)
+
+
+def article_urls(project_id: int, since: dt.date) -> Iterator[Dict]:
+    """
+    Stream the url and creation day of every article in email alerts since a date, sorted by url (in byte order, so
+    it matches python's string ordering). Used to reconcile against the story processor database.
+    """
+    query = (
+        f"SELECT url, created_at::date AS day "
+        f"FROM articles "
+        f"WHERE project_id = {project_id} "
+        f"  AND created_at >= '{since}'::DATE "
+        f"  AND url IS NOT NULL "
+        f'ORDER BY url COLLATE "C";'
+    )
+    return _stream_query(query)
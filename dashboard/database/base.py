@@ -0,0 +1,176 @@
+"""
+Query plumbing shared by the story processor and email alerts database modules.
+"""
+
+import datetime as dt
+import logging
+import sys
+import threading
+from typing import Any, Callable, Dict, List
+
+import psycopg
+
+from dashboard import CACHE_MAX_ENTRY_MB, CACHE_MAX_MB, QUERY_TIMEOUT_SECS
+from dashboard.database.cache import MemoryBudget, QueryCache
+
+logger = logging.getLogger(__name__)
+
+# one memory budget for both databases' query caches, so together they can't grow until the server runs out of memory
+cache_budget = MemoryBudget(
+    max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+    max_entry_bytes=int(CACHE_MAX_ENTRY_MB * 1024 * 1024),
+)
+
+
+# time budgets for the most expensive aggregates, scaled from the default one: the ones covering every project at once
+# are shared by every page (and warmed in the background), so they're worth waiting longer for, while the per-project
+# diagnostic charts are extras a page can do without - they fall back to their last results rather than hold up a
+# database connection for long
+ALL_PROJECTS_TIMEOUT_SECS = 2 * QUERY_TIMEOUT_SECS
+DIAGNOSTIC_TIMEOUT_SECS = QUERY_TIMEOUT_SECS / 2
+
+
+class QueryTimeoutError(ValueError):
+    """
+    A query went over its time budget and there was no earlier result to fall back to. This is a ValueError so the
+    pages' existing "couldn't draw this section" error handling covers it.
+    """
+
+
+class StaleResults(list):
+    """
+    Query results we fell back to because the fresh query timed out. Charts use `stale_as_of` to show a badge.
+    """
+
+    def __init__(self, results: List[Dict], stale_as_of: dt.datetime):
+        super().__init__(results)
+        self.stale_as_of = stale_as_of
+
+
+def caller_name() -> str:
+    """
+    The nearest public function up the stack (ie. "processor_db.stories_by_posted_day"), to break down cache memory
+    use by what the queries are for.
+    """
+    frame = sys._getframe(1)
+    while (frame is not None) and frame.f_code.co_name.startswith(("_", "<")):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return "{}.{}".format(
+        frame.f_globals["__name__"].rsplit(".", 1)[-1], frame.f_code.co_name
+    )
+
+
+def execute_query(
+    conn: psycopg.Connection, query: str, timeout_secs: float
+) -> List[Dict]:
+    """
+    Run a query in its own transaction, with a server-side statement timeout so Postgres cancels it (and stops
+    using resources on it) if it runs longer than `timeout_secs`.
+    :raises psycopg.errors.QueryCanceled: if the query ran over its time budget
+    """
+    return execute_queries(conn, [query], timeout_secs)[0]
+
+
+def execute_queries(
+    conn: psycopg.Connection, queries: List[str], timeout_secs: float
+) -> List[List[Dict]]:
+    """
+    Run queries in one transaction, each with the statement timeout `execute_query` uses. Everything (including the
+    BEGIN, the timeout and the COMMIT) is sent in pipeline mode, so it takes one network round trip however many
+    queries there are.
+    :return: each query's results, in order
+    :raises psycopg.errors.QueryCanceled: if any of the queries ran over its time budget
+    """
+    # an explicit BEGIN and COMMIT, because `conn.transaction()` waits for the server at the start and the end
+    try:
+        with conn.pipeline():
+            conn.execute("BEGIN")
+            conn.execute(
+                "SET LOCAL statement_timeout = {}".format(int(timeout_secs * 1000))
+            )
+            cursors = [conn.execute(query) for query in queries]
+            conn.execute("COMMIT")
+    except psycopg.Error:
+        if not conn.broken:
+            conn.rollback()  # the failed transaction, so the connection can be used again
+        raise
+    return [cursor.fetchall() for cursor in cursors]
+
+
+class _Deferred(Exception):
+    """
+    Stops a call that `batched` is collecting queries from, once its query has been handed over.
+    """
+
+
+_collecting = threading.local()
+
+
+def batched(calls: List[Callable[[], Any]]) -> List[Any]:
+    """
+    UI: make the calls a page section needs (ie. `functools.partial(processor_db.below_story_count, project_id)`),
+    sending the queries they need to each database together, in one round trip, instead of one after the other.
+    Each call is made once to collect the query it would run, and then again once the results are all cached. A
+    call that runs several queries in turn only gets its first uncached one batched (the rest run as usual).
+    :return: each call's result, in order
+    """
+    if collecting():
+        return [call() for call in calls]
+    _collecting.queries = {}
+    try:
+        for call in calls:
+            try:
+                call()
+            except Exception:
+                pass  # _Deferred once its query is collected (anything else will be raised again below)
+        collected = _collecting.queries
+    finally:
+        _collecting.queries = None
+    for prefetch, queries in collected.items():
+        prefetch(queries)
+    return [call() for call in calls]
+
+
+def collecting() -> bool:
+    """
+    Whether `batched` is collecting queries on this thread.
+    """
+    return getattr(_collecting, "queries", None) is not None
+
+
+def defer_to_batch(
+    prefetch: Callable[[Dict[str, Any]], None], query: str, details: Any
+) -> None:
+    """
+    Called by the database modules instead of running an uncached query while `batched` is collecting. This hands
+    the query over to it, and stops the call.
+    :param prefetch: loads a batch of queries into the cache (called with a dict of query -> details)
+    :param details: whatever else `prefetch` needs to run the query
+    """
+    _collecting.queries.setdefault(prefetch, {})[query] = details
+    raise _Deferred()
+
+
+def fall_back_to_stale(
+    cache: QueryCache, query: str, timeout_secs: float
+) -> StaleResults:
+    """
+    Called when a query times out - return the last results we got for it, however old, or raise if there aren't any.
+    """
+    cached = cache.peek(query)
+    if cached is None:
+        logger.warning(
+            "Query timed out after {} secs with no earlier results: {}".format(
+                timeout_secs, query
+            )
+        )
+        raise QueryTimeoutError("Query timed out after {} secs".format(timeout_secs))
+    results, loaded_at = cached
+    logger.warning(
+        "Query timed out after {} secs, using results from {}: {}".format(
+            timeout_secs, loaded_at, query
+        )
+    )
+    return StaleResults(results, loaded_at)
@@ -0,0 +1,374 @@
+"""
+An in-memory, stale-while-revalidate cache for query results.
+
+Each entry has a soft and a hard TTL. Before the soft TTL it is served as-is. Between the soft and hard TTLs it is
+still served immediately, but one background refresh is started so the next person gets fresh data. After the hard TTL
+callers have to wait for a fresh load. Whenever a key is being loaded, anyone else asking for it waits on that one load
+instead of running the same query again (single-flight), so a popular expired entry can't stampede the database.
+
+Entries can also be invalidated when the data behind them changes (see `invalidation`), which refreshes them in the
+background the same way - but no more often than `min_refresh_secs`, so a stream of changes can't keep re-running the
+same queries.
+
+Caches can share a `MemoryBudget`, which measures roughly how much memory each entry takes and evicts the least
+recently used entries (from whichever cache) once the total goes over budget.
+"""
+
+import datetime as dt
+import functools
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# shared by all the caches, so background refreshes can't use more than a few database connections' worth of work
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+# measuring every row of a big result is slow, and the rows of one query result are all much the same size
+_SIZE_SAMPLE = 1000
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Roughly how many bytes `value` takes up, including what it contains. Long lists are measured from a sample, and
+    anything with an `nbytes` (ie. `columnar.ColumnarResults`) is trusted to know its own size.
+    """
+    if hasattr(value, "nbytes"):
+        return sys.getsizeof(value) + value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)) and len(value) > 0:
+        sample = value if len(value) <= _SIZE_SAMPLE else list(value)[:_SIZE_SAMPLE]
+        sample_size = sum(estimate_size(v) for v in sample)
+        size += sample_size * len(value) // len(sample)
+    return size
+
+
+class _Entry:
+    __slots__ = [
+        "value",
+        "loader",
+        "loaded_at",
+        "loaded_at_wall",
+        "refreshed_at",
+        "last_used",
+        "size",
+        "label",
+    ]
+
+    def __init__(
+        self,
+        value: Any,
+        loader: Callable[[], Any],
+        loaded_at: float,
+        size: int,
+        label: str,
+    ):
+        self.value = value
+        self.loader = loader  # to refresh it when it is invalidated
+        self.loaded_at = loaded_at
+        self.loaded_at_wall = dt.datetime.now()
+        self.refreshed_at = loaded_at  # unlike loaded_at, not wound back when it is invalidated
+        self.last_used = loaded_at
+        self.size = size
+        self.label = label
+
+
+class MemoryBudget:
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        """
+        :param max_bytes: total size of all the entries in all the caches using this budget
+        :param max_entry_bytes: results bigger than this are returned but never cached (ie. exports)
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._caches: List["QueryCache"] = []
+        self._lock = threading.Lock()
+
+    def register(self, cache: "QueryCache") -> None:
+        with self._lock:
+            self._caches.append(cache)
+
+    def used_bytes(self) -> int:
+        return sum(c.size_bytes for c in self._caches)
+
+    def usage(self) -> List[Dict]:
+        """
+        How many entries, and how many bytes, each cache is holding for each function that uses it.
+        """
+        return [
+            dict(cache=c.name, function=label, **usage)
+            for c in self._caches
+            for label, usage in c.usage_by_label().items()
+        ]
+
+    def enforce(self) -> None:
+        """
+        Evict least recently used entries, across all the caches, until we are within budget.
+        """
+        # takes one cache's lock at a time (and never while a cache holds its own), so caches can't deadlock here
+        with self._lock:
+            while self.used_bytes() > self.max_bytes:
+                oldest, oldest_cache = None, None
+                for cache in self._caches:
+                    last_used = cache.least_recently_used_at()
+                    if (last_used is not None) and (
+                        (oldest is None) or (last_used < oldest)
+                    ):
+                        oldest, oldest_cache = last_used, cache
+                if oldest_cache is None:
+                    return
+                oldest_cache.evict_least_recently_used()
+
+
+class QueryCache:
+    def __init__(
+        self,
+        soft_ttl: float,
+        hard_ttl: float,
+        keep_stale_for: float = 24 * 60 * 60,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = None,
+        budget: MemoryBudget = None,
+        min_refresh_secs: float = 0,
+    ):
+        """
+        :param soft_ttl: seconds after which an entry is refreshed in the background (but still served)
+        :param hard_ttl: seconds after which an entry is no longer served, and callers wait for a fresh load
+        :param keep_stale_for: seconds to keep expired entries around, so `peek` can offer them as a fallback
+        :param clock: for testing
+        :param name: to tell caches apart in `MemoryBudget.usage`
+        :param budget: the memory budget this cache shares with others (no limit if None)
+        :param min_refresh_secs: an entry invalidated sooner than this after it was loaded is refreshed once this long
+                                 after it was loaded (and served as it is until then) instead of straight away
+        """
+        self.name = name
+        self._soft_ttl = soft_ttl
+        self._hard_ttl = hard_ttl
+        self._keep_stale_for = keep_stale_for
+        self._clock = clock
+        self._budget = budget
+        self._min_refresh_secs = min_refresh_secs
+        # least recently used first
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        # invalidated entries waiting out `min_refresh_secs` -> the loader arguments to refresh them with
+        self._scheduled: Dict[Hashable, Optional[Dict]] = {}
+        self._lock = threading.Lock()
+        self._last_purge = clock()
+        self.size_bytes = 0
+        if budget is not None:
+            budget.register(self)
+
+    def get(self, key: Hashable, loader: Callable[[], Any], label: str = None) -> Any:
+        """
+        Return the cached value for `key`, calling `loader` to (re)load it when needed.
+        :param label: what the entry is for, to break down memory use by (ie. the function running the query)
+        :raises: whatever `loader` raised, if we had to wait for it and it failed
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            age = None if entry is None else self._clock() - entry.loaded_at
+            if entry is not None:
+                entry.last_used = self._clock()
+                self._entries.move_to_end(key)
+            if (entry is not None) and (age < self._soft_ttl):
+                return entry.value
+            future = self._in_flight.get(key)
+            we_load = future is None
+            if we_load:
+                future = Future()
+                self._in_flight[key] = future
+        if (entry is not None) and (age < self._hard_ttl):
+            # stale but still usable: serve it now, and make sure one refresh is running
+            if we_load:
+                _refresher.submit(self._load, key, loader, future, label)
+            return entry.value
+        if we_load:
+            self._load(key, loader, future, label)
+        return future.result()
+
+    def is_cached(self, key: Hashable) -> bool:
+        """
+        Whether `get` would answer right away (with a fresh, or stale but still usable, entry) instead of loading.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry is not None) and (
+                self._clock() - entry.loaded_at < self._hard_ttl
+            )
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        loader: Callable[[], Any],
+        label: str = None,
+    ) -> None:
+        """
+        Cache a value that was loaded some other way (ie. together with others, in one round trip).
+        :param loader: what `get` would have loaded it with, to refresh it with later
+        """
+        self._store(key, value, loader, label)
+        if self._budget is not None:
+            self._budget.enforce()
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, dt.datetime]]:
+        """
+        The value for `key` however old it is, and when it was loaded, without loading anything (None if missing).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else (entry.value, entry.loaded_at_wall)
+
+    def invalidate(
+        self,
+        predicate: Callable[[Hashable], bool],
+        loader_kwargs: Optional[Dict] = None,
+    ) -> int:
+        """
+        Refresh, in the background, the entries whose keys `predicate` picks. Until the new results are in, the old
+        ones are still served (as if they were past their soft TTL).
+        :param loader_kwargs: keyword arguments to call the entries' loaders with for this refresh (ie. to only read
+                              from a replica that has the changes)
+        :return: how many entries are being (or will soon be) refreshed
+        """
+        picked, refreshes = 0, []
+        with self._lock:
+            now = self._clock()
+            for key, entry in self._entries.items():
+                if not predicate(key):
+                    continue
+                picked += 1
+                if key in self._scheduled:
+                    self._scheduled[key] = loader_kwargs  # the latest changes are the ones it has to include
+                    continue
+                wait = entry.refreshed_at + self._min_refresh_secs - now
+                if wait > 0:
+                    self._scheduled[key] = loader_kwargs
+                    timer = threading.Timer(wait, self._refresh_scheduled, [key])
+                    timer.daemon = True
+                    timer.start()
+                    continue
+                refreshes += self._start_refresh(key, entry, loader_kwargs)
+        self._submit(refreshes)
+        return picked
+
+    def _refresh_scheduled(self, key: Hashable) -> None:
+        with self._lock:
+            loader_kwargs = self._scheduled.pop(key, None)
+            entry = self._entries.get(key)
+            refreshes = [] if entry is None else self._start_refresh(key, entry, loader_kwargs)
+        self._submit(refreshes)
+
+    def _start_refresh(self, key: Hashable, entry: _Entry, loader_kwargs: Optional[Dict]) -> List[Tuple]:
+        # called with the lock held
+        entry.loaded_at = min(entry.loaded_at, self._clock() - self._soft_ttl)
+        if key in self._in_flight:
+            return []
+        future = Future()
+        self._in_flight[key] = future
+        refresh = entry.loader if not loader_kwargs else functools.partial(entry.loader, **loader_kwargs)
+        return [(key, refresh, future, entry.label, entry.loader)]
+
+    def _submit(self, refreshes: List[Tuple]) -> None:
+        for key, refresh, future, label, loader in refreshes:
+            _refresher.submit(self._load, key, refresh, future, label, loader)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def usage_by_label(self) -> Dict[str, Dict]:
+        usage: Dict[str, Dict] = {}
+        with self._lock:
+            for entry in self._entries.values():
+                totals = usage.setdefault(entry.label, dict(entries=0, bytes=0))
+                totals["entries"] += 1
+                totals["bytes"] += entry.size
+        return usage
+
+    def least_recently_used_at(self) -> Optional[float]:
+        with self._lock:
+            if len(self._entries) == 0:
+                return None
+            return next(iter(self._entries.values())).last_used
+
+    def evict_least_recently_used(self) -> None:
+        with self._lock:
+            if len(self._entries) > 0:
+                _, entry = self._entries.popitem(last=False)
+                self.size_bytes -= entry.size
+
+    def _load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        future: Future,
+        label: Optional[str] = None,
+        keep_loader: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            logger.warning("Couldn't load {}: {}".format(key, e))
+            future.set_exception(e)
+            return
+        self._store(key, value, keep_loader or loader, label, finished_loading=True)
+        future.set_result(value)
+        if self._budget is not None:
+            self._budget.enforce()
+
+    def _store(
+        self,
+        key: Hashable,
+        value: Any,
+        loader: Callable[[], Any],
+        label: Optional[str],
+        finished_loading: bool = False,
+    ) -> None:
+        size = estimate_size(value) if self._budget is not None else 0
+        cacheable = (self._budget is None) or (size <= self._budget.max_entry_bytes)
+        if not cacheable:
+            logger.info(
+                "Not caching {} results ({} bytes): {}".format(label, size, key)
+            )
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous.size
+            if cacheable:
+                self._entries[key] = _Entry(
+                    value, loader, self._clock(), size, label or ""
+                )
+                self.size_bytes += size
+            if finished_loading:
+                self._in_flight.pop(key, None)
+            self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        # called with the lock held; a full sweep at most once a minute is plenty
+        now = self._clock()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        expired = [
+            k
+            for k, e in self._entries.items()
+            if now - e.loaded_at > self._keep_stale_for
+        ]
+        for k in expired:
+            self.size_bytes -= self._entries.pop(k).size
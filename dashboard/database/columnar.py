@@ -0,0 +1,128 @@
+"""
+Compact, columnar storage for cached query results.
+
+Query results come back from psycopg as a list of dicts - one dict (and one copy of every column name) per row. Caching
+them as Arrow tables instead takes a fraction of the memory, especially with repetitive text columns (like `source`)
+dictionary-encoded. Rows are only decoded when something reads them, and charts can skip the rows altogether by
+building their DataFrame straight from the table (see `to_dataframe`).
+"""
+
+import logging
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+# pyarrow and pandas are only imported once there are results to store, because together they'd add about a third of
+# a second to every module that imports this one (see benchmarks/import_time.py)
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# smaller results take so little memory that converting them isn't worth it
+MIN_ROWS = 20
+
+# text columns with fewer distinct values than this fraction of the rows are stored as dictionaries (categoricals)
+DICTIONARY_RATIO = 0.5
+
+
+class ColumnarResults(Sequence):
+    """
+    A read-only sequence of result rows (dicts), stored as an Arrow table that is optionally compressed.
+    """
+
+    def __init__(self, table: "pa.Table", compression: Optional[str] = None):
+        """
+        :param compression: an Arrow IPC codec (ie. "lz4" or "zstd") to compress the table with, or None
+        """
+        import pyarrow as pa
+
+        self._num_rows = table.num_rows
+        self._table = None
+        self._compressed = None
+        if compression is None:
+            self._table = table
+        else:
+            sink = pa.BufferOutputStream()
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+            self._compressed = sink.getvalue()
+
+    @property
+    def table(self) -> "pa.Table":
+        import pyarrow as pa
+
+        if self._table is not None:
+            return self._table
+        # decompressed each time it is needed, so only the compressed copy stays in memory
+        return pa.ipc.open_stream(self._compressed).read_all()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory used by the stored data (see `cache.estimate_size`).
+        """
+        return self._table.nbytes if self._table is not None else self._compressed.size
+
+    def to_pandas(self) -> "pd.DataFrame":
+        # dictionary columns become pandas categoricals
+        return self.table.to_pandas()
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict, List[Dict]]:
+        if isinstance(index, slice):
+            return self.table.to_pylist()[index]
+        if index < 0:
+            index += self._num_rows
+        if not 0 <= index < self._num_rows:
+            raise IndexError("result row out of range")
+        return self.table.slice(index, 1).to_pylist()[0]
+
+    def __iter__(self):
+        for batch in self.table.to_batches():
+            yield from batch.to_pylist()
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return "<ColumnarResults {} rows, {} bytes>".format(self._num_rows, self.nbytes)
+
+
+def compact(
+    rows: List[Dict], compression: Optional[str] = None
+) -> Union[List[Dict], ColumnarResults]:
+    """
+    Convert query results to `ColumnarResults`, if that is worthwhile and they fit in an Arrow table. Otherwise return
+    them unchanged.
+    """
+    if len(rows) < MIN_ROWS:
+        return rows
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        table = pa.Table.from_pylist(rows)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        logger.debug("Caching results as rows, they don't fit in a table: {}".format(e))
+        return rows
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type):
+            column = table.column(i)
+            if pc.count_distinct(column).as_py() < DICTIONARY_RATIO * table.num_rows:
+                table = table.set_column(i, field.name, column.dictionary_encode())
+    return ColumnarResults(table, compression)
+
+
+def to_dataframe(results: Union[List[Dict], ColumnarResults]) -> "pd.DataFrame":
+    """
+    A DataFrame of query results, built straight from the columns when they are `ColumnarResults`.
+    """
+    import pandas as pd
+
+    if isinstance(results, ColumnarResults):
+        return results.to_pandas()
+    return pd.DataFrame(results)
@@ -0,0 +1,103 @@
+"""
+Lightweight, in-process record of the queries the dashboard runs: which database (and which server for it) each one
+went to, how long it took, and how long it waited for the shared connection first.
+"""
+
+import datetime as dt
+import logging
+import threading
+from collections import deque
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+TIMED_OUT = "timed out"
+
+
+class QueryStats:
+    def __init__(self, keep_recent: int = 200, keep_waits: int = 10000):
+        self._lock = threading.Lock()
+        self._totals: Dict[tuple, Dict] = {}
+        self._recent = deque(maxlen=keep_recent)
+        self._waits = deque(maxlen=keep_waits)
+
+    def _totals_for(self, database: str, route: str) -> Dict:
+        # called with the lock held
+        return self._totals.setdefault(
+            (database, route),
+            dict(queries=0, secs=0.0, wait_secs=0.0, timeouts=0, fallbacks=0),
+        )
+
+    def record(
+        self,
+        database: str,
+        route: str,
+        secs: float,
+        query: str,
+        note: str = None,
+        query_count: int = 1,
+    ) -> None:
+        """
+        :param database: ie. "processor" or "alerts"
+        :param route: which server the query ran on (ie. "primary" or "replica")
+        :param note: why it went there, if that's unusual (ie. "replica failed")
+        :param query_count: how many queries `query` is, when several were sent together
+        """
+        logger.debug(
+            "{} query on {} took {:.3f} secs{}".format(
+                database, route, secs, f" ({note})" if note else ""
+            )
+        )
+        with self._lock:
+            totals = self._totals_for(database, route)
+            totals["queries"] += query_count
+            totals["secs"] += secs
+            if note == TIMED_OUT:
+                totals["timeouts"] += 1
+            elif note:
+                totals["fallbacks"] += 1
+            self._recent.append(
+                dict(
+                    at=dt.datetime.now(),
+                    database=database,
+                    route=route,
+                    secs=secs,
+                    note=note,
+                    query=query,
+                )
+            )
+
+    def record_wait(self, database: str, route: str, secs: float) -> None:
+        """
+        :param secs: how long a query waited for its turn on the shared connection
+        """
+        with self._lock:
+            self._totals_for(database, route)["wait_secs"] += secs
+            self._waits.append(secs)
+
+    def waits(self) -> List[float]:
+        """
+        The most recent connection wait times, in seconds.
+        """
+        with self._lock:
+            return list(self._waits)
+
+    def totals(self) -> List[Dict]:
+        with self._lock:
+            return [
+                dict(database=db, route=route, **totals)
+                for (db, route), totals in self._totals.items()
+            ]
+
+    def recent(self) -> List[Dict]:
+        with self._lock:
+            return list(self._recent)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._totals.clear()
+            self._recent.clear()
+            self._waits.clear()
+
+
+query_stats = QueryStats()  # shared by all the database modules
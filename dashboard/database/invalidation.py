@@ -0,0 +1,172 @@
+"""
+Refresh cached query results as soon as the data behind them changes, instead of waiting for their TTLs.
+
+Triggers on the tables the dashboard reads (see migrations/) send a notification on the `dashboard_changes` channel
+for each project a write touched, with the latest day it touched:
+
+    {"table": "stories", "project_id": 12, "latest_day": "2024-06-01"}
+
+The pipeline can also send these itself after writing a batch (`SELECT pg_notify('dashboard_changes', '...')`).
+A `ChangeListener` thread per database LISTENs for them, and refreshes the cached results they could have changed:
+those that read that table, for that project (or for all projects), over a date range that includes that day.
+Everything else stays cached. Notifications only come from the primary, so this listens there even when reads go to
+a replica - and passes on how far the primary's write-ahead log had got when they arrived, so the refreshes can wait
+for the replica to replay the changes instead of reading them from the primary.
+"""
+
+import datetime as dt
+import functools
+import json
+import logging
+import re
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "dashboard_changes"
+
+# a change to anything (ie. after reconnecting, when we might have missed notifications)
+EVERYTHING = dict(table=None, project_id=None, latest_day=None)
+
+_TABLE = re.compile(r"\b(?:from|join)\s+(\w+)", re.IGNORECASE)
+_PROJECT_ID = re.compile(r"\bproject_id\s*=\s*(\d+)", re.IGNORECASE)
+_EARLIEST_DATE = re.compile(r">=\s*'(\d{4}-\d{2}-\d{2})'::date", re.IGNORECASE)
+
+
+def parse_change(payload: str) -> Dict:
+    """
+    Read a notification's payload. Anything missing (or unreadable) is taken to mean it could be anything.
+    """
+    try:
+        change = json.loads(payload)
+        return dict(
+            table=change.get("table"),
+            project_id=change.get("project_id"),
+            latest_day=(
+                dt.date.fromisoformat(change["latest_day"])
+                if change.get("latest_day")
+                else None
+            ),
+        )
+    except (ValueError, TypeError, AttributeError):
+        logger.warning("Unreadable change notification: {}".format(payload))
+        return EVERYTHING
+
+
+@functools.lru_cache(maxsize=4096)
+def query_scope(query: str) -> Tuple[FrozenSet[str], Optional[int], Optional[dt.date]]:
+    """
+    What a (cached) query reads, from its SQL: the tables, the one project it is for (None if it isn't filtered to
+    one), and the earliest day it covers (None if it has no lower bound on a date).
+    """
+    project_ids = set(_PROJECT_ID.findall(query))
+    earliest_dates = _EARLIEST_DATE.findall(query)
+    return (
+        frozenset(t.lower() for t in _TABLE.findall(query)),
+        int(project_ids.pop()) if len(project_ids) == 1 else None,
+        (
+            min(dt.date.fromisoformat(d) for d in earliest_dates)
+            if earliest_dates
+            else None
+        ),
+    )
+
+
+def affected(query: str, changes: List[Dict]) -> bool:
+    """
+    Whether any of the changes could change the results of the query.
+    """
+    tables, project_id, earliest_date = query_scope(query)
+    for change in changes:
+        if (change["table"] is not None) and (change["table"] not in tables):
+            continue
+        if None not in (change["project_id"], project_id) and (
+            change["project_id"] != project_id
+        ):
+            continue
+        if None not in (change["latest_day"], earliest_date) and (
+            change["latest_day"] < earliest_date
+        ):
+            continue
+        return True
+    return False
+
+
+def _current_lsn(conn: psycopg.Connection) -> str:
+    return conn.execute("SELECT pg_current_wal_lsn()::text").fetchone()[0]
+
+
+class ChangeListener:
+    def __init__(
+        self,
+        database: str,
+        uri: Callable[[], str],
+        on_changes: Callable[[List[Dict], Optional[str]], int],
+        batch_secs: float = 2,
+        retry_secs: float = 30,
+    ):
+        """
+        :param database: name to use in logs (ie. "processor")
+        :param uri: returns the URI of the primary to listen on
+        :param on_changes: called with each batch of changes and the primary's write-ahead log position after them,
+                           returns how many cached results it refreshed
+        :param batch_secs: how long to collect notifications for before acting on them, so a burst of writes only
+                           refreshes each result once
+        :param retry_secs: how long to wait before reconnecting after losing the connection
+        """
+        self.database = database
+        self._uri = uri
+        self._on_changes = on_changes
+        self._batch_secs = batch_secs
+        self._retry_secs = retry_secs
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._listen_forever,
+            name="{}-change-listener".format(self.database),
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _listen_forever(self) -> None:
+        reconnecting = False
+        while True:
+            try:
+                with psycopg.connect(self._uri(), autocommit=True) as conn:
+                    conn.execute("LISTEN {}".format(CHANNEL))
+                    logger.info(
+                        "Listening for changes to the {} database".format(self.database)
+                    )
+                    if reconnecting:
+                        # we might have missed notifications while we were disconnected
+                        self._handle([EVERYTHING], _current_lsn(conn))
+                    while True:
+                        # wait for one, then collect whatever else comes in shortly after it
+                        notifies = list(conn.notifies(stop_after=1))
+                        notifies += list(conn.notifies(timeout=self._batch_secs))
+                        # notifications are only sent once their transactions commit, so this is past all of them
+                        self._handle([parse_change(n.payload) for n in notifies], _current_lsn(conn))
+            except psycopg.Error as e:
+                logger.warning(
+                    "Stopped listening for changes to the {} database, retrying in {} secs: {}".format(
+                        self.database, self._retry_secs, e
+                    )
+                )
+            reconnecting = True
+            time.sleep(self._retry_secs)
+
+    def _handle(self, changes: List[Dict], lsn: str) -> None:
+        try:
+            refreshed = self._on_changes(changes, lsn)
+            logger.info(
+                "{} changes to the {} database, refreshing {} cached results".format(
+                    len(changes), self.database, refreshed
+                )
+            )
+        except Exception as e:
+            logger.exception(e)
@@ -1,33 +1,131 @@
 import datetime as dt
 import logging
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 
 import psycopg
 from psycopg.rows import dict_row
-import streamlit as st
 
-from dashboard import PROCESSOR_DB_URI
+import dashboard
+from dashboard import (
+    CACHE_COMPRESSION,
+    LISTEN_FOR_CHANGES,
+    MIN_REFRESH_SECS,
+    PLATFORMS,
+    PROCESSOR_DB_REPLICA_URI,
+    QUERY_TIMEOUT_SECS,
+    REPLICA_MAX_LAG_SECS,
+    snapshot,
+)
+from dashboard.database import base, columnar, invalidation, routing, search
+from dashboard.database.cache import QueryCache
+from dashboard.database.routing import ReadRouter
 
 logger = logging.getLogger(__name__)
 
+# serve cached results for a while, refreshing them in the background after the soft TTL (when we're listening for
+# changes, results are refreshed as soon as their data changes, so the TTLs are just a backstop)
+_cache = QueryCache(
+    soft_ttl=12 * 60 * 60 if LISTEN_FOR_CHANGES else 1 * 60 * 60,
+    hard_ttl=24 * 60 * 60 if LISTEN_FOR_CHANGES else 6 * 60 * 60,
+    name="processor",
+    budget=base.cache_budget,
+    min_refresh_secs=MIN_REFRESH_SECS,
+)
 
-@st.cache_resource  # so it only run once
-def init_connection():
-    return psycopg.connect(PROCESSOR_DB_URI, row_factory=dict_row)
+EXPORT_TIMEOUT_SECS = 5 * 60  # exports pull every story in a project, so they get a bigger time budget
 
 
-db_conn = init_connection()
+# reads go to the replica if there is one (connecting the first time a query needs it)
+_router = ReadRouter(
+    "processor",
+    lambda: dashboard.PROCESSOR_DB_URI,
+    PROCESSOR_DB_REPLICA_URI,
+    REPLICA_MAX_LAG_SECS,
+)
 
 
-@st.cache_data(ttl=6 * 60 * 60)  # so we cache data for a while
-def _run_query(query: str) -> List[Dict]:
-    dict_cursor = db_conn.cursor()
-    dict_cursor.execute(query)
-    results = dict_cursor.fetchall()
-    return results
+def _loader(query: str, timeout_secs: float) -> Callable[..., List[Dict]]:
+    def load(after_lsn: Optional[str] = None):
+        # when refreshing after a change, only read from the replica once it has the change
+        route = None if after_lsn is None else _router.route_after(after_lsn)
+        return columnar.compact(_router.execute(query, timeout_secs, route), CACHE_COMPRESSION)
 
+    return load
 
+
+def _run_query(query: str, timeout_secs: float = QUERY_TIMEOUT_SECS) -> List[Dict]:
+    """
+    Run a query (cached), and have the database cancel it if it runs longer than `timeout_secs`. If it does time out
+    we return the last results we got for it instead (as `base.StaleResults`), so the page still renders. Bigger results
+    are cached (and returned) as `columnar.ColumnarResults`.
+    """
+    label = base.caller_name()
+    if base.collecting() and not _cache.is_cached(query):
+        base.defer_to_batch(_prefetch, query, (label, timeout_secs))
+    try:
+        return _cache.get(query, _loader(query, timeout_secs), label)
+    except psycopg.errors.QueryCanceled:
+        return base.fall_back_to_stale(_cache, query, timeout_secs)
+
+
+def _prefetch(queries: Dict[str, Tuple[str, float]]) -> None:
+    """
+    Load the queries `base.batched` collected into the cache, with one round trip for each time budget (there's
+    usually just one).
+    :param queries: query -> (label, timeout_secs)
+    """
+    by_timeout: Dict[float, Dict[str, str]] = {}
+    for query, (label, timeout_secs) in queries.items():
+        if not _cache.is_cached(query):
+            by_timeout.setdefault(timeout_secs, {})[query] = label
+    for timeout_secs, labels in by_timeout.items():
+        try:
+            results = _router.execute_batch(list(labels.keys()), timeout_secs)
+        except psycopg.Error as e:
+            # one failing (ie. timing out) fails them all, so they'll run one at a time instead, each with its own
+            # error handling
+            logger.warning("Couldn't run {} queries together: {}".format(len(labels), e))
+            continue
+        for (query, label), rows in zip(labels.items(), results):
+            _cache.put(query, columnar.compact(rows, CACHE_COMPRESSION), _loader(query, timeout_secs), label)
+
+
+def invalidate(changes: List[Dict], lsn: Optional[str] = None) -> int:
+    """
+    Refresh the cached results that the changes (see `invalidation.parse_change`) could have affected.
+    :param lsn: the primary's write-ahead log position after the changes, so the refreshes can wait for the replica to
+                have them (instead of reading stale results from it)
+    :return: how many are being refreshed
+    """
+    return _cache.invalidate(
+        lambda query: invalidation.affected(query, changes),
+        None if lsn is None else dict(after_lsn=lsn),
+    )
+
+
+def change_listener() -> invalidation.ChangeListener:
+    """
+    A listener (not started yet) that refreshes cached results as the data behind them changes.
+    """
+    return invalidation.ChangeListener(
+        "processor", lambda: _router.uri(routing.PRIMARY), invalidate
+    )
+
+
+def _stream_query(query: str, chunk_size: int = 10000) -> Iterator[Dict]:
+    """
+    Run a query through a server-side cursor, yielding rows as they arrive in chunks. For results too big to hold in
+    memory at once, so these are never cached. Uses its own connection so it doesn't hold up the shared one.
+    """
+    with psycopg.connect(_router.uri(_router.route()), row_factory=dict_row) as conn:
+        with conn.cursor(name="dashboard_stream") as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(query)
+            yield from cursor
+
+
+@snapshot.snapshottable
 def recent_stories(project_id: int, above_threshold: bool, limit: int = 5) -> List:
     """
     UI: show a list of the most recent stories we have processed
@@ -43,6 +141,146 @@ def recent_stories(project_id: int, above_threshold: bool, limit: int = 5) -> Li
     return _run_query(sql)
 
 
+@snapshot.snapshottable
+def stories_page(
+    project_id: int,
+    platform: str = None,
+    above_threshold: bool = None,
+    is_posted: bool = None,
+    after: Dict = None,
+    page_size: int = 50,
+) -> List:
+    """
+    UI: browse all of a project's stories, newest first, one page at a time. This uses keyset pagination on
+    (published_date, id) so deep pages are as fast as the first one (with an index on those columns).
+    :param after: the last story on the previous page (None for the first page)
+    """
+    clauses = ["(project_id={})".format(project_id), "(published_date is not Null)"]
+    if platform is not None:
+        clauses.append("(source='{}')".format(platform))
+    if above_threshold is not None:
+        clauses.append(
+            "(above_threshold is {})".format("True" if above_threshold else "False")
+        )
+    if is_posted is not None:
+        clauses.append("(posted_date {} Null)".format("is not" if is_posted else "is"))
+    if after is not None:
+        clauses.append(
+            "((published_date, id) < ('{}', {}))".format(
+                after["published_date"], int(after["id"])
+            )
+        )
+    query = """
+        SELECT id, stories_id, source, url, published_date, processed_date, posted_date, above_threshold, model_score
+        FROM stories
+        WHERE {}
+        ORDER BY published_date DESC, id DESC
+        LIMIT {}
+    """.format(
+        " AND ".join(clauses), page_size
+    )
+    return _run_query(query)
+
+
+def search_stories(
+    project_id: int,
+    text: str,
+    language: str = None,
+    after: Dict = None,
+    page_size: int = 50,
+) -> List:
+    """
+    UI: find a project's stories by URL or by words in their title (see `search` - stories don't have titles here, so
+    that's the words in their URL), newest first, one page at a time. This uses keyset pagination on id.
+    :param language: the project's language, to pick the text search config for titles
+    :param after: the last story on the previous page (None for the first page)
+    """
+    text = text.strip()
+    if search.is_url(text):
+        match = "(url = {})".format(search.literal(text))
+    else:
+        config = search.text_search_config(language)
+        # the same expression as the index on URL words for this config (see migrations/)
+        matches = [
+            "(to_tsvector('{config}', {words}) @@ websearch_to_tsquery('{config}', {text}))".format(
+                config=config, words=search.URL_WORDS, text=search.literal(text)
+            )
+        ]
+        if len(text) >= search.MIN_FRAGMENT_LENGTH:
+            matches.append("(url ILIKE {})".format(search.contains_pattern(text)))
+        match = "({})".format(" OR ".join(matches))
+    clauses = ["(project_id={})".format(project_id), match]
+    if after is not None:
+        clauses.append("(id < {})".format(int(after["id"])))
+    query = """
+        SELECT id, stories_id, source, url, published_date, processed_date, posted_date, above_threshold, model_score
+        FROM stories
+        WHERE {}
+        ORDER BY id DESC
+        LIMIT {}
+    """.format(
+        " AND ".join(clauses), page_size
+    )
+    return _run_query(query)
+
+
+def new_story_counts(since: dt.datetime) -> List:
+    """
+    UI: how many stories each project has had processed above threshold, and posted to the main server, since a time.
+    Only the stories processed or posted after it are read (with indexes on processed_date and posted_date).
+    """
+    query = """
+        SELECT project_id,
+               count(1) FILTER (WHERE (processed_date > '{since}'::timestamp) AND above_threshold) AS new_above_threshold,
+               count(1) FILTER (WHERE posted_date > '{since}'::timestamp) AS newly_posted
+        FROM stories
+        WHERE (processed_date > '{since}'::timestamp) OR (posted_date > '{since}'::timestamp)
+        GROUP BY project_id
+        ORDER BY project_id
+    """.format(
+        since=since
+    )
+    return _run_query(query)
+
+
+def stories_since(
+    project_id: int,
+    since: dt.datetime,
+    posted: bool = False,
+    after: Dict = None,
+    page_size: int = 50,
+) -> List:
+    """
+    UI: a project's stories processed above threshold (or posted to the main server, if `posted`) since a time,
+    oldest first, one page at a time. This uses keyset pagination on (processed_date, id) or (posted_date, id),
+    starting from `since`, so only the stories after it are read.
+    :param after: the last story on the previous page (None for the first page)
+    """
+    column_name = "posted_date" if posted else "processed_date"
+    clauses = [
+        "(project_id={})".format(project_id),
+        "({} > '{}'::timestamp)".format(column_name, since),
+    ]
+    if not posted:
+        clauses.append("(above_threshold is True)")
+    if after is not None:
+        clauses.append(
+            "(({}, id) > ('{}', {}))".format(
+                column_name, after[column_name], int(after["id"])
+            )
+        )
+    query = """
+        SELECT id, stories_id, source, url, published_date, processed_date, posted_date, above_threshold, model_score
+        FROM stories
+        WHERE {}
+        ORDER BY {} ASC, id ASC
+        LIMIT {}
+    """.format(
+        " AND ".join(clauses), column_name, page_size
+    )
+    return _run_query(query)
+
+
 def _stories_by_date_col(
     column_name: str,
     project_id: int = None,
@@ -75,6 +313,7 @@ def _stories_by_date_col(
     return _run_query(query)
 
 
+@snapshot.snapshottable
 def stories_by_posted_day(
     project_id: int = None,
     platform: str = None,
@@ -87,6 +326,7 @@ def stories_by_posted_day(
     )
 
 
+@snapshot.snapshottable
 def stories_by_processed_day(
     project_id: int = None,
     platform: str = None,
@@ -99,6 +339,7 @@ def stories_by_processed_day(
     )
 
 
+@snapshot.snapshottable
 def stories_by_published_day(
     project_id: int = None,
     platform: str = None,
@@ -111,25 +352,16 @@ def stories_by_published_day(
     )
 
 
-@st.cache_data(ttl=12 * 60 * 60)  # Cache data for 12 hours
 def fetch_stories_by_project_id(project_id: int) -> List[Dict]:
     """
-    Fetch all stories for a given project_id.
+    Fetch all stories for a given project_id. This is only for exports, which can be huge, so it isn't cached.
     """
-    db_conn = init_connection()
-    dict_cursor = db_conn.cursor()
-
     query = """
         SELECT * FROM stories
         WHERE project_id={} 
     """.format(project_id)
 
-    dict_cursor.execute(query)
-    results = dict_cursor.fetchall()
-    dict_cursor.close()
-    db_conn.close()
-
-    return results
+    return _router.execute(query, EXPORT_TIMEOUT_SECS)
 
 
 def _run_count_query(query: str) -> int:
@@ -137,6 +369,7 @@ def _run_count_query(query: str) -> int:
     return data[0]["count"]
 
 
+@snapshot.snapshottable
 def unposted_above_story_count(project_id: int, limit: int = None) -> int:
     """
     UI: How many stories about threshold have *not* been sent to the main server (should be zero!).
@@ -151,6 +384,7 @@ def unposted_above_story_count(project_id: int, limit: int = None) -> int:
     return _run_count_query(query)
 
 
+@snapshot.snapshottable
 def posted_above_story_count(project_id: int) -> int:
     """
     UI: How many stories above threshold have we sent to the main server (like all should be)
@@ -166,6 +400,7 @@ def posted_above_story_count(project_id: int) -> int:
     return _run_count_query(query)
 
 
+@snapshot.snapshottable
 def below_story_count(project_id: int) -> int:
     """
     UI: How many stories total were below threshold (should be same as uposted_stories)
@@ -178,6 +413,7 @@ def below_story_count(project_id: int) -> int:
     return _run_count_query(query)
 
 
+@snapshot.snapshottable
 def unposted_stories(project_id: int, limit: int):
     """
     How many stories were not posted to the main server (should be same as below_story_count)
@@ -193,6 +429,7 @@ def unposted_stories(project_id: int, limit: int):
     return _run_query(query)
 
 
+@snapshot.snapshottable
 def project_binned_model_scores(project_id: int) -> List:
     query = """
         select ROUND(CAST(model_score as numeric), 1) as value, count(1) as frequency
@@ -204,3 +441,147 @@ def project_binned_model_scores(project_id: int) -> List:
         project_id
     )
     return _run_query(query)
+
+
+@snapshot.snapshottable
+def latency_percentiles_by_day(project_id: int = None, limit: int = 30) -> List:
+    """
+    UI: how late stories from each platform are, per day they were processed - the p50/p90/p99 hours from
+    publication to processing (`processing_*`), and from processing to being posted to the main server (`posting_*`).
+    The percentiles are computed by the database, in one pass over the stories.
+    """
+    earliest_date = dt.date.today() - dt.timedelta(days=limit)
+    clauses = [
+        "(processed_date >= '{}'::DATE)".format(earliest_date),
+        "(source IN ({}))".format(", ".join("'{}'".format(p) for p in PLATFORMS)),
+    ]
+    if project_id is not None:
+        clauses.append("(project_id={})".format(project_id))
+    # percentile_cont skips NULLs, so stories that haven't been posted only count towards the processing lag
+    query = """
+        SELECT day, platform, stories,
+               processing[1] AS processing_p50, processing[2] AS processing_p90, processing[3] AS processing_p99,
+               posting[1] AS posting_p50, posting[2] AS posting_p90, posting[3] AS posting_p99
+        FROM (
+            SELECT processed_date::date AS day, source AS platform, count(1) AS stories,
+                   percentile_cont(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (
+                       ORDER BY EXTRACT(EPOCH FROM processed_date - published_date) / 3600) AS processing,
+                   percentile_cont(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (
+                       ORDER BY EXTRACT(EPOCH FROM posted_date - processed_date) / 3600) AS posting
+            FROM stories
+            WHERE {}
+            GROUP BY 1, 2
+        ) AS lags
+        ORDER BY day DESC, platform
+    """.format(
+        " AND ".join(clauses)
+    )
+    return _run_query(query, base.DIAGNOSTIC_TIMEOUT_SECS)
+
+
+# a 64 bit hash of a story's URL, normalized so the same story hashes the same however a platform wrote its URL:
+# lower case, without the scheme, "www.", fragment, tracking parameters or trailing slashes. This has to stay exactly
+# as the index in migrations/processor_db/005_url_hash_index.sql has it, or the index won't be used.
+URL_HASH = (
+    "hashtextextended(regexp_replace(regexp_replace(regexp_replace(lower(url), "
+    "'^[a-z]+://(www\\.)?|#.*$', '', 'g'), "
+    "'(?<=[?&])(utm_[a-z_]+|fbclid|gclid)=[^&]*(&|$)', '', 'g'), "
+    "'[?&/]+$', ''), 0)"
+)
+
+
+# the windows the Project Reports page offers for comparing platforms (the warmer keeps them all warm)
+OVERLAP_DAYS = [30, 90]
+
+
+@snapshot.snapshottable
+def platform_overlap(project_id: int, limit: int = 30) -> List:
+    """
+    UI: which platforms found the same stories for a project (by their normalized URLs, see URL_HASH), over the last
+    `limit` days. For each combination of platforms that found the same URLs, and each platform in it: how many
+    distinct URLs, and how many stories (more than the URLs if a platform found the same one more than once). This is
+    one pass over the project's stories, and only the counts come back.
+    """
+    earliest_date = dt.date.today() - dt.timedelta(days=limit)
+    clauses = [
+        "(project_id={})".format(project_id),
+        "(processed_date >= '{}'::DATE)".format(earliest_date),
+        "(source IN ({}))".format(", ".join("'{}'".format(p) for p in PLATFORMS)),
+        "(url is not Null)",
+    ]
+    query = """
+        SELECT platforms, platform, count(1) AS urls, sum(stories) AS stories
+        FROM (
+            SELECT source AS platform, count(1) AS stories,
+                   array_agg(source) OVER (PARTITION BY {url_hash} ORDER BY source
+                                           ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS platforms
+            FROM stories
+            WHERE {clauses}
+            GROUP BY {url_hash}, source
+        ) AS by_url
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """.format(
+        url_hash=URL_HASH, clauses=" AND ".join(clauses)
+    )
+    return _run_query(query, base.DIAGNOSTIC_TIMEOUT_SECS)
+
+
+# the windows the Project Reports page offers for the pipeline funnel, in both databases (the warmer keeps them all
+# warm)
+FUNNEL_DAYS = [7, 30, 90]
+
+
+@snapshot.snapshottable
+def funnel_counts_by_project_platform(limit: int = 30) -> List:
+    """
+    How many stories each project got from each platform (by processed day) over the last `limit` days, how many of
+    them were above threshold, and how many of those were posted to the main server - for every project at once. The
+    story processor's half of the pipeline funnel (see `funnel`).
+    """
+    earliest_date = dt.date.today() - dt.timedelta(days=limit)
+    query = """
+        SELECT project_id, source AS platform, count(1) AS discovered,
+               count(1) FILTER (WHERE above_threshold) AS above_threshold,
+               count(1) FILTER (WHERE above_threshold AND (posted_date is not Null)) AS posted
+        FROM stories
+        WHERE (processed_date >= '{}'::DATE)
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """.format(
+        earliest_date
+    )
+    return _run_query(query, base.ALL_PROJECTS_TIMEOUT_SECS)
+
+
+@snapshot.snapshottable
+def story_counts_by_project_platform_day(limit: int = 30) -> List:
+    """
+    How many stories each project got from each platform each day (by processed day), for every project at once.
+    Days a project got nothing from a platform have no row.
+    """
+    earliest_date = dt.date.today() - dt.timedelta(days=limit)
+    query = """
+        SELECT project_id, source AS platform, processed_date::date AS day, count(1) AS stories
+        FROM stories
+        WHERE (processed_date >= '{}'::DATE) AND (source IN ({}))
+        GROUP BY 1, 2, 3
+    """.format(
+        earliest_date, ", ".join("'{}'".format(p) for p in PLATFORMS)
+    )
+    return _run_query(query, base.ALL_PROJECTS_TIMEOUT_SECS)
+
+
+def posted_story_urls(project_id: int, since: dt.date) -> Iterator[Dict]:
+    """
+    Stream the url and posted day of every story we've sent to the main server since a date, sorted by url (in
+    byte order, so it matches python's string ordering). Used to reconcile against the email alerts database.
+    """
+    query = """
+        select url, posted_date::date as day from stories
+        where project_id={} and posted_date is not Null and posted_date >= '{}'::DATE and url is not Null
+        order by url COLLATE "C"
+    """.format(
+        project_id, since
+    )
+    return _stream_query(query)
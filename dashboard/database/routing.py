@@ -0,0 +1,241 @@
+"""
+Send the dashboard's reads to a read replica when one is configured, so a spike in dashboard use doesn't slow down
+the story pipeline writing to the primary. Reads fall back to the primary when the replica is lagging too far
+behind, or when it fails. Reads that have to include a particular change (see `route_after`) wait for the replica to
+replay it first.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import psycopg
+from psycopg.rows import dict_row
+
+from dashboard import snapshot
+from dashboard.database import base
+from dashboard.database.instrumentation import TIMED_OUT, query_stats
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+# seconds the replica is behind the primary (0 if it has replayed everything it has received)
+_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END AS lag
+"""
+
+# how far through the primary's write-ahead log the replica has replayed
+_REPLAY_LSN_QUERY = "SELECT pg_last_wal_replay_lsn()::text AS lsn"
+
+
+def lsn_position(lsn: str) -> int:
+    """
+    A write-ahead log position (ie. "16/B374D848", from pg_current_wal_lsn()) as a number, so they can be compared.
+    """
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class ReadRouter:
+    def __init__(
+        self,
+        database: str,
+        primary_uri: Callable[[], str],
+        replica_uri: Optional[str],
+        max_lag_secs: float,
+        lag_check_secs: float = 30,
+        retry_replica_secs: float = 60,
+    ):
+        """
+        :param database: name to use in logs and instrumentation (ie. "processor")
+        :param primary_uri: returns the primary's URI (a function, so the setting is only read when first needed)
+        :param replica_uri: None if there isn't a replica, in which case everything goes to the primary
+        :param max_lag_secs: use the primary while the replica is further behind than this
+        :param lag_check_secs: how often to check the replica's lag
+        :param retry_replica_secs: how long to stick with the primary after the replica fails
+        """
+        self.database = database
+        self._uris = {PRIMARY: primary_uri, REPLICA: lambda: replica_uri}
+        self._has_replica = replica_uri is not None
+        self._max_lag_secs = max_lag_secs
+        self._lag_check_secs = lag_check_secs
+        self._retry_replica_secs = retry_replica_secs
+        self._connections: Dict[str, psycopg.Connection] = {}
+        self._lock = threading.RLock()
+        # one query at a time on each shared connection, or the transactions of different threads get tangled up
+        self._query_locks = {PRIMARY: threading.Lock(), REPLICA: threading.Lock()}
+        self._lag_checked_at = None
+        self._replica_lagging = False
+        self._replica_down_until = 0
+        self._replayed = 0  # the furthest we've seen the replica replay to
+
+    def uri(self, route: str) -> str:
+        if snapshot.enabled():
+            # every connection starts here, so this keeps snapshot mode from ever touching a database
+            raise snapshot.SnapshotMissingError(
+                "Not connecting to the {} database in snapshot mode".format(self.database)
+            )
+        return self._uris[route]()
+
+    def connection(self, route: str) -> psycopg.Connection:
+        """
+        The shared connection to one of the servers, (re)connecting if we aren't connected.
+        """
+        with self._lock:
+            conn = self._connections.get(route)
+            if (conn is None) or conn.closed:
+                # autocommit because each query runs in its own short transaction (see base.execute_queries)
+                conn = psycopg.connect(
+                    self.uri(route),
+                    row_factory=dict_row,
+                    autocommit=True,
+                    connect_timeout=10,
+                )
+                self._connections[route] = conn
+            return conn
+
+    def route(self) -> str:
+        """
+        Which server reads should go to right now.
+        """
+        if not self._has_replica:
+            return PRIMARY
+        with self._lock:
+            now = time.monotonic()
+            if now < self._replica_down_until:
+                return PRIMARY
+            check_lag = (self._lag_checked_at is None) or (
+                now - self._lag_checked_at > self._lag_check_secs
+            )
+            if check_lag:
+                self._lag_checked_at = now  # so other threads don't check it too
+        if check_lag:
+            self._check_replica_lag()
+        with self._lock:
+            return (
+                PRIMARY
+                if self._replica_lagging or (now < self._replica_down_until)
+                else REPLICA
+            )
+
+    def route_after(self, lsn: str, max_wait_secs: float = 5) -> str:
+        """
+        Which server reads that have to include everything up to a position in the primary's write-ahead log should
+        go to: the replica once it has replayed that far (waiting up to `max_wait_secs` for it), otherwise the primary.
+        """
+        if self.route() == PRIMARY:
+            return PRIMARY
+        target = lsn_position(lsn)
+        deadline = time.monotonic() + max_wait_secs
+        while self._replayed < target:
+            if time.monotonic() > deadline:
+                return PRIMARY
+            try:
+                replayed = self._execute_on(REPLICA, [_REPLAY_LSN_QUERY], 5)[0][0]["lsn"]
+            except psycopg.OperationalError as e:
+                self._replica_failed(e)
+                return PRIMARY
+            if replayed is None:  # not a replica after all
+                return PRIMARY
+            with self._lock:
+                self._replayed = max(self._replayed, lsn_position(replayed))
+            if self._replayed < target:
+                time.sleep(0.1)
+        return REPLICA
+
+    def execute(self, query: str, timeout_secs: float, route: Optional[str] = None) -> List[Dict]:
+        """
+        Run a read query on whichever server `route` picks, retrying on the primary if the replica fails.
+        :param route: the server to read from instead (ie. PRIMARY, for results that have to include a change that
+                      the replica might not have replayed yet)
+        :raises psycopg.errors.QueryCanceled: if the query ran over its time budget
+        """
+        return self.execute_batch([query], timeout_secs, route)[0]
+
+    def execute_batch(
+        self, queries: List[str], timeout_secs: float, route: Optional[str] = None
+    ) -> List[List[Dict]]:
+        """
+        Like `execute`, but for several read queries sent together in one round trip (see `base.execute_queries`).
+        :return: each query's results, in order
+        :raises psycopg.errors.QueryCanceled: if any of the queries ran over its time budget
+        """
+        query = ";\n".join(queries)  # for the query stats
+        if route is None:
+            route = self.route()
+            note = (
+                "replica unavailable" if self._has_replica and (route == PRIMARY) else None
+            )
+        else:
+            note = None
+        start = time.perf_counter()
+        try:
+            results = self._execute_on(route, queries, timeout_secs)
+        except psycopg.errors.QueryCanceled:
+            query_stats.record(
+                self.database,
+                route,
+                time.perf_counter() - start,
+                query,
+                TIMED_OUT,
+                len(queries),
+            )
+            raise
+        except psycopg.OperationalError as e:
+            if route == PRIMARY:
+                raise
+            self._replica_failed(e)
+            route, note = PRIMARY, "replica failed"
+            start = time.perf_counter()
+            results = self._execute_on(route, queries, timeout_secs)
+        query_stats.record(
+            self.database,
+            route,
+            time.perf_counter() - start,
+            query,
+            note,
+            len(queries),
+        )
+        return results
+
+    def _execute_on(
+        self, route: str, queries: List[str], timeout_secs: float
+    ) -> List[List[Dict]]:
+        start = time.perf_counter()
+        with self._query_locks[route]:
+            query_stats.record_wait(self.database, route, time.perf_counter() - start)
+            return base.execute_queries(self.connection(route), queries, timeout_secs)
+
+    def _check_replica_lag(self) -> None:
+        try:
+            lag = self._execute_on(REPLICA, [_LAG_QUERY], 5)[0][0]["lag"]
+        except psycopg.OperationalError as e:
+            self._replica_failed(e)
+            return
+        lagging = (lag is None) or (float(lag) > self._max_lag_secs)
+        if lagging != self._replica_lagging:
+            logger.warning(
+                "{} replica is {} secs behind - reading from the {}".format(
+                    self.database, lag, PRIMARY if lagging else REPLICA
+                )
+            )
+        self._replica_lagging = lagging
+
+    def _replica_failed(self, e: Exception) -> None:
+        logger.warning(
+            "{} replica failed, reading from the primary for {} secs: {}".format(
+                self.database, self._retry_replica_secs, e
+            )
+        )
+        with self._lock:
+            self._replica_down_until = time.monotonic() + self._retry_replica_secs
+            conn = self._connections.pop(REPLICA, None)
+            if conn is not None:
+                conn.close()
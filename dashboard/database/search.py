@@ -0,0 +1,63 @@
+"""
+Helpers for looking up a project's stories and articles by what someone types in a search box (see
+`processor_db.search_stories` and `alerts_db.search_articles`):
+
+- a full URL finds the stories with exactly that URL
+- anything else finds the stories and articles with it somewhere in their URL, or with those words in their title
+  (matched with the text search config for the project's language, so "asesinada" finds "asesinadas")
+
+The story processor doesn't keep titles, so a story's "title" is the words in its URL (which is also where the
+headline shown for it comes from, see `graph_functions.extract_story_title`).
+
+Both kinds of lookup are answered from the trigram and full text indexes in migrations/, so they take milliseconds
+however big a project is. What was typed is always quoted as a SQL literal, never pasted into a query.
+"""
+
+from psycopg import sql
+
+# trigram indexes can't help with anything shorter
+MIN_FRAGMENT_LENGTH = 3
+
+# project languages (ISO 639-1 codes, as the main server has them) to Postgres text search configs - each of these
+# needs its own index on articles (see migrations/alerts_db/004_search_indexes.sql)
+TEXT_SEARCH_CONFIGS = {
+    "en": "english",
+    "es": "spanish",
+    "pt": "portuguese",
+}
+DEFAULT_TEXT_SEARCH_CONFIG = "simple"  # no stemming or stop words, but works for any language
+
+# a story's URL split into words, to match words in its title against - the indexes on stories in migrations/ are on
+# this exact expression, so change them together
+URL_WORDS = "regexp_replace(coalesce(url, ''), '[-_/.?=&+%]+', ' ', 'g')"
+
+
+def text_search_config(language: str) -> str:
+    """
+    The text search config to match a project's titles with.
+    """
+    language = (language or "").strip().lower()
+    if language in TEXT_SEARCH_CONFIGS.values():
+        return language
+    return TEXT_SEARCH_CONFIGS.get(language[:2], DEFAULT_TEXT_SEARCH_CONFIG)
+
+
+def is_url(text: str) -> bool:
+    return text.startswith(("http://", "https://"))
+
+
+def literal(value: str) -> str:
+    """
+    Quote a value as a SQL string literal.
+    """
+    return sql.Literal(value).as_string(None).strip()
+
+
+def contains_pattern(fragment: str) -> str:
+    """
+    A quoted ILIKE pattern matching anything containing `fragment` (with any wildcards in it matched literally).
+    """
+    escaped = (
+        fragment.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+    return literal("%" + escaped + "%")
@@ -0,0 +1,74 @@
+"""
+A project's pipeline funnel: of the stories discovered on each platform, how many were above threshold, posted to the
+main server, arrived in email alerts, were grouped into events, and were marked relevant.
+
+The story processor stages come from one grouped query and the email alerts stages from another, each for every
+project at once - so they are cached, warmed and invalidated as one unit for every project's report - and are merged
+here. The two halves are counted by different dates (when stories were processed, and when articles were created),
+which are usually minutes apart.
+"""
+
+from functools import partial
+from typing import Dict, List, Union
+
+import pandas as pd
+
+import dashboard.database.alerts_db as alerts_db
+import dashboard.database.processor_db as processor_db
+from dashboard.database.base import batched
+from dashboard.database.columnar import ColumnarResults, to_dataframe
+
+STAGES = {
+    "discovered": "Discovered",
+    "above_threshold": "Above Threshold",
+    "posted": "Posted to Main Server",
+    "in_alerts": "In Email-Alerts",
+    "events": "Grouped into Events",
+    "relevant_events": "Marked Relevant",
+}
+ALL_PLATFORMS = "All"
+
+_STORY_STAGES = ["discovered", "above_threshold", "posted"]
+_ARTICLE_STAGES = ["in_alerts", "events", "relevant_events"]
+
+
+def merge_counts(
+    story_counts: Union[List[Dict], ColumnarResults],
+    article_counts: Union[List[Dict], ColumnarResults],
+    project_id: int,
+) -> pd.DataFrame:
+    """
+    Merge one project's counts from `processor_db.funnel_counts_by_project_platform` and
+    `alerts_db.funnel_counts_by_project_platform`.
+    :return: a row per platform, and a last one for all of them together (`ALL_PLATFORMS`), with a column per stage
+    """
+    stories = to_dataframe(story_counts).reindex(columns=["project_id", "platform"] + _STORY_STAGES)
+    stories = stories[stories["project_id"] == project_id].drop(columns="project_id")
+    articles = to_dataframe(article_counts).reindex(
+        columns=["project_id", "platform", "all_platforms"] + _ARTICLE_STAGES
+    )
+    articles = articles[articles["project_id"] == project_id].drop(columns="project_id")
+    all_platforms = articles["all_platforms"].astype(bool)
+    for df in [stories, articles]:
+        df["platform"] = df["platform"].astype(object).fillna("unknown")
+    by_platform = stories.merge(articles[~all_platforms].drop(columns="all_platforms"), on="platform", how="outer")
+    # events can span platforms, so the total comes from the query rather than adding up the platforms
+    total = dict(stories[_STORY_STAGES].sum(), platform=ALL_PLATFORMS)
+    total.update(articles.loc[all_platforms, _ARTICLE_STAGES].sum())
+    funnel = pd.concat([by_platform.sort_values("platform"), pd.DataFrame([total])], ignore_index=True)
+    funnel[list(STAGES)] = funnel[list(STAGES)].fillna(0).astype(int)
+    return funnel[["platform"] + list(STAGES)]
+
+
+def project_funnel(project_id: int, days: int = 30) -> pd.DataFrame:
+    """
+    UI: a project's pipeline funnel over the last `days` (see `merge_counts`), from both databases in one round trip
+    each.
+    """
+    story_counts, article_counts = batched(
+        [
+            partial(processor_db.funnel_counts_by_project_platform, limit=days),
+            partial(alerts_db.funnel_counts_by_project_platform, limit=days),
+        ]
+    )
+    return merge_counts(story_counts, article_counts, project_id)
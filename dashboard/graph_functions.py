@@ -1,13 +1,26 @@
 import altair as altair
 import pandas as pd
 import streamlit as st
-from typing import List
-
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List
+
+import dashboard.anomalies as anomalies
+import dashboard.last_visit as last_visit
+import dashboard.overlap as overlap
+import dashboard.database.alerts_db as alerts_db
 import dashboard.database.processor_db as processor_db
-from dashboard import PLATFORMS
+import dashboard.database.search as search
+import dashboard.funnel as funnel
+from dashboard.database.base import batched
+from dashboard.database.columnar import to_dataframe
+from dashboard import APPROXIMATE_COUNTS, PLATFORMS, snapshot
 
 COLOR_SCALE_NAME = 'set1'
 
+# fetches the next page of a paginated table in the background, so it is already cached when someone clicks "Next"
+_page_prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="page-prefetch")
+
 def _to_altair_datetime(original_datetime):
     """Convert a pandas datetime to an Altair datetime object.
        Source: @jakevdp (https://github.com/vega/altair/issues/1005#issuecomment-403237407)
@@ -27,6 +40,51 @@ def _get_updated_domain(min_date: str) -> List[altair.DateTime]:
     return domain
 
 
+def _show_if_stale(*results):
+    """
+    If any of these query results are older ones we fell back to because the query timed out, say so.
+    """
+    stale_as_of = [r.stale_as_of for r in results if getattr(r, "stale_as_of", None) is not None]
+    if len(stale_as_of) > 0:
+        st.caption(f"⚠️ Stale as of {min(stale_as_of):%Y-%m-%d %H:%M} (the latest data took too long to query)")
+
+
+def snapshot_notice():
+    """
+    UI: in snapshot mode, say the page isn't showing live data.
+    """
+    if snapshot.enabled():
+        st.info(f"Showing a snapshot taken {snapshot.created_at():%Y-%m-%d %H:%M}, not live data.")
+
+
+def approximate_counts_toggle() -> bool:
+    """
+    UI: a sidebar switch between exact counts and cheaper estimates. Returns True if estimates were picked.
+    """
+    return st.sidebar.toggle("Approximate counts", value=APPROXIMATE_COUNTS, key="approximate-counts",
+                             help="Estimate totals and unique event counts, which is much faster on big projects")
+
+
+def _show_if_approximate(results):
+    """
+    If these query results are HyperLogLog estimates, say how far off they could be.
+    """
+    errors = [r["relative_error"] for r in results if "relative_error" in r]
+    if len(errors) > 0:
+        st.caption(f"≈ Estimated counts, typically within ±{max(errors):.1%}")
+
+
+def approximate_event_count_metrics(func, project_id=None):
+    """
+    UI: estimated unique events over the last week and month, side by side.
+    """
+    columns = st.columns(2)
+    for column, (label, days) in zip(columns, [("Last 7 Days", 7), ("Last 30 Days", 30)]):
+        estimate = func(project_id=project_id, days=days)
+        column.metric(label=f"Unique Events, {label}", value=f"≈ {estimate['count']:,}",
+                      help=f"Estimate, typically within ±{estimate['relative_error']:.1%}")
+
+
 def draw_graph(func, project_id=None, above_threshold=None):
     """
     Draw a graph based on data returned by a provided function from processor_db.
@@ -38,12 +96,12 @@ def draw_graph(func, project_id=None, above_threshold=None):
         None
     """
     df_list = []
-    for p in PLATFORMS:
-        # Pass the above_threshold parameter to the processor_db function
-        results = func(
-            project_id=project_id, platform=p, above_threshold=above_threshold
-        )
-        df = pd.DataFrame(results)
+    # one query per platform, sent to the database together
+    all_results = batched([
+        partial(func, project_id=project_id, platform=p, above_threshold=above_threshold) for p in PLATFORMS
+    ])
+    for p, results in zip(PLATFORMS, all_results):
+        df = to_dataframe(results)
         df["platform"] = p
         df_list.append(df)
 
@@ -65,6 +123,7 @@ def draw_graph(func, project_id=None, above_threshold=None):
     )
 
     st.altair_chart(bar_chart, use_container_width=True)
+    _show_if_stale(*all_results)
     return
 
 
@@ -72,7 +131,7 @@ def alerts_draw_graph(func, project_id=None):
     # fetch our data
     df_list = []
     results = func(project_id=project_id)
-    df = pd.DataFrame(results)
+    df = to_dataframe(results)
     df_list.append(df)
 
     # concatenate all the data into a single dataframe
@@ -91,6 +150,7 @@ def alerts_draw_graph(func, project_id=None):
     )
 
     st.altair_chart(bar_chart, use_container_width=True)
+    _show_if_stale(results)
     return
 
 
@@ -99,7 +159,7 @@ def draw_bar_chart_sources(func, project_id=None, limit=10):
     Draw a horizontal bar chart for media sources using the specified function.
     """
     results = func(project_id=project_id, limit=limit)
-    df = pd.DataFrame(results)
+    df = to_dataframe(results)
 
     bar_chart = (
         altair.Chart(df)
@@ -117,12 +177,14 @@ def draw_bar_chart_sources(func, project_id=None, limit=10):
     )
 
     st.altair_chart(bar_chart, use_container_width=True)
+    _show_if_stale(results)
     return
 
 
 def draw_model_scores(project_id):
+    results = processor_db.project_binned_model_scores(project_id)
     scores = [
-        entry.values() for entry in processor_db.project_binned_model_scores(project_id)
+        entry.values() for entry in results
     ]
     chart = pd.DataFrame(scores, columns=["Scores", "Number of Stories"])
 
@@ -142,23 +204,23 @@ def draw_model_scores(project_id):
         )
     )
     st.altair_chart(bar_chart, use_container_width=True)
+    _show_if_stale(results)
     return
 
 
 def story_results_graph(project_id=None):
     # Get data for above and below threshold
-    a = processor_db.stories_by_processed_day(
-        project_id=project_id, above_threshold=True
-    )
-    b = processor_db.stories_by_processed_day(
-        project_id=project_id, above_threshold=False
-    )
+    a, b = batched([
+        partial(processor_db.stories_by_processed_day, project_id=project_id, above_threshold=True),
+        partial(processor_db.stories_by_processed_day, project_id=project_id, above_threshold=False),
+    ])
 
     # Convert to DataFrame and add threshold labels
     df_list = []
-    a = pd.DataFrame(a)
+    all_results = [a, b]
+    a = to_dataframe(a)
     a["Threshold"] = "Above"
-    b = pd.DataFrame(b)
+    b = to_dataframe(b)
     b["Threshold"] = "Below"
     df_list.append(a)
     df_list.append(b)
@@ -180,9 +242,200 @@ def story_results_graph(project_id=None):
     )
 
     st.altair_chart(bar_chart, use_container_width=True)
+    _show_if_stale(*all_results)
+    return
+
+
+def latency_charts(project_id=None):
+    """
+    UI: for each platform, how many hours stories took to get from publication to processing, and from processing to
+    the main server, by the day they were processed (see processor_db.latency_percentiles_by_day).
+    """
+    results = processor_db.latency_percentiles_by_day(project_id=project_id)
+    if len(results) == 0:
+        st.write("_No stories processed recently._")
+        return
+    df = to_dataframe(results)
+    percentile = st.radio("Percentile", ["p50", "p90", "p99"], index=1, horizontal=True,
+                          key=f"latency-percentile-{project_id}")
+    columns = st.columns(2)
+    for column, stage, title in [(columns[0], "processing", "Hours from Publication to Processing"),
+                                 (columns[1], "posting", "Hours from Processing to Main Server")]:
+        line_chart = (
+            altair.Chart(df)
+            .mark_line(point=True)
+            .encode(
+                x=altair.X('day:T', scale=altair.Scale(domain=_get_updated_domain(df['day'].min())),
+                           axis=altair.Axis(title="Date Processed", format="%m-%d")),
+                y=altair.Y(f'{stage}_{percentile}:Q', axis=altair.Axis(title=f"{percentile} Hours")),
+                color=altair.Color('platform:N', scale=altair.Scale(scheme=COLOR_SCALE_NAME),
+                                   legend=altair.Legend(title='Platform')),
+                tooltip=['day:T', 'platform:N', 'stories:Q', altair.Tooltip(f'{stage}_p50:Q', format=".1f"),
+                         altair.Tooltip(f'{stage}_p90:Q', format=".1f"),
+                         altair.Tooltip(f'{stage}_p99:Q', format=".1f")]
+            )
+            .properties(title=title)
+        )
+        column.altair_chart(line_chart, use_container_width=True)
+    _show_if_stale(results)
     return
 
 
+def funnel_chart(project_id):
+    """
+    UI: how many of a project's stories made it through each stage of the pipeline, overall and per platform (see
+    funnel.project_funnel).
+    """
+    days = st.radio("Over the last", processor_db.FUNNEL_DAYS, index=1, format_func=lambda d: f"{d} days", horizontal=True,
+                    key=f"funnel-days-{project_id}")
+    stages = funnel.project_funnel(project_id, days)
+    total = stages.iloc[-1]
+    data = pd.DataFrame(dict(stage=list(funnel.STAGES.values()), stories=[total[s] for s in funnel.STAGES]))
+    data['of_previous'] = data['stories'] / data['stories'].shift(1)
+    data['of_discovered'] = data['stories'] / data['stories'].iloc[0]
+    bar_chart = (
+        altair.Chart(data)
+        .mark_bar(color='#FA8072')
+        .encode(
+            y=altair.Y('stage:N', sort=list(funnel.STAGES.values()), axis=altair.Axis(title=None)),
+            x=altair.X('stories:Q', axis=altair.Axis(title='Stories')),
+            tooltip=['stage:N', 'stories:Q', altair.Tooltip('of_previous:Q', format='.1%', title='Of Previous Stage'),
+                     altair.Tooltip('of_discovered:Q', format='.1%', title='Of Discovered')]
+        )
+    )
+    st.altair_chart(bar_chart, use_container_width=True)
+    st.dataframe(stages, column_config={s: st.column_config.NumberColumn(label) for s, label in funnel.STAGES.items()},
+                 hide_index=True, use_container_width=True)
+
+
+def platform_overlap_chart(project_id):
+    """
+    UI: how many of a project's stories each platform found that no other platform did, and how many each pair of
+    platforms both found (see overlap.platform_overlap).
+    """
+    days = st.radio("Over the last", processor_db.OVERLAP_DAYS, format_func=lambda d: f"{d} days", horizontal=True,
+                    key=f"overlap-days-{project_id}")
+    totals, matrix = overlap.platform_overlap(project_id, days)
+    if len(totals) == 0:
+        raise ValueError("No stories to compare")
+    st.dataframe(totals, column_order=['platform', 'urls', 'unique', 'shared', 'duplicates'],
+                 column_config={
+                     "urls": st.column_config.NumberColumn("Stories", help="Distinct URLs, once normalized"),
+                     "unique": st.column_config.NumberColumn("Only on This Platform"),
+                     "shared": st.column_config.NumberColumn("Also on Another Platform"),
+                     "duplicates": st.column_config.NumberColumn("Repeats", help="Stories it found more than once"),
+                 },
+                 hide_index=True, use_container_width=True)
+    pairs = matrix.reset_index().melt(id_vars='platform', var_name='other_platform', value_name='urls')
+    pairs['share'] = pairs['urls'] / pairs['platform'].map(dict(zip(totals['platform'], totals['urls'])))
+    heatmap = altair.Chart(pairs).encode(
+        x=altair.X('other_platform:N', axis=altair.Axis(title="Also Found by")),
+        y=altair.Y('platform:N', axis=altair.Axis(title="Stories from")),
+        tooltip=['platform:N', 'other_platform:N', 'urls:Q', altair.Tooltip('share:Q', format='.1%')]
+    )
+    chart = (
+        heatmap.mark_rect().encode(color=altair.Color('share:Q', scale=altair.Scale(scheme='reds', domain=[0, 1]),
+                                                      legend=altair.Legend(title="Share", format='%')))
+        + heatmap.mark_text().encode(text='urls:Q')
+    )
+    st.altair_chart(chart, use_container_width=True)
+
+
+def ingestion_drops_table(project_list):
+    """
+    UI: list the platforms that have stopped (or nearly stopped) delivering stories for a project, biggest drops first
+    (see anomalies.find_drops).
+    """
+    drops = anomalies.ingestion_drops()
+    if len(drops) == 0:
+        st.success("Every platform is delivering stories as usual for every project.")
+        return
+    titles = {p["id"]: p["title"] for p in project_list}
+    st.dataframe(
+        [dict(project=f"{d['project_id']} - {titles.get(d['project_id'], '?')}", **d) for d in drops],
+        column_order=["project", "platform", "since", "days", "baseline_per_day", "recent_per_day", "score"],
+        column_config={
+            "since": st.column_config.DateColumn("Down Since"),
+            "baseline_per_day": st.column_config.NumberColumn("Stories/Day Before"),
+            "recent_per_day": st.column_config.NumberColumn("Stories/Day Since"),
+            "score": st.column_config.NumberColumn("Score", help="Standard deviations below the usual daily count"),
+        },
+        hide_index=True, use_container_width=True)
+
+
+def since_last_visit_panel(project_list):
+    """
+    UI: what has arrived since this visitor was last here - how many stories each project has had processed above
+    threshold, posted to the main server and added to email alerts, and then the stories and articles themselves for
+    one project at a time. Every query only reads the rows after the last visit (see last_visit.since).
+    """
+    if snapshot.enabled():
+        st.info("Not available in snapshot mode.")
+        return
+    since = last_visit.since()
+    col1, col2 = st.columns([6, 1])
+    col1.write(f"Since {since:%Y-%m-%d %H:%M}:")
+    col2.button("Mark All as Seen", on_click=last_visit.mark_seen, key="mark-seen")
+    story_counts, article_counts = batched([partial(processor_db.new_story_counts, since),
+                                            partial(alerts_db.new_article_counts, since)])
+    stories = to_dataframe(story_counts).reindex(columns=['project_id', 'new_above_threshold', 'newly_posted'])
+    articles = to_dataframe(article_counts).reindex(columns=['project_id', 'new_articles'])
+    new = stories.merge(articles, on='project_id', how='outer').fillna(0).astype(int)
+    if len(new) == 0:
+        st.success("Nothing new since your last visit.")
+        return
+    titles = {p["id"]: p["title"] for p in project_list}
+    new['project'] = [f"{project_id} - {titles.get(project_id, '?')}" for project_id in new['project_id']]
+    st.dataframe(new, column_order=['project', 'new_above_threshold', 'newly_posted', 'new_articles'],
+                 column_config={
+                     "new_above_threshold": st.column_config.NumberColumn("New Above Threshold"),
+                     "newly_posted": st.column_config.NumberColumn("Posted to Main Server"),
+                     "new_articles": st.column_config.NumberColumn("Added to Email-Alerts"),
+                 },
+                 hide_index=True, use_container_width=True)
+    project = st.selectbox("Show what's new for", new['project'], key="since-last-visit-project")
+    project_id = int(new.loc[new['project'] == project, 'project_id'].iloc[0])
+    above_tab, posted_tab, articles_tab = st.tabs(["New Above Threshold", "Posted to Main Server",
+                                                   "Added to Email-Alerts"])
+    with above_tab:
+        paginated_table(f"since-above-{project_id}-{since}", partial(processor_db.stories_since, project_id, since),
+                        latest_stories)
+    with posted_tab:
+        paginated_table(f"since-posted-{project_id}-{since}",
+                        partial(processor_db.stories_since, project_id, since, posted=True), latest_stories)
+    with articles_tab:
+        paginated_table(f"since-articles-{project_id}-{since}", partial(alerts_db.articles_since, project_id, since),
+                        latest_articles)
+
+
+def search_panel(project):
+    """
+    UI: look up a project's stories and articles by URL, or by words in their title (see database.search), instead of
+    downloading everything and searching that.
+    """
+    if snapshot.enabled():
+        st.info("Not available in snapshot mode.")
+        return
+    text = st.text_input("Search by URL, part of a URL, or words in the title", key=f"search-{project['id']}")
+    text = text.strip()
+    if not text:
+        return
+    if not search.is_url(text) and len(text) < search.MIN_FRAGMENT_LENGTH:
+        st.write(f"_Type at least {search.MIN_FRAGMENT_LENGTH} characters to search._")
+        return
+    stories_tab, articles_tab = st.tabs(["Story Processor", "Email-Alerts"])
+    with stories_tab:
+        st.caption("The story processor doesn't keep titles, so stories are matched by the words in their URLs "
+                   "(which is where their headlines here come from too).")
+        paginated_table(f"search-stories-{project['id']}-{text}",
+                        partial(processor_db.search_stories, project['id'], text, project.get('language')),
+                        latest_stories)
+    with articles_tab:
+        paginated_table(f"search-articles-{project['id']}-{text}",
+                        partial(alerts_db.search_articles, project['id'], text, project.get('language')),
+                        latest_articles)
+
+
 def clean_title(title):
     cleaned_title = " ".join(
         word.capitalize() for word in title.replace("-", " ").replace("_", " ").split()
@@ -233,6 +486,7 @@ def latest_stories(stories):
         hide_index=True,
         use_container_width=True,
     )
+    _show_if_stale(stories)
 
 
 def latest_articles(articles):
@@ -264,6 +518,7 @@ def latest_articles(articles):
         hide_index=True,
         use_container_width=True
     )
+    _show_if_stale(articles)
 
 
 def event_counts_draw_graph(func, project_id=None, limit=45):
@@ -272,7 +527,7 @@ def event_counts_draw_graph(func, project_id=None, limit=45):
     """
     # Fetch data using the function
     results = func(project_id=project_id, limit=limit)
-    chart = pd.DataFrame(results)
+    chart = to_dataframe(results)
 
     # Create the bar chart
     bar_chart = (
@@ -287,6 +542,8 @@ def event_counts_draw_graph(func, project_id=None, limit=45):
     )
 
     st.altair_chart(bar_chart, use_container_width=True)
+    _show_if_approximate(results)
+    _show_if_stale(results)
     return
 
 
@@ -326,4 +583,140 @@ def relevance_counts_chart(func, project_id=None, limit=45):
     )
 
     st.altair_chart(pie_chart, use_container_width=True)
+    _show_if_stale(results)
     return
+
+
+def relevance_ratios(counts: pd.DataFrame, project_id=None) -> pd.DataFrame:
+    """
+    Sum the per-project relevancy counts from alerts_db.relevance_counts_by_period for one project (or all of them),
+    and work out for each period the share of above threshold stories judged relevant (`relevant_share`), and the
+    share of the judged ones that were relevant (`precision`).
+    """
+    if project_id is not None:
+        counts = counts[counts['project_id'] == project_id]
+    totals = counts.groupby('period', as_index=False)[['events', 'yes_count', 'no_count', 'null_count']].sum()
+    judged = totals['yes_count'] + totals['no_count']
+    totals['relevant_share'] = totals['yes_count'] / totals['events']
+    totals['precision'] = (totals['yes_count'] / judged).where(judged > 0)
+    return totals.sort_values('period')
+
+
+def relevance_trend_chart(project_id=None):
+    """
+    UI: how the relevancy of above threshold stories has changed over time, by day or week, for one project (or all
+    of them) - to see how a change to a project's threshold played out.
+    """
+    period = st.radio("Period", ["week", "day"], format_func=lambda p: f"By {p}", horizontal=True,
+                      key=f"relevance-period-{project_id}")
+    results = alerts_db.relevance_counts_by_period(period=period, limit=182 if period == "week" else 45)
+    trend = relevance_ratios(to_dataframe(results), project_id)
+    if len(trend) == 0:
+        raise ValueError("No relevancy judgements to show")
+    counts = trend.melt(id_vars=['period'], value_vars=['yes_count', 'no_count', 'null_count'],
+                        var_name='category', value_name='count')
+    counts['category'] = counts['category'].map(dict(yes_count="TRUE", no_count="FALSE", null_count="NULL"))
+    ratios = trend.melt(id_vars=['period'], value_vars=['precision', 'relevant_share'],
+                        var_name='ratio', value_name='value')
+    ratios['ratio'] = ratios['ratio'].map(dict(precision="Relevant / Judged",
+                                               relevant_share="Relevant / Above Threshold"))
+    x = altair.X('period:T', axis=altair.Axis(title="Week Starting" if period == "week" else "Date",
+                                               format="%m-%d"))
+    columns = st.columns(2)
+    bar_chart = (
+        altair.Chart(counts)
+        .mark_bar()
+        .encode(
+            x=x,
+            y=altair.Y('count:Q', stack=True, axis=altair.Axis(title='Stories')),
+            color=altair.Color('category:N', legend=altair.Legend(title="Relevancy"),
+                               scale=altair.Scale(scheme=COLOR_SCALE_NAME)),
+            tooltip=['period:T', 'category:N', 'count:Q']
+        )
+        .properties(title="Stories by Relevancy")
+    )
+    columns[0].altair_chart(bar_chart, use_container_width=True)
+    line_chart = (
+        altair.Chart(ratios)
+        .mark_line(point=True)
+        .encode(
+            x=x,
+            y=altair.Y('value:Q', axis=altair.Axis(title='Share', format='%'), scale=altair.Scale(domain=[0, 1])),
+            color=altair.Color('ratio:N', legend=altair.Legend(title="Ratio"),
+                               scale=altair.Scale(scheme=COLOR_SCALE_NAME)),
+            tooltip=['period:T', 'ratio:N', altair.Tooltip('value:Q', format='.1%')]
+        )
+        .properties(title="Share of Stories Judged Relevant")
+    )
+    columns[1].altair_chart(line_chart, use_container_width=True)
+    _show_if_stale(results)
+    return
+
+
+def paginated_table(key: str, fetch_page: Callable, show_page: Callable, page_size: int = 50):
+    """
+    Show a table one page at a time, with Previous / Next buttons. The `fetch_page` function must support keyset
+    pagination - it is called with `after` set to the last row of the previous page (or None for the first page) and
+    returns up to `page_size` rows. The next page is prefetched in the background while this one is being looked at.
+    Parameters:
+        key (str): unique per table and set of filters, so changing filters goes back to the first page.
+        fetch_page (Callable): takes `after` and `page_size` keyword args and returns a list of rows.
+        show_page (Callable): renders a list of rows (ie. `latest_stories` or `latest_articles`).
+    """
+    # the `after` row to use to fetch each page we've been to, the last one being the current page
+    page_starts = st.session_state.setdefault(key, [None])
+    rows = fetch_page(after=page_starts[-1], page_size=page_size)
+    if len(rows) > 0:
+        show_page(rows)
+    else:
+        st.write("_Nothing to show here._")
+    has_next_page = len(rows) == page_size
+    if has_next_page:
+        _page_prefetcher.submit(fetch_page, after=rows[-1], page_size=page_size)
+
+    col1, col2, col3 = st.columns([1, 1, 6])
+    if col1.button("Previous", key=f"{key}-previous", disabled=len(page_starts) == 1):
+        page_starts.pop()
+        st.rerun()
+    if col2.button("Next", key=f"{key}-next", disabled=not has_next_page):
+        page_starts.append(rows[-1])
+        st.rerun()
+    col3.write(f"Page {len(page_starts)}")
+
+
+def reconciliation_chart(results):
+    """
+    Show how many posted stories are missing from email alerts (and how many articles there are extra) each day, from
+    the results of `dashboard.reconcile.reconcile_project`.
+    """
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Matched", results["matched"])
+    col2.metric("Posted but Missing from Email-Alerts", sum(results["missing"].values()))
+    col3.metric("In Email-Alerts but not Posted", sum(results["extra"].values()))
+
+    data = [dict(day=day, stories=count, Status="Missing") for day, count in results["missing"].items()] + \
+           [dict(day=day, stories=count, Status="Extra") for day, count in results["extra"].items()]
+    if len(data) == 0:
+        st.write("_Everything posted arrived in email alerts._")
+        return
+    chart = pd.DataFrame(data)
+
+    bar_chart = (
+        altair.Chart(chart)
+        .mark_bar()
+        .encode(
+            x=altair.X('day:T', scale=altair.Scale(domain=_get_updated_domain(chart['day'].min())),
+                       axis=altair.Axis(title="Date", format="%m-%d")),
+            y=altair.Y('stories:Q', axis=altair.Axis(title="Story Count")),
+            color=altair.Color('Status:N', scale=altair.Scale(scheme=COLOR_SCALE_NAME),
+                               legend=altair.Legend(title='Status')),
+            size=altair.SizeValue(8)
+        )
+    )
+    st.altair_chart(bar_chart, use_container_width=True)
+
+    with st.expander("Example URLs"):
+        st.write("Posted but missing from email alerts:")
+        st.write(results["missing_samples"])
+        st.write("In email alerts but not posted:")
+        st.write(results["extra_samples"])
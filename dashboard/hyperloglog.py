@@ -0,0 +1,79 @@
+"""
+HyperLogLog sketches for approximate distinct counts.
+
+The registers are computed in SQL (see `sql_registers`) from Postgres' 32-bit `hashtext`, so only one small row per
+register comes back instead of every value. Sketches for different days can be merged to get the distinct count over
+a week or a month without rescanning anything.
+"""
+
+import math
+from typing import Iterable
+
+HASH_BITS = 32
+
+
+def sql_registers(expression: str, precision: int) -> str:
+    """
+    SQL select expressions for the register (`bucket`) each value of `expression` falls in, and its `rank`. Take the
+    MAX(rank) per bucket to build a sketch. The low `precision` bits of the hash pick the bucket, and the rank is the
+    position of the first 1 bit in the rest (which is how `HyperLogLog.add_hash` does it too).
+    """
+    rest_bits = HASH_BITS - precision
+    hashed = "(hashtext(({})::text)::bigint & {})".format(expression, (1 << HASH_BITS) - 1)
+    return (
+        "({hashed} & {mask}) AS bucket, "
+        "CASE WHEN ({hashed} >> {p}) = 0 THEN {max_rank} "
+        "ELSE position('1' in ({hashed} >> {p})::bit({rest})::text) END AS rank".format(
+            hashed=hashed, mask=(1 << precision) - 1, p=precision, rest=rest_bits, max_rank=rest_bits + 1
+        )
+    )
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @classmethod
+    def from_registers(cls, precision: int, buckets: Iterable[int], ranks: Iterable[int]) -> "HyperLogLog":
+        sketch = cls(precision)
+        for bucket, rank in zip(buckets, ranks):
+            sketch.registers[bucket] = max(sketch.registers[bucket], rank)
+        return sketch
+
+    def add_hash(self, hashed: int) -> None:
+        """
+        Add an (unsigned) 32-bit hash of a value.
+        """
+        rest_bits = HASH_BITS - self.precision
+        bucket = hashed & ((1 << self.precision) - 1)
+        rest = hashed >> self.precision
+        rank = rest_bits + 1 if rest == 0 else rest_bits - rest.bit_length() + 1
+        self.registers[bucket] = max(self.registers[bucket], rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """
+        A new sketch of the union of the values in this one and `other`.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Can't merge sketches with different precisions")
+        merged = HyperLogLog(self.precision)
+        merged.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return merged
+
+    @property
+    def relative_error(self) -> float:
+        """
+        The standard error of `count`, as a fraction of it.
+        """
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        empty_registers = self.registers.count(0)
+        if (estimate <= 2.5 * m) and (empty_registers > 0):
+            # small range correction - linear counting is more accurate when lots of registers are still empty
+            estimate = m * math.log(m / empty_registers)
+        return int(round(estimate))
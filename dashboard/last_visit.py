@@ -0,0 +1,91 @@
+"""
+Remember when each reviewer last looked at the dashboard, so the Homepage can show just what arrived since then (see
+`graph_functions.since_last_visit_panel`) instead of everyone re-reading whole 45 day charts to spot it.
+
+Everyone shares one password, so there are no user names to go by. Instead each browser gets a random visitor id,
+kept in the page's URL (`?visitor=...`) - bookmarking the dashboard with it keeps your place. When each visitor was
+last here is saved in a small JSON file (LAST_VISITS_FILE), and visitors who haven't been back for a while are
+forgotten.
+"""
+
+import datetime as dt
+import json
+import os
+import threading
+import uuid
+from typing import Dict, Optional
+
+import streamlit as st
+
+from dashboard import LAST_VISITS_FILE
+
+FIRST_VISIT_DAYS = 1  # what to show someone we haven't seen before
+FORGET_AFTER_DAYS = 90
+
+_lock = threading.Lock()  # the file is shared by every session in this process
+
+
+def load(path: str = LAST_VISITS_FILE) -> Dict[str, dt.datetime]:
+    try:
+        with open(path) as f:
+            return {
+                visitor: dt.datetime.fromisoformat(when)
+                for visitor, when in json.load(f).items()
+            }
+    except FileNotFoundError:
+        return {}
+
+
+def record(
+    visitor: str, when: dt.datetime, path: str = LAST_VISITS_FILE
+) -> Optional[dt.datetime]:
+    """
+    Save the time of a visit.
+    :return: when the visitor was here before (None if we haven't seen them before)
+    """
+    with _lock:
+        visits = load(path)
+        previous = visits.get(visitor)
+        visits[visitor] = when
+        cutoff = when - dt.timedelta(days=FORGET_AFTER_DAYS)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # write a new file and swap it in, so a crash can't leave a half written one behind
+        with open(path + ".new", "w") as f:
+            json.dump(
+                {v: t.isoformat() for v, t in visits.items() if t >= cutoff},
+                f,
+                indent=1,
+            )
+        os.replace(path + ".new", path)
+    return previous
+
+
+def _visitor() -> str:
+    visitor = st.query_params.get("visitor")
+    if not visitor:
+        visitor = uuid.uuid4().hex[:16]
+        st.query_params["visitor"] = visitor
+    return visitor
+
+
+def since() -> dt.datetime:
+    """
+    UI: when this visitor was last here (or a day ago, if we haven't seen them before). This is worked out once per
+    session, and this visit is saved for next time.
+    """
+    if "last-visit" not in st.session_state:
+        now = dt.datetime.now()
+        previous = record(_visitor(), now)
+        st.session_state["last-visit"] = previous or now - dt.timedelta(
+            days=FIRST_VISIT_DAYS
+        )
+    return st.session_state["last-visit"]
+
+
+def mark_seen() -> None:
+    """
+    UI: treat everything up to now as seen.
+    """
+    now = dt.datetime.now()
+    record(_visitor(), now)
+    st.session_state["last-visit"] = now
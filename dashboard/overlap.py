@@ -0,0 +1,48 @@
+"""
+How much each platform adds beyond the others for a project: how many of the stories it found no other platform did,
+and how many it shares with each of the others. Stories are matched by a hash of their normalized URL, computed and
+grouped by the database (see `processor_db.platform_overlap`), so no URLs come back - just a count for each
+combination of platforms, which is turned into per-platform totals and a platform x platform matrix here.
+"""
+
+from typing import Dict, List, Tuple, Union
+
+import pandas as pd
+
+import dashboard.database.processor_db as processor_db
+from dashboard.database.columnar import ColumnarResults, to_dataframe
+
+
+def overlap_tables(rows: Union[List[Dict], ColumnarResults]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    :param rows: see `processor_db.platform_overlap`
+    :return: a row per platform - its stories, distinct URLs, how many of those only it found (`unique`) and how many
+             other platforms found too (`shared`), and how many stories were repeats of a URL it already had
+             (`duplicates`) - and a matrix of how many URLs each pair of platforms both found (with each platform's
+             distinct URLs on the diagonal)
+    """
+    df = to_dataframe(rows).reindex(columns=["platforms", "platform", "urls", "stories"])
+    df["platforms"] = df["platforms"].map(tuple)
+    df[["urls", "stories"]] = df[["urls", "stories"]].astype(int)
+    df["only_one"] = df["platforms"].map(len) == 1
+    platforms = sorted(df["platform"].unique())
+    totals = df.groupby("platform")[["stories", "urls"]].sum().reindex(platforms)
+    totals["unique"] = df[df["only_one"]].groupby("platform")["urls"].sum().reindex(platforms, fill_value=0)
+    totals["shared"] = totals["urls"] - totals["unique"]
+    totals["duplicates"] = totals["stories"] - totals["urls"]
+    matrix = pd.DataFrame(
+        [
+            [df.loc[(df["platform"] == a) & df["platforms"].map(lambda ps: b in ps), "urls"].sum() for b in platforms]
+            for a in platforms
+        ],
+        index=pd.Index(platforms, name="platform"),
+        columns=platforms,
+    )
+    return totals.reset_index(), matrix
+
+
+def platform_overlap(project_id: int, days: int = 30) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    UI: how much each platform added beyond the others for a project over the last `days` (see `overlap_tables`).
+    """
+    return overlap_tables(processor_db.platform_overlap(project_id, limit=days))
@@ -0,0 +1,120 @@
+"""
+Profile a page render on demand, to see where the time goes (building DataFrames and charts, rendering tables) in
+production without redeploying. An admin adds `?profile=<PROFILER_TOKEN>` to a page's URL, and that run of the page
+script is profiled with cProfile. The profile is saved to PROFILE_DIR (with the page and project it was for), and the
+slowest functions are shown at the bottom of the page.
+
+Only the page script's own thread is profiled - not background query refreshes or page prefetches.
+"""
+
+import cProfile
+import datetime as dt
+import hmac
+import json
+import os
+import pstats
+import re
+import time
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+import dashboard
+from dashboard import PROFILE_DIR, PROFILER_TOKEN
+
+TOP_FUNCTIONS = 30
+
+
+def _requested() -> bool:
+    if not PROFILER_TOKEN:
+        return False
+    token = st.query_params.get("profile")
+    return (token is not None) and hmac.compare_digest(token, PROFILER_TOKEN)
+
+
+def start() -> Optional[cProfile.Profile]:
+    """
+    UI: start profiling the rest of this page run, if an admin asked for it. Pass the result to `finish` at the end
+    of the page.
+    """
+    if not _requested():
+        return None
+    profile = cProfile.Profile()
+    profile.enable()
+    profile.started_at = time.perf_counter()
+    return profile
+
+
+def top_functions(stats: pstats.Stats, limit: int = TOP_FUNCTIONS) -> List[Dict]:
+    """
+    The functions that took the most cumulative time.
+    """
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    top = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, calls, own_secs, cumulative_secs, _ = stats.stats[func]
+        filename, line, name = func
+        top.append(
+            dict(
+                function=name,
+                location="{}:{}".format(filename, line),
+                calls=calls,
+                own_secs=round(own_secs, 4),
+                cumulative_secs=round(cumulative_secs, 4),
+            )
+        )
+    return top
+
+
+def save(
+    profile: cProfile.Profile, page: str, metadata: Dict, profile_dir: str = PROFILE_DIR
+) -> str:
+    """
+    Save the profile (in the standard pstats format, for snakeviz or `python -m pstats`) and its metadata.
+    :return: the path to the saved profile
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    name = "{}-{}".format(
+        dt.datetime.now().strftime("%Y%m%d-%H%M%S"),
+        re.sub(r"[^a-z0-9]+", "-", page.lower()).strip("-"),
+    )
+    if metadata.get("project_id") is not None:
+        name += "-project{}".format(metadata["project_id"])
+    path = os.path.join(profile_dir, name + ".prof")
+    profile.dump_stats(path)
+    with open(os.path.join(profile_dir, name + ".json"), "w") as f:
+        json.dump(
+            dict(page=page, version=dashboard.VERSION, **metadata),
+            f,
+            indent=1,
+            default=str,
+        )
+    return path
+
+
+def finish(profile: Optional[cProfile.Profile], page: str, **metadata) -> None:
+    """
+    UI: stop profiling (if `start` started it), save the profile and show the slowest functions.
+    :param metadata: anything that helps make sense of the profile later (ie. the project_id)
+    """
+    if profile is None:
+        return
+    profile.disable()
+    metadata = dict(
+        metadata,
+        profiled_at=dt.datetime.now(),
+        render_secs=round(time.perf_counter() - profile.started_at, 3),
+    )
+    stats = pstats.Stats(profile)
+    top = top_functions(stats)
+    path = save(profile, page, dict(metadata, top_functions=top[:10]))
+    st.divider()
+    st.subheader("Profile")
+    st.write(
+        "This run of the page took {} secs ({} function calls). Saved to `{}`.".format(
+            metadata["render_secs"], stats.total_calls, path
+        )
+    )
+    st.dataframe(top, hide_index=True, use_container_width=True)
+    with open(path, "rb") as f:
+        st.download_button("Download Profile", f.read(), os.path.basename(path))
@@ -2,10 +2,11 @@ import json
 import logging
 import os
 import sys
+import threading
 from typing import Dict, List
 
 import dashboard.apiclient as apiclient
-from dashboard import CONFIG_DIR
+from dashboard import CONFIG_DIR, snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,8 @@ def load_project_list(
     :return: list of configurations for projects to query about
     """
     global _all_projects
+    if snapshot.enabled():
+        return snapshot.project_list()
     if _all_projects and not force_reload:
         return _all_projects
     try:
@@ -34,9 +37,12 @@ def load_project_list(
             download_if_missing and not file_exists
         ):  # grab the latest config file from main server
             projects_list = apiclient.get_projects_list()
-            with open(_path_to_config_file(), "w") as f:
+            # write it alongside and then swap it in, so other sessions loading it right now never see a partial file
+            temp_path = "{}.{}.tmp".format(_path_to_config_file(), threading.get_ident())
+            with open(temp_path, "w") as f:
                 json.dump(projects_list, f)
-                file_exists = True  # we might have just created it for the first time
+            os.replace(temp_path, _path_to_config_file())
+            file_exists = True  # we might have just created it for the first time
             logger.info(
                 "  updated config file from main server - {} projects".format(
                     len(projects_list)
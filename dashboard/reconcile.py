@@ -0,0 +1,109 @@
+"""
+Find stories the story processor says it posted to the main server that never showed up in the email alerts
+database (missing), and articles in email alerts the story processor has no record of posting (extra).
+
+The two databases live on different servers, so we can't join them in SQL. Instead we stream the urls from each
+side, sorted, through server-side cursors and merge the two streams. Memory stays bounded no matter how many stories
+a project has. To check every project from the command line:
+
+    python -m dashboard.reconcile --days 30
+"""
+
+import argparse
+import datetime as dt
+import logging
+from collections import Counter
+from typing import Dict, Iterable
+
+import dashboard.database.alerts_db as alerts_db
+import dashboard.database.processor_db as processor_db
+import dashboard.projects as projects
+
+logger = logging.getLogger(__name__)
+
+# a story posted just before the window might only arrive in email alerts just after it starts (and vice versa), so
+# each side is read from a little earlier than the window we report on
+WINDOW_OVERLAP = dt.timedelta(days=1)
+
+
+def merge_sorted_urls(
+    posted: Iterable[Dict],
+    received: Iterable[Dict],
+    since: dt.date,
+    sample_size: int = 20,
+) -> Dict:
+    """
+    Merge two streams of `{url, day}` rows, each sorted by url, counting the urls that are only on one side.
+    :param posted: stories the story processor posted to the main server
+    :param received: articles that arrived in the email alerts database
+    :param since: only report on urls from this day on
+    :param sample_size: how many example urls to keep from each side
+    :return: missing and extra counts by day, how many matched, and a few example urls of each
+    """
+    missing, extra = Counter(), Counter()
+    missing_samples, extra_samples = [], []
+    matched = 0
+    posted, received = iter(posted), iter(received)
+    p, r = next(posted, None), next(received, None)
+    while (p is not None) or (r is not None):
+        if (r is None) or ((p is not None) and (p["url"] < r["url"])):
+            if p["day"] >= since:
+                missing[p["day"]] += 1
+                if len(missing_samples) < sample_size:
+                    missing_samples.append(p["url"])
+            p = next(posted, None)
+        elif (p is None) or (r["url"] < p["url"]):
+            if r["day"] >= since:
+                extra[r["day"]] += 1
+                if len(extra_samples) < sample_size:
+                    extra_samples.append(r["url"])
+            r = next(received, None)
+        else:
+            # same url on both sides - skip past any duplicates of it on either side
+            url = p["url"]
+            matched += 1
+            while (p is not None) and (p["url"] == url):
+                p = next(posted, None)
+            while (r is not None) and (r["url"] == url):
+                r = next(received, None)
+    return dict(
+        missing=dict(missing),
+        extra=dict(extra),
+        matched=matched,
+        missing_samples=missing_samples,
+        extra_samples=extra_samples,
+    )
+
+
+def reconcile_project(project_id: int, days: int = 30) -> Dict:
+    """
+    Compare the stories posted for one project over the last `days` against what arrived in email alerts.
+    """
+    since = dt.date.today() - dt.timedelta(days=days)
+    results = merge_sorted_urls(
+        processor_db.posted_story_urls(project_id, since - WINDOW_OVERLAP),
+        alerts_db.article_urls(project_id, since - WINDOW_OVERLAP),
+        since,
+    )
+    results["project_id"] = project_id
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reconcile posted stories against email alerts for every project."
+    )
+    parser.add_argument(
+        "--days", type=int, default=30, help="how many days back to check"
+    )
+    args = parser.parse_args()
+    for project in projects.load_project_list(download_if_missing=True):
+        r = reconcile_project(project["id"], args.days)
+        logger.info(
+            "Project {}: {} matched, {} missing, {} extra".format(
+                project["id"],
+                r["matched"],
+                sum(r["missing"].values()),
+                sum(r["extra"].values()),
+            )
+        )
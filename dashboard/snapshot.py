@@ -0,0 +1,262 @@
+"""
+Run the dashboard from a local snapshot instead of the databases - for demos, incident reviews, or to keep load off
+production. Export a snapshot of everything the pages show, for every project, with:
+
+    python -m dashboard.snapshot
+
+and then start the dashboard with `DASHBOARD_MODE=snapshot`. The query functions in `processor_db` and `alerts_db`
+that are decorated with `@snapshot.snapshottable` then answer from the snapshot, and nothing connects to a database.
+
+A snapshot is a directory with a Parquet file for each query result, a manifest mapping each function call (function
+name plus arguments) to its result, and the project list. Anything that isn't in the snapshot (ie. the second page of
+a browsing table) raises `SnapshotMissingError`.
+"""
+
+import argparse
+import datetime as dt
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dashboard import DASHBOARD_MODE, SNAPSHOT_DIR
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT = "snapshot"
+
+_MANIFEST = "manifest.json"
+_PROJECTS = "projects.json"
+_ENTRIES = "entries"
+
+_recording: Optional[Dict[str, Any]] = (
+    None  # call key -> result, while `export` is running
+)
+_loaded: Optional["_Snapshot"] = None
+_load_lock = threading.Lock()
+
+
+class SnapshotMissingError(ValueError):
+    """
+    The dashboard is in snapshot mode, and what was asked for isn't in the snapshot. This is a ValueError so the
+    pages' existing "couldn't draw this section" error handling covers it.
+    """
+
+
+def enabled() -> bool:
+    return DASHBOARD_MODE == SNAPSHOT
+
+
+def _call_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    # the same call however it is made - positional or keyword args, and with or without the defaults
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return "{}.{}({})".format(
+        func.__module__.rsplit(".", 1)[-1],
+        func.__name__,
+        json.dumps(bound.arguments, sort_keys=True, default=str),
+    )
+
+
+def snapshottable(func: Callable) -> Callable:
+    """
+    Decorate a query function so its results are included in snapshots, and answered from the snapshot in snapshot
+    mode. It has to return query result rows, or something JSON serializable.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if enabled():
+            return _snapshot().get(_call_key(func, args, kwargs))
+        results = func(*args, **kwargs)
+        if _recording is not None:
+            _recording[_call_key(func, args, kwargs)] = results
+        return results
+
+    return wrapper
+
+
+def project_list() -> List[Dict]:
+    """
+    The project list the snapshot was taken with (see `projects.load_project_list`).
+    """
+    return _snapshot().projects
+
+
+class _Snapshot:
+    def __init__(self, snapshot_dir: str):
+        self._dir = snapshot_dir
+        with open(os.path.join(snapshot_dir, _MANIFEST)) as f:
+            manifest = json.load(f)
+        with open(os.path.join(snapshot_dir, _PROJECTS)) as f:
+            self.projects = json.load(f)
+        self.created_at = dt.datetime.fromisoformat(manifest["created_at"])
+        self._entries: Dict[str, Dict] = manifest["entries"]
+        self._results: Dict[str, Any] = (
+            {}
+        )  # read from the Parquet files the first time they're needed
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            raise SnapshotMissingError("Not in the snapshot: {}".format(key))
+        if entry["kind"] == "value":
+            return entry["value"]
+        if entry["file"] is None:
+            return []
+        with self._lock:
+            if key not in self._results:
+                import pyarrow.parquet as pq
+
+                from dashboard.database.columnar import ColumnarResults
+
+                table = pq.read_table(os.path.join(self._dir, _ENTRIES, entry["file"]))
+                self._results[key] = ColumnarResults(table)
+            return self._results[key]
+
+
+def _snapshot() -> _Snapshot:
+    global _loaded
+    with _load_lock:
+        if _loaded is None:
+            try:
+                _loaded = _Snapshot(SNAPSHOT_DIR)
+            except FileNotFoundError as e:
+                raise SnapshotMissingError(
+                    "No snapshot in {} - export one with `python -m dashboard.snapshot`".format(
+                        SNAPSHOT_DIR
+                    )
+                ) from e
+            logger.info(
+                "Answering queries from the snapshot taken at {}".format(
+                    _loaded.created_at
+                )
+            )
+        return _loaded
+
+
+def created_at() -> dt.datetime:
+    return _snapshot().created_at
+
+
+def _record_homepage() -> None:
+    from dashboard import warmer
+    from dashboard.database import alerts_db
+
+    warmer.warm_homepage()
+    alerts_db.approximate_event_counts_by_creation_date()
+    for days in [7, 30]:
+        alerts_db.approximate_event_count(days=days)
+
+
+def _record_project(project_id: int) -> None:
+    # the warmer runs most of what the pages do, these are the rest
+    from dashboard import warmer
+    from dashboard.database import alerts_db, processor_db
+
+    warmer.warm_project(project_id)
+    alerts_db.estimated_story_count(project_id=project_id)
+    alerts_db.approximate_event_counts_by_creation_date(project_id=project_id)
+    for days in [7, 30]:
+        alerts_db.approximate_event_count(project_id=project_id, days=days)
+    processor_db.stories_page(project_id)
+    alerts_db.articles_page(project_id)
+
+
+def _write(
+    results: Dict[str, Any], project_list: List[Dict], snapshot_dir: str
+) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    entries = {}
+    os.makedirs(os.path.join(snapshot_dir, _ENTRIES))
+    for key, value in results.items():
+        if isinstance(value, (list, tuple)) or hasattr(value, "table"):
+            if len(value) == 0:
+                entries[key] = dict(kind="rows", file=None)
+                continue
+            try:
+                table = (
+                    value.table
+                    if hasattr(value, "table")
+                    else pa.Table.from_pylist(list(value))
+                )
+            except (pa.ArrowException, TypeError, ValueError):
+                entries[key] = dict(
+                    kind="value", value=json.loads(json.dumps(list(value), default=str))
+                )
+                continue
+            filename = hashlib.sha1(key.encode()).hexdigest() + ".parquet"
+            pq.write_table(table, os.path.join(snapshot_dir, _ENTRIES, filename))
+            entries[key] = dict(kind="rows", file=filename)
+        else:
+            entries[key] = dict(
+                kind="value", value=json.loads(json.dumps(value, default=str))
+            )
+    with open(os.path.join(snapshot_dir, _PROJECTS), "w") as f:
+        json.dump(project_list, f)
+    with open(os.path.join(snapshot_dir, _MANIFEST), "w") as f:
+        json.dump(
+            dict(created_at=dt.datetime.now().isoformat(), entries=entries), f, indent=1
+        )
+
+
+def export(snapshot_dir: str = SNAPSHOT_DIR) -> Dict:
+    """
+    Run every query the pages need, for the Homepage and every project, and save the results as a snapshot. The new
+    snapshot only replaces the old one once it is complete.
+    :return: a summary of what was exported, and how long it took
+    """
+    global _recording
+    from dashboard import projects
+
+    start = time.time()
+    project_list = projects.load_project_list(download_if_missing=True)
+    failed = []
+    _recording = {}
+    try:
+        _record_homepage()
+        for p in project_list:
+            try:
+                _record_project(p["id"])
+            except Exception as e:
+                logger.warning("  Couldn't export project {}: {}".format(p["id"], e))
+                failed.append(p["id"])
+        results = _recording
+    finally:
+        _recording = None
+    temp_dir = snapshot_dir.rstrip(os.sep) + ".new"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    _write(results, project_list, temp_dir)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.rename(temp_dir, snapshot_dir)
+    duration = time.time() - start
+    logger.info(
+        "Exported {} query results for {} projects to {} in {:.1f} secs ({} failed)".format(
+            len(results), len(project_list), snapshot_dir, duration, len(failed)
+        )
+    )
+    return dict(
+        results=len(results),
+        project_count=len(project_list),
+        failed=failed,
+        duration=duration,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Save everything the dashboard shows to a local snapshot."
+    )
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="where to save it")
+    args = parser.parse_args()
+    export(args.dir)
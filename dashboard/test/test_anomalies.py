@@ -0,0 +1,75 @@
+import datetime as dt
+import unittest
+
+import numpy as np
+
+from dashboard import anomalies
+
+TODAY = dt.date(2024, 6, 30)
+PLATFORMS = ["media-cloud", "newscatcher", "wayback-machine", "newsdata.io"]
+
+
+def _rows(projects: int = 50, days: int = 30, stopped=(7, "newscatcher", 4), rates=(10, 60)):
+    """
+    Daily counts for every project and platform, with one platform stopping for one project for the last few days.
+    """
+    rng = np.random.default_rng(42)
+    rows = []
+    for project_id in range(1, projects + 1):
+        for platform in PLATFORMS:
+            rate = rng.uniform(*rates)
+            for d in range(days, 0, -1):
+                stopped_now = (project_id, platform) == stopped[:2] and d <= stopped[2]
+                count = 0 if stopped_now else int(rng.poisson(rate))
+                if count > 0:
+                    rows.append(dict(project_id=project_id, platform=platform, day=TODAY - dt.timedelta(days=d),
+                                     stories=count))
+    return rows
+
+
+class TestAnomalies(unittest.TestCase):
+    def test_count_matrix_fills_missing_days(self):
+        rows = [dict(project_id=1, platform="newscatcher", day=dt.date(2024, 6, 1), stories=3),
+                dict(project_id=1, platform="newscatcher", day=dt.date(2024, 6, 3), stories=5)]
+        df = anomalies.to_dataframe(rows)
+        series, counts = anomalies.count_matrix(df, dt.date(2024, 6, 1), dt.date(2024, 6, 4))
+        assert list(series) == [(1, "newscatcher")]
+        assert counts.tolist() == [[3, 0, 5, 0]]
+
+    def test_rolling_baseline(self):
+        counts = np.array([[10.0] * 5 + [0.0, 0.0]])
+        median, spread = anomalies.rolling_baseline(counts, window=4)
+        assert np.isnan(median[0, :4]).all()
+        # the first day of the drop doesn't drag down the baseline for the second
+        assert median[0, 4:].tolist() == [10, 10, 10]
+        assert spread[0, 4] == 0
+
+    def test_find_drops(self):
+        drops = anomalies.find_drops(_rows(), TODAY)
+        assert len(drops) == 1
+        assert drops[0]["project_id"] == 7
+        assert drops[0]["platform"] == "newscatcher"
+        assert drops[0]["since"] == TODAY - dt.timedelta(days=4)
+        assert drops[0]["days"] == 4
+        assert drops[0]["recent_per_day"] == 0
+
+    def test_long_outage(self):
+        # longer than half the baseline window, so the rolling median of the days before has gone to zero
+        drops = anomalies.find_drops(_rows(stopped=(7, "newscatcher", 10)), TODAY)
+        assert [(d["project_id"], d["platform"], d["days"]) for d in drops] == [(7, "newscatcher", 10)]
+        assert drops[0]["baseline_per_day"] >= anomalies.MIN_BASELINE
+
+    def test_quiet_platform_stopping(self):
+        # nothing at all from a platform that only had 6-8 stories a day isn't far enough below to score as a drop
+        drops = anomalies.find_drops(_rows(projects=10, stopped=(7, "newscatcher", 3), rates=(6, 8)), TODAY)
+        assert [(d["project_id"], d["platform"], d["days"]) for d in drops] == [(7, "newscatcher", 3)]
+
+    def test_one_quiet_day_is_not_flagged(self):
+        assert anomalies.find_drops(_rows(stopped=(7, "newscatcher", 1)), TODAY) == []
+
+    def test_no_stories(self):
+        assert anomalies.find_drops([], TODAY) == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from functools import partial
+
+from dashboard.database import base
+
+
+class FakeDatabase:
+    """
+    Answers queries from a cache like the database modules do, loading uncached ones in batches.
+    """
+
+    def __init__(self):
+        self.cache = {}
+        self.batches = []
+
+    def _prefetch(self, queries):
+        self.batches.append(list(queries.keys()))
+        self.cache.update({q: q.upper() for q in queries})
+
+    def run_query(self, query):
+        if base.collecting() and query not in self.cache:
+            base.defer_to_batch(self._prefetch, query, None)
+        if query not in self.cache:
+            self.batches.append([query])
+            self.cache[query] = query.upper()
+        return self.cache[query]
+
+    def two_queries(self):
+        return self.run_query("first") + self.run_query("second")
+
+
+class TestBatched(unittest.TestCase):
+    def test_batched(self):
+        db = FakeDatabase()
+        db.run_query("cached")
+        results = base.batched([partial(db.run_query, q) for q in ["a", "cached", "b"]])
+        assert results == ["A", "CACHED", "B"]
+        assert db.batches == [["cached"], ["a", "b"]]
+
+    def test_several_queries_in_one_call(self):
+        db = FakeDatabase()
+        # only the first query of a call can be batched, the rest run one at a time
+        results = base.batched([db.two_queries, partial(db.run_query, "c")])
+        assert results == ["FIRSTSECOND", "C"]
+        assert db.batches == [["first", "c"], ["second"]]
+
+    def test_errors(self):
+        def fails():
+            raise ValueError("no data")
+
+        with self.assertRaises(ValueError):
+            base.batched([fails])
+        assert not base.collecting()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+import threading
+import time
+import unittest
+
+from dashboard.database.cache import MemoryBudget, QueryCache, estimate_size
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLoader:
+    def __init__(self, delay: float = 0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            value = self.calls
+        time.sleep(self.delay)
+        return value
+
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = QueryCache(soft_ttl=10, hard_ttl=100, clock=self.clock)
+
+    def _wait_for_refresh(self):
+        for _ in range(100):
+            if len(self.cache._in_flight) == 0:
+                return
+            time.sleep(0.01)
+
+    def test_fresh_hit(self):
+        loader = CountingLoader()
+        assert self.cache.get("q", loader) == 1
+        self.clock.now = 5
+        assert self.cache.get("q", loader) == 1
+        assert loader.calls == 1
+
+    def test_stale_while_revalidate(self):
+        loader = CountingLoader()
+        self.cache.get("q", loader)
+        self.clock.now = 50
+        # between the soft and hard TTLs we get the stale value right away, and a refresh happens in the background
+        assert self.cache.get("q", loader) == 1
+        self._wait_for_refresh()
+        assert loader.calls == 2
+        assert self.cache.get("q", loader) == 2
+
+    def test_hard_expiry_waits_for_reload(self):
+        loader = CountingLoader()
+        self.cache.get("q", loader)
+        self.clock.now = 500
+        assert self.cache.get("q", loader) == 2
+
+    def test_single_flight(self):
+        loader = CountingLoader(delay=0.2)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get("q", loader)))
+            for _ in range(10)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert loader.calls == 1
+        assert results == [1] * 10
+
+    def test_single_background_refresh(self):
+        loader = CountingLoader(delay=0.2)
+        self.cache.get("q", loader)
+        self.clock.now = 50
+        for _ in range(10):
+            assert self.cache.get("q", loader) == 1
+        self._wait_for_refresh()
+        assert loader.calls == 2
+
+    def test_failed_load(self):
+        def failing_loader():
+            raise RuntimeError("database is down")
+
+        self.assertRaises(RuntimeError, self.cache.get, "q", failing_loader)
+        assert self.cache.peek("q") is None
+        assert self.cache.get("q", CountingLoader()) == 1
+
+    def test_peek_expired(self):
+        self.cache.get("q", CountingLoader())
+        self.clock.now = 500
+        value, _ = self.cache.peek("q")
+        assert value == 1
+
+    def test_invalidate(self):
+        loaders = dict(a=CountingLoader(), b=CountingLoader())
+        for key, loader in loaders.items():
+            self.cache.get(key, loader)
+        # only the picked entries are refreshed, and they're served as they were until the refresh is done
+        assert self.cache.invalidate(lambda key: key == "a") == 1
+        self._wait_for_refresh()
+        assert self.cache.get("a", loaders["a"]) == 2
+        assert self.cache.get("b", loaders["b"]) == 1
+        assert loaders["b"].calls == 1
+
+    def test_invalidate_with_loader_kwargs(self):
+        calls = []
+
+        def loader(after_lsn=None):
+            calls.append(after_lsn)
+            return len(calls)
+
+        self.cache.get("a", loader)
+        # the refresh after a change calls the loader with the arguments it's given ...
+        assert self.cache.invalidate(lambda key: True, dict(after_lsn="0/10")) == 1
+        self._wait_for_refresh()
+        assert self.cache.get("a", loader) == 2
+        # ... but later refreshes don't
+        self.clock.now = 50
+        self.cache.get("a", loader)
+        self._wait_for_refresh()
+        assert calls == [None, "0/10", None]
+
+    def test_invalidate_at_most_every_min_refresh_secs(self):
+        cache = QueryCache(soft_ttl=10, hard_ttl=100, min_refresh_secs=0.2)
+        calls = []
+
+        def loader(after_lsn=None):
+            calls.append(after_lsn)
+            return len(calls)
+
+        cache.get("a", loader)
+        # changes right after it was loaded are held back until min_refresh_secs is up, and then refreshed just once,
+        # including the latest of them - it's served as it was until then
+        for lsn in ["0/10", "0/20", "0/30"]:
+            assert cache.invalidate(lambda key: True, dict(after_lsn=lsn)) == 1
+        assert cache.get("a", loader) == 1
+        time.sleep(0.4)
+        assert calls == [None, "0/30"]
+        assert cache.get("a", loader) == 2
+
+class TestMemoryBudget(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.row_size = estimate_size(self._rows()())
+        self.budget = MemoryBudget(max_bytes=self.row_size * 3, max_entry_bytes=self.row_size * 2)
+        self.caches = [
+            QueryCache(soft_ttl=10, hard_ttl=100, clock=self.clock, name=name, budget=self.budget)
+            for name in ["processor", "alerts"]
+        ]
+
+    def _rows(self, count: int = 1):
+        return lambda: [dict(id=i, title="x" * 1000) for i in range(count)]
+
+    def test_evicts_least_recently_used_across_caches(self):
+        processor, alerts = self.caches
+        for t, (cache, key) in enumerate([(processor, "a"), (alerts, "b"), (processor, "c")]):
+            self.clock.now = t
+            cache.get(key, self._rows())
+        self.clock.now = 3
+        processor.get("a", self._rows())  # now "b" is the least recently used
+        alerts.get("d", self._rows())
+        assert self.budget.used_bytes() <= self.budget.max_bytes
+        assert alerts.peek("b") is None
+        assert processor.peek("a") is not None
+        assert alerts.peek("d") is not None
+
+    def test_results_too_big_are_not_cached(self):
+        processor, _ = self.caches
+        assert len(processor.get("export", self._rows(10))) == 10
+        assert processor.peek("export") is None
+        assert self.budget.used_bytes() == 0
+
+    def test_usage_by_label(self):
+        processor, alerts = self.caches
+        processor.get("a", self._rows(), label="processor_db.recent_stories")
+        processor.get("b", self._rows(), label="processor_db.recent_stories")
+        alerts.get("c", self._rows(), label="alerts_db.recent_articles")
+        usage = {(u["cache"], u["function"]): u for u in self.budget.usage()}
+        assert usage[("processor", "processor_db.recent_stories")]["entries"] == 2
+        assert usage[("alerts", "alerts_db.recent_articles")]["bytes"] == alerts.size_bytes
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import datetime as dt
+import unittest
+
+from dashboard.database.columnar import MIN_ROWS, ColumnarResults, compact, to_dataframe
+
+
+def _rows(count: int):
+    return [
+        dict(day=dt.date(2024, 1, 1) + dt.timedelta(days=i), source=["newscatcher", "mediacloud"][i % 2], stories=i)
+        for i in range(count)
+    ]
+
+
+class TestColumnar(unittest.TestCase):
+
+    def test_small_results_unchanged(self):
+        rows = _rows(MIN_ROWS - 1)
+        assert compact(rows) is rows
+
+    def test_round_trip(self):
+        rows = _rows(100)
+        for compression in [None, "lz4", "zstd"]:
+            results = compact(rows, compression)
+            assert isinstance(results, ColumnarResults)
+            assert len(results) == 100
+            assert results[0] == rows[0]
+            assert results[-1] == rows[-1]
+            assert list(results) == rows
+
+    def test_low_cardinality_text_is_categorical(self):
+        df = to_dataframe(compact(_rows(100)))
+        assert df["source"].dtype == "category"
+        assert df["stories"].sum() == sum(range(100))
+
+    def test_mixed_types_stay_rows(self):
+        rows = [dict(value=i if i % 2 else str(i)) for i in range(MIN_ROWS * 2)]
+        assert compact(rows) is rows
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from dashboard import funnel
+
+STORY_COUNTS = [
+    dict(project_id=1, platform="newscatcher", discovered=100, above_threshold=30, posted=29),
+    dict(project_id=1, platform="media-cloud", discovered=50, above_threshold=10, posted=10),
+    dict(project_id=2, platform="newscatcher", discovered=70, above_threshold=7, posted=7),
+]
+ARTICLE_COUNTS = [
+    dict(project_id=1, platform="newscatcher", all_platforms=False, in_alerts=29, events=20, relevant_events=5),
+    dict(project_id=1, platform="media-cloud", all_platforms=False, in_alerts=9, events=8, relevant_events=2),
+    # some events have articles from both platforms
+    dict(project_id=1, platform=None, all_platforms=True, in_alerts=38, events=25, relevant_events=6),
+    dict(project_id=2, platform="newscatcher", all_platforms=False, in_alerts=7, events=7, relevant_events=1),
+    dict(project_id=2, platform=None, all_platforms=True, in_alerts=7, events=7, relevant_events=1),
+]
+
+
+class TestFunnel(unittest.TestCase):
+    def test_merge_counts(self):
+        stages = funnel.merge_counts(STORY_COUNTS, ARTICLE_COUNTS, 1)
+        assert stages["platform"].tolist() == ["media-cloud", "newscatcher", funnel.ALL_PLATFORMS]
+        total = stages.iloc[-1]
+        assert [total[s] for s in funnel.STAGES] == [150, 40, 39, 38, 25, 6]
+        assert stages.iloc[0]["relevant_events"] == 2
+
+    def test_stages_missing_from_one_database(self):
+        stages = funnel.merge_counts(STORY_COUNTS, [], 2)
+        assert stages.iloc[-1]["posted"] == 7
+        assert stages.iloc[-1]["in_alerts"] == 0
+
+    def test_no_stories(self):
+        stages = funnel.merge_counts([], [], 3)
+        assert stages["platform"].tolist() == [funnel.ALL_PLATFORMS]
+        assert stages.iloc[0][list(funnel.STAGES)].sum() == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
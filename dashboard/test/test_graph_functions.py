@@ -0,0 +1,32 @@
+import datetime as dt
+import unittest
+
+import pandas as pd
+
+import dashboard.graph_functions as graph_functions
+
+
+class TestRelevanceRatios(unittest.TestCase):
+    COUNTS = pd.DataFrame([
+        dict(period=dt.date(2024, 6, 10), project_id=1, events=10, yes_count=3, no_count=5, null_count=2),
+        dict(period=dt.date(2024, 6, 10), project_id=2, events=10, yes_count=5, no_count=5, null_count=0),
+        dict(period=dt.date(2024, 6, 3), project_id=1, events=4, yes_count=0, no_count=0, null_count=4),
+    ])
+
+    def test_all_projects(self):
+        trend = graph_functions.relevance_ratios(self.COUNTS)
+        assert trend['period'].tolist() == [dt.date(2024, 6, 3), dt.date(2024, 6, 10)]
+        assert trend['events'].tolist() == [4, 20]
+        assert trend['relevant_share'].tolist() == [0, 0.4]
+        # nothing judged yet is unknown, not zero
+        assert pd.isna(trend['precision'].iloc[0])
+        assert trend['precision'].iloc[1] == 8 / 18
+
+    def test_one_project(self):
+        trend = graph_functions.relevance_ratios(self.COUNTS, project_id=2)
+        assert trend['events'].tolist() == [10]
+        assert trend['precision'].tolist() == [0.5]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import datetime as dt
+import hashlib
+import unittest
+from unittest.mock import patch
+
+import dashboard.database.alerts_db as alerts_db
+from dashboard.hyperloglog import HyperLogLog
+
+
+def _sketch(values, precision=10):
+    sketch = HyperLogLog(precision)
+    for v in values:
+        sketch.add_hash(int.from_bytes(hashlib.md5(str(v).encode()).digest()[:4], "little"))
+    return sketch
+
+
+class TestHyperLogLog(unittest.TestCase):
+
+    def test_count_within_error(self):
+        for n in [10, 500, 20000]:
+            sketch = _sketch(range(n))
+            assert abs(sketch.count() - n) / n < 4 * sketch.relative_error
+
+    def test_duplicates_not_counted(self):
+        values = list(range(1000))
+        assert _sketch(values).count() == _sketch(values * 3).count()
+
+    def test_merge_is_union(self):
+        week = [_sketch(range(day * 100, day * 100 + 150)) for day in range(7)]
+        merged = HyperLogLog()
+        for sketch in week:
+            merged = merged.merge(sketch)
+        assert merged.registers == _sketch(range(0, 750)).registers
+
+    def test_merge_needs_same_precision(self):
+        with self.assertRaises(ValueError):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+    def test_from_registers_keeps_max_rank(self):
+        sketch = HyperLogLog.from_registers(4, [1, 1, 3], [2, 5, 1])
+        assert sketch.registers[1] == 5
+        assert sketch.registers[3] == 1
+        assert sketch.count() > 0
+
+
+class TestApproximateEventCount(unittest.TestCase):
+
+    def test_counts_calendar_days(self):
+        today = dt.date.today()
+        # events on only some of the days - the oldest of these are well outside the last week
+        sketches = {
+            today - dt.timedelta(days=ago): _sketch(range(ago * 1000, ago * 1000 + 100))
+            for ago in [0, 3, 20, 30, 40]
+        }
+        with patch.object(alerts_db, "event_sketches_by_creation_date", return_value=sketches):
+            result = alerts_db.approximate_event_count(days=7)
+        assert result["count"] == _sketch(list(range(0, 100)) + list(range(3000, 3100))).count()
+
+    def test_more_days_than_the_default_window(self):
+        with patch.object(alerts_db, "event_sketches_by_creation_date", return_value={}) as sketches:
+            alerts_db.approximate_event_count(days=7)
+            assert sketches.call_args.kwargs["limit"] == 45
+            alerts_db.approximate_event_count(days=90)
+            assert sketches.call_args.kwargs["limit"] == 90
+
+
+class TestEstimatedStoryCount(unittest.TestCase):
+
+    def test_estimate(self):
+        with patch.object(alerts_db, "_run_query", return_value=[dict(count=1234.0)]):
+            assert alerts_db.estimated_story_count() == 1234
+
+    def test_no_estimate_before_analyze(self):
+        # so the page shows the exact count instead, without an "≈"
+        with patch.object(alerts_db, "_run_query", return_value=[dict(count=-1)]):
+            assert alerts_db.estimated_story_count() is None
+
+
+if __name__ == "__main__":
+    unittest.main()
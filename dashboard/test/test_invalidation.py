@@ -0,0 +1,81 @@
+import datetime as dt
+import time
+import unittest
+from unittest.mock import patch
+
+import dashboard.database.processor_db as processor_db
+from dashboard.database import routing
+from dashboard.database.cache import QueryCache
+from dashboard.database.invalidation import EVERYTHING, affected, parse_change
+
+PROJECT_QUERY = (
+    "select posted_date::date as day, count(1) as stories from stories where (posted_date is not Null) and "
+    "(posted_date >= '2024-06-01'::DATE) AND (project_id=12) group by 1 order by 1 DESC"
+)
+ALL_PROJECTS_QUERY = "SELECT COUNT(1) FROM articles"
+
+
+def _change(table="stories", project_id=12, latest_day="2024-06-15"):
+    return parse_change(
+        '{{"table": "{}", "project_id": {}, "latest_day": "{}"}}'.format(table, project_id, latest_day)
+    )
+
+
+class TestInvalidation(unittest.TestCase):
+    def test_parse_change(self):
+        assert _change() == dict(table="stories", project_id=12, latest_day=dt.date(2024, 6, 15))
+        assert parse_change("not json") == EVERYTHING
+        assert parse_change('{"table": "articles"}') == dict(table="articles", project_id=None, latest_day=None)
+
+    def test_affected(self):
+        assert affected(PROJECT_QUERY, [_change()])
+        assert not affected(PROJECT_QUERY, [_change(project_id=13)])
+        assert not affected(PROJECT_QUERY, [_change(table="articles")])
+        # a change to days before the query's date range doesn't change its results
+        assert not affected(PROJECT_QUERY, [_change(latest_day="2024-05-31")])
+        assert affected(PROJECT_QUERY, [_change(project_id=13), _change()])
+
+    def test_affected_all_projects(self):
+        assert affected(ALL_PROJECTS_QUERY, [_change(table="articles", project_id=13)])
+        assert not affected(ALL_PROJECTS_QUERY, [_change()])
+        assert affected(ALL_PROJECTS_QUERY, [EVERYTHING])
+        assert affected(PROJECT_QUERY, [EVERYTHING])
+
+
+
+class TestInvalidate(unittest.TestCase):
+    def setUp(self):
+        self.reads = []
+
+        def execute(query, timeout_secs, route=None):
+            self.reads.append((route, timeout_secs))
+            return [dict(day=dt.date(2024, 6, 15), stories=len(self.reads))]
+
+        for patcher in [
+            patch.object(processor_db, "_cache", QueryCache(soft_ttl=10, hard_ttl=100)),
+            patch.object(processor_db._router, "execute", execute),
+            patch.object(processor_db._router, "route_after", lambda lsn: routing.REPLICA),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _wait_for_reads(self, count):
+        for _ in range(100):
+            if len(self.reads) == count:
+                return
+            time.sleep(0.01)
+
+    def test_refreshes_once_replica_has_changes(self):
+        processor_db._run_query(PROJECT_QUERY, timeout_secs=7)
+        assert processor_db.invalidate([_change()], "0/16B3740") == 1
+        self._wait_for_reads(2)
+        # read from the replica once it has replayed past the changes, with the query's own time budget
+        assert self.reads == [(None, 7), (routing.REPLICA, 7)]
+
+    def test_unaffected_results_not_refreshed(self):
+        processor_db._run_query(PROJECT_QUERY)
+        assert processor_db.invalidate([_change(project_id=13)], "0/16B3740") == 0
+        assert len(self.reads) == 1
+
+if __name__ == "__main__":
+    unittest.main()
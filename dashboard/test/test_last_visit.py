@@ -0,0 +1,31 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+from dashboard import last_visit
+
+
+class TestLastVisit(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "last_visits.json")
+
+    def test_record(self):
+        first = dt.datetime(2024, 6, 1, 9, 30)
+        assert last_visit.record("abc", first, self.path) is None
+        assert last_visit.record("abc", first + dt.timedelta(hours=3), self.path) == first
+        assert last_visit.record("def", first, self.path) is None
+        assert last_visit.load(self.path) == {"abc": first + dt.timedelta(hours=3), "def": first}
+
+    def test_forgets_old_visitors(self):
+        now = dt.datetime(2024, 6, 1)
+        last_visit.record("old", now - dt.timedelta(days=last_visit.FORGET_AFTER_DAYS + 1), self.path)
+        last_visit.record("new", now, self.path)
+        assert list(last_visit.load(self.path)) == ["new"]
+
+    def test_no_file(self):
+        assert last_visit.load(self.path) == {}
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import datetime as dt
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import psycopg
+from psycopg.rows import dict_row
+
+import dashboard.database.processor_db as processor_db
+import dashboard.graph_functions as graph_functions
+
+# a local Postgres to run the query against (see test_routing)
+PRIMARY_URI = os.environ.get("TEST_PRIMARY_DB_URI")
+
+COLUMNS = ["{}_{}".format(stage, p) for stage in ["processing", "posting"] for p in ["p50", "p90", "p99"]]
+
+
+def _query(*args, **kwargs) -> str:
+    with patch.object(processor_db, "_run_query", return_value=[]) as run_query:
+        processor_db.latency_percentiles_by_day(*args, **kwargs)
+    return run_query.call_args[0][0]
+
+
+def _row(day, platform="newscatcher", hours=1.0):
+    return dict(day=day, platform=platform, stories=10, **{c: hours for c in COLUMNS})
+
+
+class TestLatencyQuery(unittest.TestCase):
+    def test_project_query(self):
+        query = _query(12, limit=7)
+        assert "(project_id=12)" in query
+        assert "(processed_date >= '{}'::DATE)".format(dt.date.today() - dt.timedelta(days=7)) in query
+        assert "'newscatcher'" in query
+        # one pass computing all three percentiles, unpacked into a column each
+        assert query.count("percentile_cont(ARRAY[0.5, 0.9, 0.99])") == 2
+        for stage in ["processing", "posting"]:
+            for i, p in enumerate(["p50", "p90", "p99"], 1):
+                assert "{stage}[{i}] AS {stage}_{p}".format(stage=stage, i=i, p=p) in query
+
+    def test_all_projects_query(self):
+        query = _query()
+        assert "project_id" not in query
+        assert "GROUP BY 1, 2" in query
+
+    @unittest.skipUnless(PRIMARY_URI, "needs TEST_PRIMARY_DB_URI")
+    def test_percentiles_unpacked(self):
+        processed = dt.datetime.combine(dt.date.today(), dt.time(12))
+        with psycopg.connect(PRIMARY_URI, row_factory=dict_row) as conn:
+            # a temporary table hides any real one for this connection
+            conn.execute("CREATE TEMPORARY TABLE stories (project_id int, source text, published_date timestamp, "
+                         "processed_date timestamp, posted_date timestamp)")
+            with conn.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO stories VALUES (12, 'newscatcher', %s, %s, %s)",
+                    [(processed - dt.timedelta(hours=h), processed, None if h == 100 else processed)
+                     for h in range(1, 101)],
+                )
+            rows = conn.execute(_query(12)).fetchall()
+        assert len(rows) == 1
+        assert set(COLUMNS) <= set(rows[0].keys())
+        assert rows[0]["stories"] == 100
+        assert rows[0]["processing_p50"] == 50.5
+        assert rows[0]["processing_p90"] < rows[0]["processing_p99"] <= 100
+        # stories that weren't posted only count towards the processing lag
+        assert rows[0]["posting_p99"] == 0
+
+
+class TestLatencyCharts(unittest.TestCase):
+    def _draw(self, results):
+        st = MagicMock()
+        st.radio.return_value = "p90"
+        columns = [MagicMock(), MagicMock()]
+        st.columns.return_value = columns
+        with patch.object(graph_functions, "st", st), \
+                patch.object(processor_db, "latency_percentiles_by_day", return_value=results):
+            graph_functions.latency_charts(12)
+        return st, [c.altair_chart.call_args[0][0] for c in columns if c.altair_chart.called]
+
+    def test_charts(self):
+        today = dt.date.today()
+        _, charts = self._draw([_row(today), _row(today, "media-cloud", 2.0), _row(today - dt.timedelta(days=1))])
+        assert len(charts) == 2
+        for chart, stage in zip(charts, ["processing", "posting"]):
+            assert chart.encoding.y.shorthand == "{}_p90:Q".format(stage)
+            assert "{}_p90".format(stage) in chart.data.columns
+
+    def test_no_stories(self):
+        st, charts = self._draw([])
+        assert charts == []
+        st.write.assert_called_once_with("_No stories processed recently._")
+
+
+if __name__ == "__main__":
+    unittest.main()
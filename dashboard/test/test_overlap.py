@@ -0,0 +1,44 @@
+import os
+import unittest
+
+import dashboard.database.processor_db as processor_db
+from dashboard import overlap
+
+ROWS = [
+    dict(platforms=["media-cloud"], platform="media-cloud", urls=50, stories=55),
+    dict(platforms=["media-cloud", "newscatcher"], platform="media-cloud", urls=20, stories=20),
+    dict(platforms=["media-cloud", "newscatcher"], platform="newscatcher", urls=20, stories=24),
+    dict(platforms=["media-cloud", "newscatcher", "wayback-machine"], platform="media-cloud", urls=5, stories=5),
+    dict(platforms=["media-cloud", "newscatcher", "wayback-machine"], platform="newscatcher", urls=5, stories=5),
+    dict(platforms=["media-cloud", "newscatcher", "wayback-machine"], platform="wayback-machine", urls=5, stories=5),
+    dict(platforms=["newscatcher"], platform="newscatcher", urls=30, stories=30),
+]
+
+
+class TestOverlap(unittest.TestCase):
+    def test_overlap_tables(self):
+        totals, matrix = overlap.overlap_tables(ROWS)
+        totals = totals.set_index("platform")
+        assert totals.loc["media-cloud"].tolist() == [80, 75, 50, 25, 5]
+        assert totals.loc["newscatcher"].tolist() == [59, 55, 30, 25, 4]
+        assert totals.loc["wayback-machine"].tolist() == [5, 5, 0, 5, 0]
+        assert matrix.loc["media-cloud", "media-cloud"] == 75
+        assert matrix.loc["media-cloud", "newscatcher"] == 25
+        assert matrix.loc["newscatcher", "media-cloud"] == 25
+        assert matrix.loc["newscatcher", "wayback-machine"] == 5
+
+    def test_no_stories(self):
+        totals, matrix = overlap.overlap_tables([])
+        assert len(totals) == 0
+        assert len(matrix) == 0
+
+    def test_index_matches_query(self):
+        # the index is only used if its expression is exactly the one the query groups by
+        path = os.path.join(os.path.dirname(__file__), "..", "..", "migrations", "processor_db",
+                            "005_url_hash_index.sql")
+        with open(path) as f:
+            assert processor_db.URL_HASH in f.read()
+
+
+if __name__ == "__main__":
+    unittest.main()
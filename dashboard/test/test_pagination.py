@@ -0,0 +1,124 @@
+import datetime as dt
+import re
+import unittest
+from unittest.mock import MagicMock, patch
+
+import dashboard.database.alerts_db as alerts_db
+import dashboard.database.processor_db as processor_db
+import dashboard.graph_functions as graph_functions
+
+_AFTER = re.compile(r"\(published_date, id\) < \('([^']+)', (\d+)\)")
+
+
+def _query(module, func, *args, **kwargs) -> str:
+    with patch.object(module, "_run_query", return_value=[]) as run_query:
+        func(*args, **kwargs)
+    return run_query.call_args[0][0]
+
+
+class FakeStories:
+    """
+    Answers `stories_page` queries from a list of stories, reading the keyset cursor back out of the SQL - so paging
+    through it only works if the cursor carries everything needed to pick up where the last page left off.
+    """
+
+    def __init__(self, stories):
+        self.stories = stories
+
+    def run_query(self, query):
+        rows = sorted(self.stories, key=lambda s: (s["published_date"], s["id"]), reverse=True)
+        after = _AFTER.search(query)
+        if after is not None:
+            cursor = (dt.datetime.fromisoformat(after.group(1)), int(after.group(2)))
+            rows = [s for s in rows if (s["published_date"], s["id"]) < cursor]
+        return rows[:int(re.search(r"LIMIT (\d+)", query).group(1))]
+
+
+class TestKeysetQueries(unittest.TestCase):
+    def test_stories_first_page(self):
+        query = _query(processor_db, processor_db.stories_page, 12)
+        assert "(project_id=12)" in query
+        assert "(published_date, id) <" not in query
+        assert "ORDER BY published_date DESC, id DESC" in query
+        assert "LIMIT 50" in query
+
+    def test_stories_cursor_with_filters(self):
+        after = dict(published_date=dt.datetime(2024, 6, 15, 10, 30), id=789)
+        query = _query(processor_db, processor_db.stories_page, 12, platform="newscatcher", above_threshold=True,
+                       is_posted=False, after=after, page_size=20)
+        for clause in ["(project_id=12)", "(source='newscatcher')", "(above_threshold is True)",
+                       "(posted_date is Null)", "((published_date, id) < ('2024-06-15 10:30:00', 789))"]:
+            assert clause in query, clause
+        assert "LIMIT 20" in query
+
+    def test_articles_cursor(self):
+        query = _query(alerts_db, alerts_db.articles_page, 12)
+        assert "(publish_date, id) <" not in query
+        after = dict(publish_date=dt.datetime(2024, 6, 15), id=789)
+        query = _query(alerts_db, alerts_db.articles_page, 12, source="newscatcher", after=after)
+        assert "source = 'newscatcher'" in query
+        assert "(publish_date, id) < ('2024-06-15 00:00:00', 789)" in query
+        assert "ORDER BY publish_date DESC, id DESC" in query
+
+    def test_ties_on_published_date(self):
+        # lots of stories published at the same moment, so pages start and end in the middle of a tie
+        published = [dt.datetime(2024, 6, 15), dt.datetime(2024, 6, 14)]
+        stories = [dict(id=i, published_date=published[i % 7 == 0]) for i in range(1, 24)]
+        db = FakeStories(stories)
+        seen, after = [], None
+        with patch.object(processor_db, "_run_query", db.run_query):
+            while True:
+                page = processor_db.stories_page(12, after=after, page_size=5)
+                seen += page
+                if len(page) < 5:
+                    break
+                after = page[-1]
+        assert sorted(s["id"] for s in seen) == list(range(1, 24))
+        assert len(seen) == len(stories)
+
+
+class TestPaginatedTable(unittest.TestCase):
+    def _show(self, rows, page_starts=None, page_size=3):
+        fetch_page = MagicMock(return_value=rows)
+        shown = []
+        st = MagicMock()
+        st.session_state = {} if page_starts is None else {"table": page_starts}
+        buttons = [MagicMock(), MagicMock(), MagicMock()]
+        for b in buttons:
+            b.button.return_value = False
+        st.columns.return_value = buttons
+        with patch.object(graph_functions, "st", st), \
+                patch.object(graph_functions, "_page_prefetcher") as prefetcher:
+            graph_functions.paginated_table("table", fetch_page, shown.append, page_size=page_size)
+        return fetch_page, shown, prefetcher, buttons
+
+    def test_first_page(self):
+        rows = [dict(id=3), dict(id=2), dict(id=1)]
+        fetch_page, shown, prefetcher, buttons = self._show(rows)
+        fetch_page.assert_called_once_with(after=None, page_size=3)
+        assert shown == [rows]
+        # a full page, so there could be another: it's fetched in the background, starting after this page's last row
+        prefetcher.submit.assert_called_once_with(fetch_page, after=dict(id=1), page_size=3)
+        assert buttons[0].button.call_args.kwargs["disabled"] is True  # Previous
+        assert buttons[1].button.call_args.kwargs["disabled"] is False  # Next
+
+    def test_later_page(self):
+        fetch_page, _, _, buttons = self._show([dict(id=3)], page_starts=[None, dict(id=4)])
+        fetch_page.assert_called_once_with(after=dict(id=4), page_size=3)
+        assert buttons[0].button.call_args.kwargs["disabled"] is False
+
+    def test_last_page(self):
+        fetch_page, shown, prefetcher, buttons = self._show([dict(id=2), dict(id=1)], page_starts=[None, dict(id=3)])
+        assert shown == [[dict(id=2), dict(id=1)]]
+        prefetcher.submit.assert_not_called()
+        assert buttons[1].button.call_args.kwargs["disabled"] is True
+
+    def test_empty(self):
+        _, shown, prefetcher, buttons = self._show([])
+        assert shown == []
+        prefetcher.submit.assert_not_called()
+        assert buttons[1].button.call_args.kwargs["disabled"] is True
+
+
+if __name__ == "__main__":
+    unittest.main()
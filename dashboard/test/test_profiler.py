@@ -0,0 +1,39 @@
+import cProfile
+import json
+import pstats
+import tempfile
+import unittest
+
+from dashboard import profiler
+
+
+def _slow_function():
+    return sum(i * i for i in range(100000))
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        _slow_function()
+        self.profile.disable()
+
+    def test_top_functions(self):
+        top = profiler.top_functions(pstats.Stats(self.profile))
+        assert "_slow_function" in [f["function"] for f in top]
+        assert top[0]["cumulative_secs"] >= top[-1]["cumulative_secs"]
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            path = profiler.save(self.profile, "Project Reports", dict(project_id=12), profile_dir)
+            assert path.endswith("-project-reports-project12.prof")
+            assert pstats.Stats(path).total_calls > 0
+            with open(path.replace(".prof", ".json")) as f:
+                metadata = json.load(f)
+            assert metadata["page"] == "Project Reports"
+            assert metadata["project_id"] == 12
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import datetime as dt
+import unittest
+
+import dashboard.reconcile as reconcile
+
+TODAY = dt.date(2024, 6, 15)
+YESTERDAY = TODAY - dt.timedelta(days=1)
+LAST_MONTH = TODAY - dt.timedelta(days=30)
+
+
+def _rows(*items):
+    return [dict(url=url, day=day) for url, day in items]
+
+
+class TestReconcile(unittest.TestCase):
+    def test_merge_sorted_urls(self):
+        posted = _rows(("http://a", TODAY), ("http://b", TODAY), ("http://d", YESTERDAY), ("http://f", TODAY))
+        received = _rows(("http://a", TODAY), ("http://c", YESTERDAY), ("http://d", TODAY), ("http://e", TODAY))
+        results = reconcile.merge_sorted_urls(posted, received, YESTERDAY)
+        assert results["matched"] == 2
+        assert results["missing"] == {TODAY: 2}
+        assert results["missing_samples"] == ["http://b", "http://f"]
+        assert results["extra"] == {YESTERDAY: 1, TODAY: 1}
+        assert results["extra_samples"] == ["http://c", "http://e"]
+
+    def test_duplicates_and_window(self):
+        posted = _rows(("http://a", TODAY), ("http://a", TODAY), ("http://old", LAST_MONTH))
+        received = _rows(("http://a", TODAY), ("http://b", LAST_MONTH), ("http://b", LAST_MONTH))
+        results = reconcile.merge_sorted_urls(posted, received, YESTERDAY)
+        assert results["matched"] == 1
+        assert results["missing"] == {}
+        assert results["extra"] == {}
+
+    def test_one_side_empty(self):
+        posted = _rows(("http://a", TODAY), ("http://b", TODAY))
+        results = reconcile.merge_sorted_urls(iter(posted), iter([]), YESTERDAY, sample_size=1)
+        assert results["missing"] == {TODAY: 2}
+        assert results["missing_samples"] == ["http://a"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import unittest
+
+import psycopg
+
+from dashboard.database import routing
+from dashboard.database.instrumentation import query_stats
+
+# a primary and a streaming replica of it, ie. two local Postgres instances
+PRIMARY_URI = os.environ.get("TEST_PRIMARY_DB_URI")
+REPLICA_URI = os.environ.get("TEST_REPLICA_DB_URI")
+UNREACHABLE_URI = "postgresql://postgres@127.0.0.1:1/postgres"
+
+IN_RECOVERY_QUERY = "SELECT pg_is_in_recovery() AS in_recovery"
+
+
+class TestLsnPosition(unittest.TestCase):
+    def test_lsn_position(self):
+        assert routing.lsn_position("0/10") == 16
+        assert routing.lsn_position("1/0") > routing.lsn_position("0/FFFFFFFF")
+
+
+@unittest.skipUnless(
+    PRIMARY_URI and REPLICA_URI, "needs TEST_PRIMARY_DB_URI and TEST_REPLICA_DB_URI"
+)
+class TestReadRouter(unittest.TestCase):
+    def _router(self, replica_uri, max_lag_secs=60):
+        return routing.ReadRouter(
+            "test", lambda: PRIMARY_URI, replica_uri, max_lag_secs
+        )
+
+    def test_reads_from_replica(self):
+        router = self._router(REPLICA_URI)
+        assert router.route() == routing.REPLICA
+        assert router.execute(IN_RECOVERY_QUERY, 5)[0]["in_recovery"] is True
+
+    def test_no_replica(self):
+        router = self._router(None)
+        assert router.route() == routing.PRIMARY
+        assert router.execute(IN_RECOVERY_QUERY, 5)[0]["in_recovery"] is False
+
+    def test_replica_lagging(self):
+        router = self._router(REPLICA_URI, max_lag_secs=-1)
+        assert router.route() == routing.PRIMARY
+        assert router.execute(IN_RECOVERY_QUERY, 5)[0]["in_recovery"] is False
+
+    def test_read_from_primary(self):
+        router = self._router(REPLICA_URI)
+        assert router.route() == routing.REPLICA
+        results = router.execute(IN_RECOVERY_QUERY, 5, routing.PRIMARY)
+        assert results[0]["in_recovery"] is False
+
+    def test_route_after(self):
+        router = self._router(REPLICA_URI)
+        with psycopg.connect(PRIMARY_URI, autocommit=True) as conn:
+            lsn = conn.execute("SELECT pg_current_wal_lsn()::text").fetchone()[0]
+        # the replica soon replays as far as the primary has got ...
+        assert router.route_after(lsn) == routing.REPLICA
+        # ... but never as far as it hasn't
+        high, low = lsn.split("/")
+        assert router.route_after("{:X}/{}".format(int(high, 16) + 1, low), max_wait_secs=0.2) == routing.PRIMARY
+        assert self._router(None).route_after(lsn) == routing.PRIMARY
+
+    def test_replica_down(self):
+        router = self._router(UNREACHABLE_URI)
+        assert router.execute(IN_RECOVERY_QUERY, 5)[0]["in_recovery"] is False
+        assert router.route() == routing.PRIMARY
+
+    def test_replica_fails_mid_query(self):
+        router = self._router(REPLICA_URI)
+        assert router.route() == routing.REPLICA
+        # kill our connection to the replica behind the router's back
+        pid = router.connection(routing.REPLICA).info.backend_pid
+        with psycopg.connect(REPLICA_URI, autocommit=True) as conn:
+            conn.execute("SELECT pg_terminate_backend(%s)", [pid])
+        assert router.execute(IN_RECOVERY_QUERY, 5)[0]["in_recovery"] is False
+        assert router.route() == routing.PRIMARY
+        stats = [s for s in query_stats.recent() if s["database"] == "test"]
+        assert stats[-1]["note"] == "replica failed"
+
+    def test_reconnects(self):
+        router = self._router(REPLICA_URI)
+        router.connection(routing.REPLICA).close()
+        assert router.execute(IN_RECOVERY_QUERY, 5)[0]["in_recovery"] is True
+
+    def test_execute_batch(self):
+        router = self._router(None)
+        results = router.execute_batch(["SELECT 1 AS x", "SELECT 2 AS x"], 5)
+        assert results == [[dict(x=1)], [dict(x=2)]]
+        # one of them timing out fails the batch, and the connection can still be used afterwards
+        with self.assertRaises(psycopg.errors.QueryCanceled):
+            router.execute_batch(["SELECT 1 AS x", "SELECT pg_sleep(1)"], 0.1)
+        assert router.execute("SELECT 3 AS x", 5) == [dict(x=3)]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import patch
+
+import dashboard.database.processor_db as processor_db
+from dashboard.database import search
+
+
+def _search_stories_query(*args, **kwargs) -> str:
+    with patch.object(processor_db, "_run_query") as run_query:
+        processor_db.search_stories(*args, **kwargs)
+    return run_query.call_args[0][0]
+
+
+class TestSearch(unittest.TestCase):
+    def test_text_search_config(self):
+        assert search.text_search_config("es") == "spanish"
+        assert search.text_search_config("pt-BR") == "portuguese"
+        assert search.text_search_config("English") == "english"
+        assert search.text_search_config("sw") == search.DEFAULT_TEXT_SEARCH_CONFIG
+        assert search.text_search_config(None) == search.DEFAULT_TEXT_SEARCH_CONFIG
+
+    def test_is_url(self):
+        assert search.is_url("https://example.com/news/1")
+        assert not search.is_url("example.com/news")
+
+    def test_literal(self):
+        assert search.literal("o'brien") == "'o''brien'"
+
+    def test_contains_pattern(self):
+        assert search.contains_pattern("story-21") == "'%story-21%'"
+        # wildcards are matched literally
+        assert search.contains_pattern("100%_") == r"E'%100\\%\\_%'"
+        assert search.contains_pattern("a\\b") == r"E'%a\\\\b%'"
+
+
+    def test_search_stories_by_url(self):
+        query = _search_stories_query(12, " https://example.com/news/1 ")
+        assert "(url = 'https://example.com/news/1')" in query
+        assert "to_tsvector" not in query
+
+    def test_search_stories_by_title(self):
+        # stories don't have titles, so the words are matched against the words in their URLs (with the index's
+        # expression), as well as anywhere in the URL
+        query = _search_stories_query(12, "mujer asesinada", "es", after=dict(id=99))
+        assert "to_tsvector('spanish', {}) @@ websearch_to_tsquery('spanish', 'mujer asesinada')".format(
+            search.URL_WORDS) in query
+        assert "url ILIKE '%mujer asesinada%'" in query
+        assert "(project_id=12)" in query
+        assert "(id < 99)" in query
+
+
+if __name__ == "__main__":
+    unittest.main()
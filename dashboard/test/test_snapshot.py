@@ -0,0 +1,41 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+from dashboard import snapshot
+
+
+def stories_by_day(project_id: int = None, platform: str = None, limit: int = 85):
+    return []
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_call_key_ignores_how_args_are_passed(self):
+        keys = {
+            snapshot._call_key(stories_by_day, (2,), {}),
+            snapshot._call_key(stories_by_day, (), dict(project_id=2)),
+            snapshot._call_key(stories_by_day, (2, None), dict(limit=85)),
+        }
+        assert len(keys) == 1
+        assert snapshot._call_key(stories_by_day, (3,), {}) not in keys
+
+    def test_round_trip(self):
+        rows = [dict(day=dt.date(2024, 1, d), stories=d) for d in range(1, 31)]
+        results = {"rows": rows, "empty": [], "count": 42, "estimate": dict(count=7, relative_error=0.03)}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_dir = os.path.join(temp_dir, "snapshot")
+            snapshot._write(results, [dict(id=1, title="Project")], snapshot_dir)
+            saved = snapshot._Snapshot(snapshot_dir)
+            assert list(saved.get("rows")) == rows
+            assert saved.get("empty") == []
+            assert saved.get("count") == 42
+            assert saved.get("estimate") == dict(count=7, relative_error=0.03)
+            assert saved.projects[0]["id"] == 1
+            with self.assertRaises(snapshot.SnapshotMissingError):
+                saved.get("missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import dashboard
+from benchmarks import import_time
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_without_databases(self):
+        # the database settings point at hosts that don't exist, so this fails if importing opens a connection
+        for module in import_time.MODULES:
+            import_time.import_time(module, repeat=1)
+
+    def test_missing_setting(self):
+        environ = {k: v for k, v in os.environ.items() if k != "FEMINICIDE_API_URL"}
+        with patch.dict(os.environ, environ, clear=True):
+            # an exception (not an exit), so it isn't swallowed when it happens in a background thread
+            with self.assertRaises(dashboard.MissingSettingError):
+                dashboard.__getattr__("FEMINICIDE_API_URL")
+
+
+if __name__ == "__main__":
+    unittest.main()
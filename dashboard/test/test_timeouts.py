@@ -0,0 +1,89 @@
+import datetime as dt
+import unittest
+from unittest.mock import patch
+
+import psycopg
+
+import dashboard.database.alerts_db as alerts_db
+import dashboard.database.processor_db as processor_db
+from dashboard.database import base
+from dashboard.database.cache import QueryCache
+from dashboard.test.test_cache import FakeClock
+
+
+def _timing_out(query, timeout_secs):
+    def load():
+        raise psycopg.errors.QueryCanceled("canceling statement due to statement timeout")
+
+    return load
+
+
+class TestFallBackToStale(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = QueryCache(soft_ttl=10, hard_ttl=100, clock=self.clock)
+
+    def test_returns_stale_results(self):
+        self.cache.get("q", lambda: [dict(day=1, stories=3)])
+        results = base.fall_back_to_stale(self.cache, "q", 30)
+        assert isinstance(results, base.StaleResults)
+        assert list(results) == [dict(day=1, stories=3)]
+        assert isinstance(results.stale_as_of, dt.datetime)
+        assert results.stale_as_of <= dt.datetime.now()
+
+    def test_raises_without_earlier_results(self):
+        with self.assertRaises(base.QueryTimeoutError):
+            base.fall_back_to_stale(self.cache, "q", 30)
+        # so pages can handle it like any other "couldn't draw this" error
+        assert issubclass(base.QueryTimeoutError, ValueError)
+
+
+class TestQueryTimeouts(unittest.TestCase):
+    QUERY = "SELECT 1 AS day, 2 AS stories"
+
+    def setUp(self):
+        self.clock = FakeClock()
+        cache = QueryCache(soft_ttl=10, hard_ttl=100, clock=self.clock)
+        patcher = patch.object(processor_db, "_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timeout_falls_back_to_expired_results(self):
+        processor_db._cache.get(self.QUERY, lambda: [dict(day=1, stories=2)])
+        self.clock.now = 500  # past the hard TTL, so the query has to run again
+        with patch.object(processor_db, "_loader", _timing_out):
+            results = processor_db._run_query(self.QUERY)
+        assert list(results) == [dict(day=1, stories=2)]
+        assert results.stale_as_of is not None
+
+    def test_timeout_with_nothing_cached(self):
+        with patch.object(processor_db, "_loader", _timing_out):
+            with self.assertRaises(base.QueryTimeoutError):
+                processor_db._run_query(self.QUERY)
+
+
+
+class TestTimeBudgets(unittest.TestCase):
+    def _budget(self, module, func, *args, **kwargs) -> float:
+        with patch.object(module, "_run_query", return_value=[]) as run_query:
+            func(*args, **kwargs)
+        return run_query.call_args[0][1]
+
+    def test_all_projects_aggregates_get_longer(self):
+        for module, func in [
+            (processor_db, processor_db.funnel_counts_by_project_platform),
+            (processor_db, processor_db.story_counts_by_project_platform_day),
+            (alerts_db, alerts_db.funnel_counts_by_project_platform),
+            (alerts_db, alerts_db.relevance_counts_by_period),
+        ]:
+            assert self._budget(module, func) == base.ALL_PROJECTS_TIMEOUT_SECS
+        assert base.ALL_PROJECTS_TIMEOUT_SECS > processor_db.QUERY_TIMEOUT_SECS
+
+    def test_diagnostic_charts_get_less(self):
+        assert self._budget(processor_db, processor_db.latency_percentiles_by_day, 12) == base.DIAGNOSTIC_TIMEOUT_SECS
+        assert self._budget(processor_db, processor_db.platform_overlap, 12) == base.DIAGNOSTIC_TIMEOUT_SECS
+        assert base.DIAGNOSTIC_TIMEOUT_SECS < processor_db.QUERY_TIMEOUT_SECS
+
+
+if __name__ == "__main__":
+    unittest.main()
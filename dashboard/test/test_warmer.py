@@ -0,0 +1,62 @@
+import unittest
+from functools import partial
+from unittest.mock import patch
+
+import dashboard.database.alerts_db as alerts_db
+import dashboard.database.processor_db as processor_db
+from dashboard import PLATFORMS, warmer
+
+
+def queries_run_by(func) -> set:
+    """
+    The SQL of every query `func` runs, without running any of them.
+    """
+    queries = []
+
+    def _record(query, *args, **kwargs):
+        queries.append(query)
+        return []
+
+    def _record_count(query):
+        queries.append(query)
+        return 0
+
+    with patch.object(processor_db, "_run_query", _record), patch.object(alerts_db, "_run_query", _record), \
+            patch.object(processor_db, "_run_count_query", _record_count), \
+            patch.object(alerts_db, "_run_count_query", _record_count), \
+            patch.object(warmer, "APPROXIMATE_COUNTS", False):
+        func()
+    return set(queries)
+
+
+class TestWarmer(unittest.TestCase):
+    def test_homepage(self):
+        warmed = queries_run_by(warmer.warm_homepage)
+        for p in PLATFORMS:
+            assert queries_run_by(partial(processor_db.stories_by_posted_day, platform=p, above_threshold=True)) <= warmed
+        assert queries_run_by(processor_db.latency_percentiles_by_day) <= warmed
+        assert queries_run_by(alerts_db.event_counts_by_creation_date) <= warmed
+
+    def test_every_funnel_window(self):
+        warmed = queries_run_by(warmer.warm_homepage)
+        for days in processor_db.FUNNEL_DAYS:
+            assert queries_run_by(partial(processor_db.funnel_counts_by_project_platform, limit=days)) <= warmed
+            assert queries_run_by(partial(alerts_db.funnel_counts_by_project_platform, limit=days)) <= warmed
+
+    def test_every_relevance_period(self):
+        warmed = queries_run_by(warmer.warm_homepage)
+        assert queries_run_by(partial(alerts_db.relevance_counts_by_period, period="week", limit=182)) <= warmed
+        assert queries_run_by(partial(alerts_db.relevance_counts_by_period, period="day", limit=45)) <= warmed
+
+    def test_project(self):
+        warmed = queries_run_by(partial(warmer.warm_project, 7))
+        assert queries_run_by(partial(processor_db.below_story_count, 7)) <= warmed
+        assert queries_run_by(partial(alerts_db.relevance_counts_by_project, project_id=7)) <= warmed
+        for days in processor_db.OVERLAP_DAYS:
+            assert queries_run_by(partial(processor_db.platform_overlap, 7, limit=days)) <= warmed
+        # and nothing for other projects
+        assert not queries_run_by(partial(processor_db.below_story_count, 8)) & warmed
+
+
+if __name__ == "__main__":
+    unittest.main()
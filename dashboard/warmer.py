@@ -0,0 +1,170 @@
+"""
+Keep the query caches warm so that people opening the dashboard don't have to wait on cold queries.
+
+This runs every query the Homepage and the Project Reports pages need, for every project, on a schedule. The
+query results are cached in-process, so it runs as a background thread inside the web process (see
+`start_background_warmer`). It can also be run from the command line, to check (and time) every query once - that
+fills nothing the web server can use, because its caches are in its own process:
+
+    python -m dashboard.warmer
+"""
+
+import argparse
+import logging
+import threading
+import time
+from typing import Dict, List
+
+import streamlit as st
+
+import dashboard.database.alerts_db as alerts_db
+import dashboard.database.processor_db as processor_db
+import dashboard.projects as projects
+from dashboard import APPROXIMATE_COUNTS, LISTEN_FOR_CHANGES, PLATFORMS, WARM_INTERVAL_SECS, snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def warm_homepage() -> None:
+    """
+    Run the queries behind every chart on the Homepage (see Homepage.py).
+    """
+    for p in PLATFORMS:
+        processor_db.stories_by_posted_day(platform=p, above_threshold=True)
+        processor_db.stories_by_published_day(platform=p)
+        processor_db.stories_by_processed_day(platform=p)
+    for above_threshold in [True, False]:
+        processor_db.stories_by_processed_day(above_threshold=above_threshold)
+    processor_db.latency_percentiles_by_day()
+    processor_db.story_counts_by_project_platform_day()
+    alerts_db.event_counts_by_creation_date()
+    # every project's relevancy trend comes from these too
+    alerts_db.relevance_counts_by_period(period="week", limit=182)
+    alerts_db.relevance_counts_by_period(period="day", limit=45)
+    # and every project's pipeline funnel from these
+    for days in processor_db.FUNNEL_DAYS:
+        processor_db.funnel_counts_by_project_platform(limit=days)
+        alerts_db.funnel_counts_by_project_platform(limit=days)
+    if APPROXIMATE_COUNTS:
+        alerts_db.event_sketches_by_creation_date()
+
+
+def warm_project(project_id: int) -> None:
+    """
+    Run the queries behind every section of the Project Reports page for one project (see pages/Project Reports.py).
+    """
+    # story processor database
+    processor_db.unposted_above_story_count(project_id)
+    processor_db.posted_above_story_count(project_id)
+    processor_db.below_story_count(project_id)
+    processor_db.project_binned_model_scores(project_id)
+    for p in PLATFORMS:
+        processor_db.stories_by_posted_day(project_id=project_id, platform=p)
+        processor_db.stories_by_published_day(project_id=project_id, platform=p)
+        processor_db.stories_by_processed_day(project_id=project_id, platform=p)
+    for above_threshold in [True, False]:
+        processor_db.stories_by_processed_day(
+            project_id=project_id, above_threshold=above_threshold
+        )
+        processor_db.recent_stories(project_id, above_threshold)
+    processor_db.latency_percentiles_by_day(project_id=project_id)
+    for days in processor_db.OVERLAP_DAYS:
+        processor_db.platform_overlap(project_id, limit=days)
+    # email alerts database
+    alerts_db.recent_articles(project_id)
+    alerts_db.total_story_count(project_id=project_id)
+    alerts_db.relevance_counts_by_project(project_id=project_id)
+    alerts_db.top_media_sources_by_story_volume_22(project_id=project_id)
+    alerts_db.stories_by_publish_date(project_id=project_id)
+    alerts_db.stories_by_creation_date(project_id=project_id)
+    alerts_db.event_counts_by_creation_date(project_id=project_id)
+    if APPROXIMATE_COUNTS:
+        alerts_db.estimated_story_count(project_id=project_id)
+        alerts_db.event_sketches_by_creation_date(project_id=project_id)
+
+
+def warm_all() -> Dict:
+    """
+    Warm the Homepage and then every project. One project failing doesn't stop the others from being warmed.
+    :return: a summary of what was warmed, and how long it took
+    """
+    start = time.time()
+    project_list: List[Dict] = projects.load_project_list(download_if_missing=True)
+    try:
+        warm_homepage()
+    except Exception as e:
+        logger.warning("  Couldn't warm homepage: {}".format(e))
+    failed = []
+    for p in project_list:
+        try:
+            warm_project(p["id"])
+        except Exception as e:
+            logger.warning("  Couldn't warm project {}: {}".format(p["id"], e))
+            failed.append(p["id"])
+    duration = time.time() - start
+    logger.info(
+        "Warmed caches for {} projects in {:.1f} secs ({} failed)".format(
+            len(project_list), duration, len(failed)
+        )
+    )
+    return dict(project_count=len(project_list), failed=failed, duration=duration)
+
+
+def _warm_forever(interval_secs: int) -> None:
+    while True:
+        try:
+            warm_all()
+        except Exception as e:
+            logger.exception(e)
+        time.sleep(interval_secs)
+
+
+@st.cache_resource  # so only one warming thread runs per server process
+def start_background_warmer(
+    interval_secs: int = WARM_INTERVAL_SECS,
+) -> threading.Thread:
+    """
+    Start a daemon thread that warms all the caches every `interval_secs`. Safe to call from every page, because
+    the thread is only started the first time this is called within a server process.
+    """
+    if not interval_secs:
+        logger.info("  Background cache warming disabled")
+        return None
+    if snapshot.enabled():
+        logger.info("  Not warming caches in snapshot mode")
+        return None
+    thread = threading.Thread(
+        target=_warm_forever, args=(interval_secs,), name="cache-warmer", daemon=True
+    )
+    thread.start()
+    logger.info(
+        "  Started background cache warming every {} secs".format(interval_secs)
+    )
+    return thread
+
+
+@st.cache_resource  # so only one listener per database runs per server process
+def start_change_listeners(enabled: bool = LISTEN_FOR_CHANGES) -> List:
+    """
+    Start the daemon threads that refresh cached results as soon as their data changes (see
+    `dashboard.database.invalidation`). Safe to call from every page, like `start_background_warmer`.
+    """
+    if not enabled:
+        logger.info("  Not listening for database changes")
+        return []
+    if snapshot.enabled():
+        logger.info("  Not listening for database changes in snapshot mode")
+        return []
+    listeners = [processor_db.change_listener(), alerts_db.change_listener()]
+    for listener in listeners:
+        listener.start()
+    return listeners
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run (and time) every dashboard query once, for every project, to check they all work. This "
+        "doesn't warm the web server's caches, which live in its own process."
+    )
+    parser.parse_args()
+    warm_all()
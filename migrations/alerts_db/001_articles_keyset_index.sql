@@ -0,0 +1,3 @@
+-- Supports browsing a project's articles page by page (alerts_db.articles_page), newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS articles_project_publish_id
+    ON articles (project_id, publish_date DESC, id DESC);
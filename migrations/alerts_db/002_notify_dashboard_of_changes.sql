@@ -0,0 +1,58 @@
+-- Tells the dashboard which projects each write to articles or article_events touched, and the latest day it
+-- touched, so it can refresh just the cached results those could change (see dashboard/database/invalidation.py).
+-- These are statement-level triggers, so a batch of rows sends one notification per project, not one per row.
+CREATE OR REPLACE FUNCTION dashboard_notify_articles_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('dashboard_changes', json_build_object(
+        'table', TG_TABLE_NAME, 'project_id', project_id, 'latest_day', latest_day)::text)
+    FROM (
+        SELECT project_id, MAX(GREATEST(publish_date, created_at))::date AS latest_day
+        FROM changed_rows
+        GROUP BY project_id
+    ) AS changes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_notify_article_events_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('dashboard_changes', json_build_object(
+        'table', TG_TABLE_NAME, 'project_id', project_id, 'latest_day', latest_day)::text)
+    FROM (
+        SELECT project_id, MAX(GREATEST(created_at, updated_at))::date AS latest_day
+        FROM changed_rows
+        GROUP BY project_id
+    ) AS changes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS dashboard_articles_inserted ON articles;
+CREATE TRIGGER dashboard_articles_inserted AFTER INSERT ON articles
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_articles_changed();
+
+DROP TRIGGER IF EXISTS dashboard_articles_updated ON articles;
+CREATE TRIGGER dashboard_articles_updated AFTER UPDATE ON articles
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_articles_changed();
+
+DROP TRIGGER IF EXISTS dashboard_articles_deleted ON articles;
+CREATE TRIGGER dashboard_articles_deleted AFTER DELETE ON articles
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_articles_changed();
+
+DROP TRIGGER IF EXISTS dashboard_article_events_inserted ON article_events;
+CREATE TRIGGER dashboard_article_events_inserted AFTER INSERT ON article_events
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_article_events_changed();
+
+DROP TRIGGER IF EXISTS dashboard_article_events_updated ON article_events;
+CREATE TRIGGER dashboard_article_events_updated AFTER UPDATE ON article_events
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_article_events_changed();
+
+DROP TRIGGER IF EXISTS dashboard_article_events_deleted ON article_events;
+CREATE TRIGGER dashboard_article_events_deleted AFTER DELETE ON article_events
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_article_events_changed();
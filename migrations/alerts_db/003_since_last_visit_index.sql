@@ -0,0 +1,4 @@
+-- Supports the Homepage's "since your last visit" section (alerts_db.new_article_counts and articles_since), which
+-- only reads the articles created after a visitor's last visit
+CREATE INDEX CONCURRENTLY IF NOT EXISTS articles_created_id
+    ON articles (created_at, id);
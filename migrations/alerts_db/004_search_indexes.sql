@@ -0,0 +1,15 @@
+-- Supports searching a project's articles by URL and by words in their title (alerts_db.search_articles). A trigram
+-- index answers URL fragments and exact URLs. Titles are matched with the text search config for each project's
+-- language, so there is an index per config (see TEXT_SEARCH_CONFIGS in dashboard/database/search.py) - add one here
+-- when that list grows. The expressions have to stay exactly as the queries write them, or they won't be used.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS articles_url_trgm
+    ON articles USING gin (url gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS articles_title_english
+    ON articles USING gin (to_tsvector('english', coalesce(title, '')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS articles_title_spanish
+    ON articles USING gin (to_tsvector('spanish', coalesce(title, '')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS articles_title_portuguese
+    ON articles USING gin (to_tsvector('portuguese', coalesce(title, '')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS articles_title_simple
+    ON articles USING gin (to_tsvector('simple', coalesce(title, '')));
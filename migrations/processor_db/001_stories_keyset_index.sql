@@ -0,0 +1,3 @@
+-- Supports browsing a project's stories page by page (processor_db.stories_page), newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_project_published_id
+    ON stories (project_id, published_date DESC, id DESC);
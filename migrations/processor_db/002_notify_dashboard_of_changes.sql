@@ -0,0 +1,30 @@
+-- Tells the dashboard which projects each write to stories touched, and the latest day it touched, so it can refresh
+-- just the cached results those could change (see dashboard/database/invalidation.py). These are statement-level
+-- triggers, so a batch of stories sends one notification per project, not one per story.
+CREATE OR REPLACE FUNCTION dashboard_notify_stories_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('dashboard_changes', json_build_object(
+        'table', TG_TABLE_NAME, 'project_id', project_id, 'latest_day', latest_day)::text)
+    FROM (
+        SELECT project_id, MAX(GREATEST(published_date, queued_date, processed_date, posted_date))::date AS latest_day
+        FROM changed_rows
+        GROUP BY project_id
+    ) AS changes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS dashboard_stories_inserted ON stories;
+CREATE TRIGGER dashboard_stories_inserted AFTER INSERT ON stories
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_stories_changed();
+
+DROP TRIGGER IF EXISTS dashboard_stories_updated ON stories;
+CREATE TRIGGER dashboard_stories_updated AFTER UPDATE ON stories
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_stories_changed();
+
+DROP TRIGGER IF EXISTS dashboard_stories_deleted ON stories;
+CREATE TRIGGER dashboard_stories_deleted AFTER DELETE ON stories
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify_stories_changed();
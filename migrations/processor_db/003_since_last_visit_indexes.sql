@@ -0,0 +1,6 @@
+-- Supports the Homepage's "since your last visit" section (processor_db.new_story_counts and stories_since), which
+-- only reads the stories processed or posted after a visitor's last visit
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_processed_id
+    ON stories (processed_date, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_posted_id
+    ON stories (posted_date, id);
@@ -0,0 +1,5 @@
+-- Supports searching a project's stories by URL (processor_db.search_stories): a trigram index answers both "contains
+-- this fragment" (ILIKE '%...%') and exact URL lookups
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_url_trgm
+    ON stories USING gin (url gin_trgm_ops);
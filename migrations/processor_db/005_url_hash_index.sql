@@ -0,0 +1,8 @@
+-- Supports comparing which platforms found the same stories for a project (processor_db.platform_overlap), which
+-- groups a project's stories by a hash of their normalized URL. The expression has to stay exactly as URL_HASH in
+-- dashboard/database/processor_db.py has it, or it won't be used. The other columns the query reads are included
+-- (url too, because Postgres only reads an expression from the index when it has the columns it is computed from),
+-- so it is answered from the index alone, already in hash order, without normalizing any URLs.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_project_url_hash
+    ON stories (project_id, (hashtextextended(regexp_replace(regexp_replace(regexp_replace(lower(url), '^[a-z]+://(www\.)?|#.*$', '', 'g'), '(?<=[?&])(utm_[a-z_]+|fbclid|gclid)=[^&]*(&|$)', '', 'g'), '[?&/]+$', ''), 0)))
+    INCLUDE (source, processed_date, url);
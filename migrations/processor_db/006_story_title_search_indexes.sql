@@ -0,0 +1,13 @@
+-- Supports searching a project's stories by words in their title (processor_db.search_stories). Stories don't have
+-- titles in this database, so they're matched by the words in their URLs instead (see URL_WORDS in
+-- dashboard/database/search.py), with the text search config for each project's language - so there is an index per
+-- config (see TEXT_SEARCH_CONFIGS), like the ones on article titles. The expressions have to stay exactly as the
+-- queries write them, or they won't be used.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_url_words_english
+    ON stories USING gin (to_tsvector('english', regexp_replace(coalesce(url, ''), '[-_/.?=&+%]+', ' ', 'g')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_url_words_spanish
+    ON stories USING gin (to_tsvector('spanish', regexp_replace(coalesce(url, ''), '[-_/.?=&+%]+', ' ', 'g')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_url_words_portuguese
+    ON stories USING gin (to_tsvector('portuguese', regexp_replace(coalesce(url, ''), '[-_/.?=&+%]+', ' ', 'g')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stories_url_words_simple
+    ON stories USING gin (to_tsvector('simple', regexp_replace(coalesce(url, ''), '[-_/.?=&+%]+', ' ', 'g')));
@@ -1,13 +1,18 @@
 import streamlit as st
 import csv
 import base64
+from functools import partial
 from io import StringIO
 
 from authentication import check_password
 import dashboard.database.alerts_db as alerts
 import dashboard.database.processor_db as processor_db
 import dashboard.projects as projects
+import dashboard.reconcile as reconcile
+from dashboard.database.base import batched
+from dashboard import PLATFORMS, snapshot
 from dashboard import graph_functions as helper
+from dashboard import profiler, warmer
 
 
 # Supporting Functions
@@ -27,10 +32,16 @@ def download_csv(project_id: int):
         st.warning("No data found for the project ID.")
 
 
+# Keep query caches warm for everyone (only starts once per server process)
+warmer.start_background_warmer()
+warmer.start_change_listeners()
+
 # Authentication check
 if not check_password():
     st.stop()
 
+page_profile = profiler.start()
+
 # Sidebar: Project Selection
 st.sidebar.title("Projects")
 list_of_projects = projects.load_project_list(force_reload=True, download_if_missing=True)
@@ -45,12 +56,14 @@ titles = ["Click Here to Get A Project's Report"] + [
 
 # Display the selectbox with the updated titles
 option = st.sidebar.selectbox("Select Project by ID", titles)
+approximate = helper.approximate_counts_toggle()
 
 if option != "Click Here to Get A Project's Report":
     selected_project_id = int(option.split(" - ")[0])
     selected = next(p for p in sorted_list_of_projects if p["id"] == selected_project_id)
 
     st.title(f"Project Report for {selected['id']} - {selected['title']}")
+    helper.snapshot_notice()
 
     # Section 1: Project Attributes
     st.markdown(f"""
@@ -67,15 +80,51 @@ if option != "Click Here to Get A Project's Report":
     st.divider()
 
     # Button to download CSV
-    if st.button("Download Recently Processed Stories"):
+    if st.button("Download Recently Processed Stories", disabled=snapshot.enabled()):
         download_csv(selected["id"])
 
     st.divider()
 
+    # Pipeline Funnel
+    st.subheader("Pipeline Funnel")
+    st.write("How many of the project's stories made it through each stage of the pipeline, from being discovered on "
+             "a platform to being marked relevant in email alerts.")
+    try:
+        helper.funnel_chart(selected["id"])
+    except (ValueError, KeyError):
+        st.write("_Error creating chart. Perhaps no stories to show here?_")
+
+    st.divider()
+
+    # Platform Overlap
+    st.subheader("Overlap Between Platforms")
+    st.write("How many of the project's stories each platform found that no other platform did, and how many each pair "
+             "of platforms both found (matching stories by URL, ignoring differences like \"www.\" and tracking "
+             "parameters).")
+    try:
+        helper.platform_overlap_chart(selected["id"])
+    except (ValueError, KeyError):
+        st.write("_Error creating chart. Perhaps no stories to show here?_")
+
+    st.divider()
+
+    # Search Stories
+    st.subheader("Search Stories")
+    st.write("Find the project's stories by URL (a full one, or any part of it), and its articles in email alerts by "
+             "URL or words in their title.")
+    try:
+        helper.search_panel(selected)
+    except (ValueError, KeyError):
+        st.write("_Error. Perhaps no stories to show here?_")
+
+    st.divider()
+
     # Section 2: Project Statistics
-    unposted_above_story_count = processor_db.unposted_above_story_count(selected["id"])
-    posted_above_story_count = processor_db.posted_above_story_count(selected["id"])
-    below_story_count = processor_db.below_story_count(selected["id"])
+    unposted_above_story_count, posted_above_story_count, below_story_count = batched([
+        partial(processor_db.unposted_above_story_count, selected["id"]),
+        partial(processor_db.posted_above_story_count, selected["id"]),
+        partial(processor_db.below_story_count, selected["id"]),
+    ])
     try:
         above_threshold_pct = round(
             100 * ((unposted_above_story_count + posted_above_story_count) / below_story_count), 2)
@@ -133,6 +182,15 @@ if option != "Click Here to Get A Project's Report":
     except ValueError:
         st.write("_Error creating chart. Perhaps no stories to show here?_")
 
+    st.subheader("Pipeline Latency by Platform")
+    st.write("How late this project's stories from each platform are, based on the **day they were run against the "
+             "classifiers**: hours from the guessed date of publication to being processed, and from being processed "
+             "to being sent to the main server.")
+    try:
+        helper.latency_charts(selected["id"])
+    except (ValueError, KeyError):
+        st.write("_Error creating chart. Perhaps no stories to show here?_")
+
     st.divider()
 
     # Latest Stories
@@ -151,6 +209,23 @@ if option != "Click Here to Get A Project's Report":
     except (ValueError, KeyError):
         st.write("_Error. Perhaps no stories to show here?_")
 
+    # Browse All Stories
+    st.subheader("Browse All Stories in the Project")
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    story_platform = filter_col1.selectbox("Platform", ["All"] + PLATFORMS, key="browse-stories-platform")
+    story_threshold = filter_col2.selectbox("Threshold", ["All", "Above", "Below"], key="browse-stories-threshold")
+    story_posted = filter_col3.selectbox("Posted", ["All", "Posted", "Not Posted"], key="browse-stories-posted")
+    try:
+        helper.paginated_table(
+            f"browse-stories-{selected['id']}-{story_platform}-{story_threshold}-{story_posted}",
+            partial(processor_db.stories_page, selected['id'],
+                    platform=None if story_platform == "All" else story_platform,
+                    above_threshold=None if story_threshold == "All" else story_threshold == "Above",
+                    is_posted=None if story_posted == "All" else story_posted == "Posted"),
+            helper.latest_stories)
+    except (ValueError, KeyError):
+        st.write("_Error. Perhaps no stories to show here?_")
+
     st.divider()
 
     # Section 4: Email-Alerts Database
@@ -164,10 +239,35 @@ if option != "Click Here to Get A Project's Report":
     except (ValueError, KeyError):  
         st.write("_Error. Perhaps no stories to show here?_")
 
+    # Browse All Stories in Email-Alerts for Specified Project
+    st.subheader("Browse All Stories (from Email-Alerts Database)")
+    article_source = st.selectbox("Source", ["All"] + PLATFORMS, key="browse-articles-source")
+    try:
+        helper.paginated_table(
+            f"browse-articles-{selected['id']}-{article_source}",
+            partial(alerts.articles_page, selected['id'],
+                    source=None if article_source == "All" else article_source),
+            helper.latest_articles)
+    except (ValueError, KeyError):
+        st.write("_Error. Perhaps no stories to show here?_")
+
     # Total story count in Email-Alerts for Specified Project
-    total_email_alerts_story_count = alerts.total_story_count(project_id=selected_project_id)
-    st.metric(label=f"Total Stories in Email-Alerts for Project {selected_project_id} - {selected['title']}",
-              value=total_email_alerts_story_count)
+    try:
+        # there's no estimate until the table has been analyzed, so fall back to counting
+        estimate = alerts.estimated_story_count(project_id=selected_project_id) if approximate else None
+        st.metric(label=f"Total Stories in Email-Alerts for Project {selected_project_id} - {selected['title']}",
+                  value=(f"≈ {estimate:,}" if estimate is not None
+                         else alerts.total_story_count(project_id=selected_project_id)),
+                  help="Estimate from the table statistics" if estimate is not None else None)
+    except (ValueError, KeyError):
+        st.write("_Error. Perhaps no stories to show here?_")
+
+    # Reconcile posted stories against Email-Alerts for Specified Project
+    st.subheader("Posted Stories Missing from Email-Alerts")
+    st.write("Stories posted to the main server in the last 30 days that never arrived in the email alerts database, "
+             "and articles there that the story processor has no record of posting, by day.")
+    if st.button("Reconcile Posted Stories with Email-Alerts", disabled=snapshot.enabled()):
+        helper.reconciliation_chart(reconcile.reconcile_project(selected["id"]))
 
     # Relevancy Pie Chart for Stories in Email-Alerts for Specified Project.
     st.subheader("Relevancy Breakdown of Stories in Email-Alerts for Project ")
@@ -176,6 +276,15 @@ if option != "Click Here to Get A Project's Report":
     except (ValueError, KeyError):
         st.write("_Error. Perhaps no stories to show here?_")
 
+    # Relevancy Trend for Specified Project
+    st.subheader("Relevancy of Stories in Email-Alerts Over Time")
+    st.write("How many of the project's above threshold stories were judged relevant each week or day, to see how "
+             "changes to its threshold played out.")
+    try:
+        helper.relevance_trend_chart(project_id=selected["id"])
+    except (ValueError, KeyError):
+        st.write("_Error. Perhaps no stories to show here?_")
+
     st.divider()
 
     # Top Media Sources
@@ -208,6 +317,13 @@ if option != "Click Here to Get A Project's Report":
     # Event Count by Creation Date
     st.subheader("Event Count by Creation Date")
     try:
-        helper.event_counts_draw_graph(alerts.event_counts_by_creation_date, project_id=selected["id"])
+        if approximate:
+            helper.approximate_event_count_metrics(alerts.approximate_event_count, project_id=selected["id"])
+            helper.event_counts_draw_graph(alerts.approximate_event_counts_by_creation_date, project_id=selected["id"])
+        else:
+            helper.event_counts_draw_graph(alerts.event_counts_by_creation_date, project_id=selected["id"])
     except (ValueError, KeyError):
-        st.write("_Error. Perhaps no stories to show here?_")
\ No newline at end of file
+        st.write("_Error. Perhaps no stories to show here?_")
+
+profiler.finish(page_profile, "Project Reports", project_id=int(option.split(" - ")[0]) if " - " in option else None,
+                approximate=approximate)